@@ -3,11 +3,12 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 import os
 import base64
-import uuid
+import mimetypes
 from app.api.deps import get_db
 from app.core.config import settings
 from app.models.projects import Project as ProjectModel
 from app.services.assets import write_bytes
+from app.services.image_store import image_store
 
 router = APIRouter(prefix="/api/assets", tags=["assets"]) 
 
@@ -41,9 +42,12 @@ async def get_image(project_id: str, filename: str, db: Session = Depends(get_db
     # Build file path
     file_path = os.path.join(settings.projects_root, project_id, "assets", filename)
     
-    # Check if file exists
+    # Check if file exists; attachments referenced only by hash live in the image store
     if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Image not found")
+        stored = image_store.get(os.path.splitext(filename)[0])
+        if not stored:
+            raise HTTPException(status_code=404, detail="Image not found")
+        file_path = stored.path
     
     # Return the image file
     return FileResponse(file_path)
@@ -60,10 +64,13 @@ async def upload_image(project_id: str, file: UploadFile = File(...), db: Sessio
         print(f"❌ Project not found: {project_id}")
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Check if file is an image
+    # Check if file is an image; clients may omit the type, so fall back to the extension
     print(f"📁 File info: content_type={file.content_type}, size={file.size}")
-    if not file.content_type or not file.content_type.startswith('image/'):
-        print(f"❌ Invalid file type: {file.content_type}")
+    content_type = file.content_type
+    if not content_type or content_type == "application/octet-stream":
+        content_type = mimetypes.guess_type(file.filename or "")[0] or "application/octet-stream"
+    if not content_type.startswith('image/'):
+        print(f"❌ Invalid file type: {content_type}")
         raise HTTPException(status_code=400, detail="File must be an image")
     
     # Create assets directory if it doesn't exist
@@ -71,23 +78,27 @@ async def upload_image(project_id: str, file: UploadFile = File(...), db: Sessio
     print(f"📁 Assets directory: {project_assets}")
     os.makedirs(project_assets, exist_ok=True)
     
-    # Generate unique filename to avoid conflicts
-    file_extension = os.path.splitext(file.filename or 'image.png')[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(project_assets, unique_filename)
-    print(f"💾 Saving to: {file_path}")
-    
     try:
-        # Save file
+        # Store once by content hash; the project copy is named after the hash too
         content = await file.read()
-        write_bytes(file_path, content)
-        print(f"✅ File saved successfully: {len(content)} bytes")
+        stored = image_store.put(content, content_type)
+        file_extension = os.path.splitext(stored.path)[1]
+        unique_filename = f"{stored.hash}{file_extension}"
+        file_path = os.path.join(project_assets, unique_filename)
+        if not os.path.exists(file_path):
+            try:
+                os.link(stored.path, file_path)
+            except OSError:
+                write_bytes(file_path, content)
+        print(f"✅ Image stored: {stored.hash[:12]} ({len(content)} bytes)")
         
         return {
             "path": f"assets/{unique_filename}",
             "absolute_path": file_path,
             "filename": unique_filename,
-            "original_filename": file.filename
+            "original_filename": file.filename,
+            "hash": stored.hash,
+            "mime_type": stored.mime_type
         }
     except Exception as e:
         print(f"❌ Failed to save file: {e}")
@@ -2,11 +2,13 @@
 Act Execution API Endpoints
 Handles CLI execution and AI actions
 """
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import uuid
 import asyncio
+import functools
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
@@ -18,9 +20,16 @@ from app.models.commits import Commit
 from app.models.user_requests import UserRequest
 from app.services.cli.unified_manager import UnifiedCLIManager
 from app.services.cli.base import CLIType
-from app.services.git_ops import commit_all
+from app.services.git_ops import commit_all_async, working_tree_hash
+from app.services.chat_cache import chat_response_cache, CachedChatResponse
+from app.services.image_store import image_store
+from app.services.execution_scheduler import execution_scheduler
+from app.services.admission import admission_controller
+from app.services.execution_journal import execution_journal
+from app.core.config import settings
 from app.core.websocket.manager import manager
 from app.core.terminal_ui import ui
+from app.core.tracing import ExecutionTrace, to_otlp_json, trace_span, use_trace
 
 
 router = APIRouter()
@@ -28,8 +37,9 @@ router = APIRouter()
 
 class ImageAttachment(BaseModel):
     name: str
-    # Either base64_data or path must be provided
-    base64_data: Optional[str] = None
+    # One of hash, path or base64_data must be provided
+    hash: Optional[str] = None  # Image store content hash (from /api/assets/{project_id}/upload)
+    base64_data: Optional[str] = None  # Legacy inline payload; moved into the image store on receipt
     path: Optional[str] = None  # Absolute path to image file
     mime_type: str = "image/jpeg"
 
@@ -41,6 +51,9 @@ class ActRequest(BaseModel):
     fallback_enabled: bool = True
     images: List[ImageAttachment] = []
     is_initial_prompt: bool = False
+    idempotency_key: Optional[str] = None  # Alternative to the Idempotency-Key header
+    request_id: Optional[str] = None  # Client-generated ID; also used as idempotency key
+    bypass_cache: bool = False  # Chat mode: always run the CLI, ignoring cached answers
 
 
 class ActResponse(BaseModel):
@@ -48,6 +61,268 @@ class ActResponse(BaseModel):
     conversation_id: str
     status: str
     message: str
+    request_id: Optional[str] = None
+    queue_position: int = 0
+
+
+# How long a cancelled execution gets to flush partial output before its task is cancelled
+CANCEL_GRACE_SECONDS = 10.0
+
+
+def _enforce_admission(component: str) -> None:
+    """Reject with 429 + Retry-After when the scheduler or host is saturated"""
+    rejection = admission_controller.check()
+    if rejection:
+        ui.warning(f"Request rejected: {rejection.reason}", component)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {rejection.reason}. Try again later.",
+            headers={"Retry-After": str(rejection.retry_after)}
+        )
+
+
+def _find_idempotent_request(
+    db: Session,
+    project_id: str,
+    request_type: str,
+    idempotency_key: Optional[str]
+) -> Optional[UserRequest]:
+    """Return an earlier request submitted with the same key inside the window"""
+    if not idempotency_key:
+        return None
+    window_start = datetime.utcnow() - timedelta(seconds=settings.idempotency_window_seconds)
+    return db.query(UserRequest).filter(
+        UserRequest.project_id == project_id,
+        UserRequest.request_type == request_type,
+        UserRequest.idempotency_key == idempotency_key,
+        UserRequest.created_at >= window_start
+    ).order_by(UserRequest.created_at.desc()).first()
+
+
+def _replay_response(user_request: UserRequest) -> ActResponse:
+    """Describe an existing request as if it had just been submitted"""
+    job = execution_scheduler.find_job(user_request.id)
+    queue_position = execution_scheduler.get_position(job.job_id) if job else 0
+    status = "queued" if queue_position else user_request.status
+    if status == "pending" and job:
+        status = "running"
+    conversation_id = user_request.user_message.conversation_id if user_request.user_message else None
+    return ActResponse(
+        session_id=user_request.session_id,
+        conversation_id=conversation_id or "",
+        status=status,
+        message=f"Duplicate submission; returning existing request ({status})",
+        request_id=user_request.id,
+        queue_position=queue_position
+    )
+
+
+def _commit_or_replay(
+    db: Session,
+    project_id: str,
+    idempotency_key: Optional[str],
+    label: str
+) -> Optional[ActResponse]:
+    """Commit a new request; if a concurrent retry won the insert, replay that one
+
+    The lookup in `_find_idempotent_request` and the insert are not atomic, so
+    two retries can both miss the lookup. The unique index on
+    (project_id, idempotency_key) rejects the second insert; returns None when
+    the commit went through.
+    """
+    try:
+        db.commit()
+        return None
+    except IntegrityError as e:
+        db.rollback()
+        existing_request = None
+        if idempotency_key:
+            existing_request = db.query(UserRequest).filter(
+                UserRequest.project_id == project_id,
+                UserRequest.idempotency_key == idempotency_key
+            ).first()
+        if existing_request is None:
+            ui.error(f"Database commit failed: {e}", label)
+            raise
+        ui.info(f"Concurrent duplicate submission (key {idempotency_key}), returning {existing_request.id[:8]}...", label)
+        return _replay_response(existing_request)
+    except Exception as e:
+        ui.error(f"Database commit failed: {e}", label)
+        raise
+
+
+async def _replay_cached_chat(
+    db: Session,
+    project_id: str,
+    session_id: str,
+    conversation_id: str,
+    cached: CachedChatResponse
+) -> dict:
+    """Persist and stream a cached chat answer as if the CLI had produced it"""
+    for cached_message in cached.messages:
+        message = Message(
+            id=str(uuid.uuid4()),
+            project_id=project_id,
+            role=cached_message["role"],
+            message_type=cached_message["message_type"],
+            content=cached_message["content"],
+            metadata_json={**(cached_message.get("metadata_json") or {}), "cached": True},
+            conversation_id=conversation_id,
+            session_id=session_id,
+            created_at=datetime.utcnow()
+        )
+        db.add(message)
+        db.commit()
+        
+        if message.metadata_json.get("hidden_from_ui"):
+            continue
+        await manager.send_message(project_id, {
+            "type": "message",
+            "data": {
+                "id": message.id,
+                "role": message.role,
+                "message_type": message.message_type,
+                "content": message.content,
+                "metadata": message.metadata_json,
+                "parent_message_id": None,
+                "session_id": session_id,
+                "conversation_id": conversation_id,
+                "created_at": message.created_at.isoformat()
+            },
+            "timestamp": message.created_at.isoformat()
+        })
+    
+    return {
+        "success": True,
+        "cached": True,
+        "cli_used": cached.cli_used,
+        "messages_count": len(cached.messages)
+    }
+
+
+async def _store_chat_response(
+    db: Session,
+    repo_path: str,
+    session_id: str,
+    cache_key: str,
+    tree_hash: str,
+    result: dict
+) -> None:
+    """Cache the assistant messages of a chat run that left the tree unchanged"""
+    try:
+        if await working_tree_hash(repo_path) != tree_hash:
+            return
+        messages = db.query(Message).filter(
+            Message.session_id == session_id,
+            Message.role != "user"
+        ).order_by(Message.created_at).all()
+        chat_response_cache.put(cache_key, [
+            {
+                "role": m.role,
+                "message_type": m.message_type,
+                "content": m.content,
+                "metadata_json": m.metadata_json,
+            }
+            for m in messages
+        ], result.get("cli_used"))
+    except Exception as e:
+        ui.warning(f"Failed to cache chat response: {e}", "CHAT")
+
+
+def _mark_request_cancelled(db: Session, request_id: Optional[str]) -> None:
+    """Mark a UserRequest as cancelled (caller commits)"""
+    if not request_id:
+        return
+    user_request = db.query(UserRequest).filter(UserRequest.id == request_id).first()
+    if user_request and not user_request.is_completed:
+        now = datetime.utcnow()
+        user_request.is_completed = True
+        user_request.is_successful = False
+        user_request.cancelled_at = now
+        user_request.completed_at = now
+        user_request.error_message = "Cancelled by user"
+
+
+def _start_trace(
+    db: Session,
+    kind: str,
+    project_info: dict,
+    request_id: Optional[str],
+    cli_preference: Optional[CLIType]
+) -> ExecutionTrace:
+    """Open the latency trace for a scheduled job, rooted at request acceptance"""
+    accepted_ns = None
+    if request_id:
+        user_request = db.query(UserRequest).filter(UserRequest.id == request_id).first()
+        if user_request and user_request.created_at:
+            accepted_ns = int(user_request.created_at.replace(tzinfo=timezone.utc).timestamp() * 1e9)
+    cli = cli_preference or project_info.get('preferred_cli')
+    trace = ExecutionTrace(
+        kind,
+        start_ns=accepted_ns,
+        project_id=project_info.get('id'),
+        request_id=request_id,
+        cli=cli.value if isinstance(cli, CLIType) else cli,
+        model=project_info.get('selected_model'),
+    )
+    trace.mark("request.accepted", at_ns=trace.root.start_ns)
+    trace.end_span(trace.start_span("queue.wait", start_ns=trace.root.start_ns))
+    return trace
+
+
+def _store_trace(db: Session, request_id: Optional[str], trace: ExecutionTrace, outcome: str) -> None:
+    """Close `trace` and persist it on the UserRequest's result_metadata"""
+    trace.finish(outcome=outcome)
+    if not request_id:
+        return
+    try:
+        user_request = db.query(UserRequest).filter(UserRequest.id == request_id).first()
+        if user_request:
+            user_request.result_metadata = {**(user_request.result_metadata or {}), "trace": trace.to_dict()}
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        ui.warning(f"Failed to store trace for request {request_id[:8]}: {e}", "ACT")
+
+
+def _prepare_images(project_id: str, images: List[ImageAttachment]):
+    """Resolve attachments to image-store references.
+
+    Inline base64 is stored once and dropped from the payload, so queued jobs,
+    the journal and adapters only ever carry a hash and a path. Returns the
+    normalized attachments plus the display paths and asset links.
+    """
+    import os as _os
+    prepared: List[ImageAttachment] = []
+    image_paths = []
+    attachments = []
+    for img in images:
+        if img.hash:
+            stored = image_store.get(img.hash)
+            if not stored:
+                raise HTTPException(status_code=400, detail=f"Unknown image hash: {img.hash}")
+            img = img.model_copy(update={"path": img.path or stored.path, "mime_type": stored.mime_type})
+        elif img.base64_data:
+            try:
+                stored = image_store.put_base64(img.base64_data, img.mime_type)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Invalid image data for {img.name}: {e}")
+            img = img.model_copy(update={"hash": stored.hash, "path": stored.path, "base64_data": None})
+        prepared.append(img)
+        
+        if img.path:
+            image_paths.append(img.path)
+            fname = _os.path.basename(img.path)
+            if fname.strip():
+                attachments.append({
+                    "name": img.name or fname,
+                    "url": f"/api/assets/{project_id}/{fname}"
+                })
+        elif img.name:
+            image_paths.append(img.name)
+    
+    ui.debug(f"Prepared {len(prepared)} image attachment(s)", "ACT API")
+    return prepared, image_paths, attachments
 
 
 async def execute_act_instruction(
@@ -116,7 +391,9 @@ async def execute_chat_task(
     db: Session,
     cli_preference: CLIType = None,
     fallback_enabled: bool = True,
-    is_initial_prompt: bool = False
+    is_initial_prompt: bool = False,
+    request_id: str = None,
+    bypass_cache: bool = False
 ):
     """Background task for executing Chat instructions"""
     try:
@@ -139,6 +416,14 @@ async def execute_chat_task(
         
         # Update session status to running
         session.status = "running"
+        
+        if request_id:
+            user_request = db.query(UserRequest).filter(UserRequest.id == request_id).first()
+            if user_request:
+                user_request.started_at = datetime.utcnow()
+                user_request.cli_type_used = cli_preference.value
+                user_request.model_used = project_selected_model
+        
         db.commit()
         
         # Send chat_start event to trigger loading indicator
@@ -146,38 +431,76 @@ async def execute_chat_task(
             "type": "chat_start",
             "data": {
                 "session_id": session.id,
-                "instruction": instruction
+                "instruction": instruction,
+                "request_id": request_id
             }
         })
         
-        # Initialize CLI manager
-        cli_manager = UnifiedCLIManager(
-            project_id=project_id,
-            project_path=project_repo_path,
-            session_id=session.id,
-            conversation_id=conversation_id,
-            db=db
-        )
+        # Identical question against an unchanged tree: replay the stored answer
+        cache_key = None
+        tree_hash = None
+        if settings.chat_cache_enabled and not bypass_cache and not images:
+            try:
+                tree_hash = await working_tree_hash(project_repo_path)
+                cache_key = chat_response_cache.make_key(
+                    project_id, instruction, project_selected_model, cli_preference.value, tree_hash
+                )
+            except Exception as e:
+                ui.warning(f"Chat cache disabled for this request: {e}", "CHAT")
+        cached = chat_response_cache.get(cache_key) if cache_key else None
         
-        # Qwen Coder does not support images yet; drop them to prevent errors
-        safe_images = [] if cli_preference == CLIType.QWEN else images
+        if cached:
+            ui.info(f"Chat cache hit, replaying {len(cached.messages)} messages", "CHAT")
+            result = await _replay_cached_chat(db, project_id, session.id, conversation_id, cached)
+        else:
+            # Initialize CLI manager
+            cli_manager = UnifiedCLIManager(
+                project_id=project_id,
+                project_path=project_repo_path,
+                session_id=session.id,
+                conversation_id=conversation_id,
+                db=db
+            )
+            
+            # Qwen Coder does not support images yet; drop them to prevent errors
+            safe_images = [] if cli_preference == CLIType.QWEN else images
 
-        result = await cli_manager.execute_instruction(
-            instruction=instruction,
-            cli_type=cli_preference,
-            fallback_enabled=project_fallback_enabled,
-            images=safe_images,
-            model=project_selected_model,
-            is_initial_prompt=is_initial_prompt
-        )
-        
+            result = await cli_manager.execute_instruction(
+                instruction=instruction,
+                cli_type=cli_preference,
+                fallback_enabled=project_fallback_enabled,
+                images=safe_images,
+                model=project_selected_model,
+                is_initial_prompt=is_initial_prompt
+            )
+            
+            if cache_key and result and result.get("success"):
+                await _store_chat_response(db, project_repo_path, session.id, cache_key, tree_hash, result)
         
         # Handle result
-        if result and result.get("success"):
+        if result and result.get("cancelled"):
+            # Partial messages are already saved; nothing else to report
+            session.status = "cancelled"
+            session.completed_at = datetime.utcnow()
+            _mark_request_cancelled(db, request_id)
+            
+        elif result and result.get("success"):
             # For chat mode, we don't commit changes - just update session status
             session.status = "completed"
             session.completed_at = datetime.utcnow()
             
+            if request_id:
+                user_request = db.query(UserRequest).filter(UserRequest.id == request_id).first()
+                if user_request:
+                    user_request.is_completed = True
+                    user_request.is_successful = True
+                    user_request.completed_at = datetime.utcnow()
+                    user_request.result_metadata = {
+                        "cli_used": result.get("cli_used"),
+                        "cached": result.get("cached", False),
+                        "usage": result.get("usage"),
+                    }
+            
         else:
             # Error message
             error_msg = Message(
@@ -200,6 +523,14 @@ async def execute_chat_task(
             session.error = result.get("error") if result else "No CLI available"
             session.completed_at = datetime.utcnow()
             
+            if request_id:
+                user_request = db.query(UserRequest).filter(UserRequest.id == request_id).first()
+                if user_request:
+                    user_request.is_completed = True
+                    user_request.is_successful = False
+                    user_request.completed_at = datetime.utcnow()
+                    user_request.error_message = result.get("error") if result else "No CLI available"
+            
             # Send error message via WebSocket
             error_data = {
                 "id": error_msg.id,
@@ -224,7 +555,8 @@ async def execute_chat_task(
             "type": "chat_complete",
             "data": {
                 "status": session.status,
-                "session_id": session.id
+                "session_id": session.id,
+                "request_id": request_id
             }
         })
         
@@ -236,6 +568,14 @@ async def execute_chat_task(
         session.error = str(e)
         session.completed_at = datetime.utcnow()
         
+        if request_id:
+            user_request = db.query(UserRequest).filter(UserRequest.id == request_id).first()
+            if user_request:
+                user_request.is_completed = True
+                user_request.is_successful = False
+                user_request.completed_at = datetime.utcnow()
+                user_request.error_message = str(e)
+        
         error_msg = Message(
             id=str(uuid.uuid4()),
             project_id=project_id,
@@ -256,6 +596,7 @@ async def execute_chat_task(
             "data": {
                 "status": "failed",
                 "session_id": session.id,
+                "request_id": request_id,
                 "error": str(e)
             }
         })
@@ -340,35 +681,52 @@ async def execute_act_task(
         # Handle result
         ui.info(f"Result received: success={result.get('success') if result else None}, cli={result.get('cli_used') if result else None}", "ACT")
         
-        if result and result.get("success"):
-            # Commit changes if any
-            if result.get("has_changes"):
-                try:
-                    commit_message = f"🤖 {result.get('cli_used', 'AI')}: {instruction[:100]}"
-                    commit_result = commit_all(project_repo_path, commit_message)
+        if result and result.get("cancelled"):
+            # Partial messages are already saved; leave the working tree uncommitted
+            session.status = "cancelled"
+            session.completed_at = datetime.utcnow()
+            _mark_request_cancelled(db, request_id)
+            ui.warning(f"UserRequest {request_id[:8] if request_id else 'unknown'}... cancelled", "ACT")
+            
+        elif result and result.get("success"):
+            # Commit changes if any (skipped when the working tree is clean)
+            try:
+                commit_message = f"🤖 {result.get('cli_used', 'AI')}: {instruction[:100]}"
+                with trace_span("git.commit"):
+                    # Shielded: cancelling mid-commit would orphan git and leave .git/index.lock
+                    commit_result = await asyncio.shield(commit_all_async(project_repo_path, commit_message))
+                
+                if commit_result["success"] and not commit_result.get("skipped"):
+                    commit = Commit(
+                        id=str(uuid.uuid4()),
+                        project_id=project_id,
+                        session_id=session.id,
+                        commit_sha=commit_result["commit_hash"],
+                        message=commit_message,
+                        author_type="ai",
+                        author_name=result.get("cli_used", "AI Assistant"),
+                        files_changed=commit_result["files_changed"],
+                        stats=commit_result["stats"],
+                        committed_at=datetime.utcnow()
+                    )
+                    db.add(commit)
+                    db.commit()
+                    result["has_changes"] = True
+                    result["files_modified"] = commit_result["files_changed"]
                     
-                    if commit_result["success"]:
-                        commit = Commit(
-                            id=str(uuid.uuid4()),
-                            project_id=project_id,
-                            commit_hash=commit_result["commit_hash"],
-                            message=commit_message,
-                            author="AI Assistant",
-                            created_at=datetime.utcnow()
-                        )
-                        db.add(commit)
-                        db.commit()
-                        
-                        await manager.send_message(project_id, {
-                            "type": "commit",
-                            "data": {
-                                "commit_hash": commit_result["commit_hash"],
-                                "message": commit_message,
-                                "files_changed": commit_result.get("files_changed", 0)
-                            }
-                        })
-                except Exception as e:
-                    ui.warning(f"Commit failed: {e}", "ACT")
+                    await manager.send_message(project_id, {
+                        "type": "commit",
+                        "data": {
+                            "commit_hash": commit_result["commit_hash"],
+                            "message": commit_message,
+                            "files_changed": len(commit_result["files_changed"]),
+                            "stats": commit_result["stats"]
+                        }
+                    })
+                elif not commit_result["success"]:
+                    ui.warning(f"Commit failed: {commit_result.get('error')}", "ACT")
+            except Exception as e:
+                ui.warning(f"Commit failed: {e}", "ACT")
             
             # Update session status only (no success message to user)
             session.status = "completed"
@@ -384,7 +742,8 @@ async def execute_act_task(
                     user_request.result_metadata = {
                         "cli_used": result.get("cli_used"),
                         "has_changes": result.get("has_changes", False),
-                        "files_modified": result.get("files_modified", [])
+                        "files_modified": result.get("files_modified", []),
+                        "usage": result.get("usage"),
                     }
                     ui.success(f"UserRequest {request_id[:8]}... marked as completed", "ACT")
                 else:
@@ -504,12 +863,152 @@ async def execute_act_task(
         })
 
 
+async def run_scheduled_act(
+    project_info: dict,
+    session_id: str,
+    instruction: str,
+    conversation_id: str,
+    images: List[ImageAttachment],
+    cli_preference: CLIType = None,
+    fallback_enabled: bool = True,
+    is_initial_prompt: bool = False,
+    request_id: str = None
+):
+    """Scheduler entry point for act jobs; runs with its own database session"""
+    # Create new database session for the queued job (request session is closed by now)
+    db = next(get_db())
+    session = None
+    execution_journal.mark_running(session_id)
+    trace = _start_trace(db, "act", project_info, request_id, cli_preference)
+    try:
+        session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+        if not session:
+            ui.error(f"Session {session_id} not found for scheduled act", "ACT")
+            return
+        with use_trace(trace):
+            await execute_act_task(
+                project_info,
+                session,
+                instruction,
+                conversation_id,
+                images,
+                db,
+                cli_preference,
+                fallback_enabled,
+                is_initial_prompt,
+                request_id
+            )
+    finally:
+        outcome = session.status if session is not None else "failed"
+        outcome = outcome if outcome in ("completed", "failed", "cancelled") else "aborted"
+        execution_journal.mark_finished(session_id, outcome)
+        _store_trace(db, request_id, trace, outcome)
+        db.close()
+
+
+async def run_scheduled_chat(
+    project_info: dict,
+    session_id: str,
+    instruction: str,
+    conversation_id: str,
+    images: List[ImageAttachment],
+    cli_preference: CLIType = None,
+    fallback_enabled: bool = True,
+    is_initial_prompt: bool = False,
+    request_id: str = None,
+    bypass_cache: bool = False
+):
+    """Scheduler entry point for chat jobs; runs with its own database session"""
+    db = next(get_db())
+    session = None
+    execution_journal.mark_running(session_id)
+    trace = _start_trace(db, "chat", project_info, request_id, cli_preference)
+    try:
+        session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+        if not session:
+            ui.error(f"Session {session_id} not found for scheduled chat", "CHAT")
+            return
+        with use_trace(trace):
+            await execute_chat_task(
+                project_info,
+                session,
+                instruction,
+                conversation_id,
+                images,
+                db,
+                cli_preference,
+                fallback_enabled,
+                is_initial_prompt,
+                request_id,
+                bypass_cache
+            )
+    finally:
+        outcome = session.status if session is not None else "failed"
+        outcome = outcome if outcome in ("completed", "failed", "cancelled") else "aborted"
+        execution_journal.mark_finished(session_id, outcome)
+        _store_trace(db, request_id, trace, outcome)
+        db.close()
+
+
+async def resume_journaled_execution(item: dict):
+    """Re-submit an execution the journal carried over from a previous process"""
+    payload = item["payload"]
+    session_id = item["job_id"]
+    project_id = item["project_id"]
+    db = next(get_db())
+    try:
+        project = db.get(Project, project_id)
+        session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+        if not project or not session:
+            raise RuntimeError("project or session no longer exists")
+        session.status = "active"
+        db.commit()
+        project_info = {
+            'id': project.id,
+            'repo_path': project.repo_path,
+            'preferred_cli': project.preferred_cli or "claude",
+            'fallback_enabled': project.fallback_enabled if project.fallback_enabled is not None else True,
+            'selected_model': project.selected_model
+        }
+    finally:
+        db.close()
+    
+    images = [ImageAttachment(**img) for img in payload.get("images") or []]
+    cli_preference = CLIType(payload["cli_preference"]) if payload.get("cli_preference") else None
+    runner = run_scheduled_act if item["kind"] == "act" else functools.partial(
+        run_scheduled_chat, bypass_cache=payload.get("bypass_cache", False)
+    )
+    ui.info(f"Resuming interrupted {item['kind']} {session_id[:8]}...", "ACT")
+    await execution_scheduler.submit(
+        project_id,
+        session_id,
+        lambda: runner(
+            project_info,
+            session_id,
+            payload["instruction"],
+            payload.get("conversation_id"),
+            images,
+            cli_preference,
+            payload.get("fallback_enabled", True),
+            payload.get("is_initial_prompt", False),
+            item.get("request_id")
+        ),
+        kind=item["kind"],
+        request_id=item.get("request_id"),
+        session_id=session_id
+    )
+
+
+execution_journal.register_resumer("act", resume_journaled_execution)
+execution_journal.register_resumer("chat", resume_journaled_execution)
+
+
 @router.post("/{project_id}/act", response_model=ActResponse)
 async def run_act(
     project_id: str,
     body: ActRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Execute instruction using unified CLI system"""
     ui.info(f"Starting execution: {body.instruction[:50]}...", "ACT")
@@ -520,64 +1019,21 @@ async def run_act(
         ui.error(f"Project {project_id} not found", "ACT API")
         raise HTTPException(status_code=404, detail="Project not found")
     
+    # A retried submission returns the original request instead of running again
+    idempotency_key = idempotency_key or body.idempotency_key or body.request_id
+    existing_request = _find_idempotent_request(db, project_id, "act", idempotency_key)
+    if existing_request:
+        ui.info(f"Duplicate act submission (key {idempotency_key}), returning {existing_request.id[:8]}...", "ACT API")
+        return _replay_response(existing_request)
+    
+    _enforce_admission("ACT API")
+    
     # Determine CLI preference
     cli_preference = CLIType(body.cli_preference or project.preferred_cli)
     fallback_enabled = body.fallback_enabled if body.fallback_enabled is not None else project.fallback_enabled
     conversation_id = body.conversation_id or str(uuid.uuid4())
     
-    # 🔍 DEBUG: Log incoming request data
-    print(f"📥 ACT Request - Project: {project_id}")
-    print(f"📥 Instruction: {body.instruction[:100]}...")
-    print(f"📥 Images count: {len(body.images)}")
-    print(f"📥 Images data: {body.images}")
-    for i, img in enumerate(body.images):
-        print(f"📥 Image {i+1}: {img}")
-        if hasattr(img, '__dict__'):
-            print(f"📥 Image {i+1} dict: {img.__dict__}")
-    
-    # Extract image paths and build attachments for metadata/WS
-    image_paths = []
-    attachments = []
-    import os as _os
-    
-    print(f"🔍 Processing {len(body.images)} images...")
-    for i, img in enumerate(body.images):
-        print(f"🔍 Processing image {i+1}: {img}")
-        
-        img_dict = img if isinstance(img, dict) else img.__dict__ if hasattr(img, '__dict__') else {}
-        print(f"🔍 Image {i+1} converted to dict: {img_dict}")
-        
-        p = img_dict.get('path')
-        n = img_dict.get('name')
-        print(f"🔍 Image {i+1} - path: {p}, name: {n}")
-        
-        if p:
-            print(f"🔍 Adding path to image_paths: {p}")
-            image_paths.append(p)
-            try:
-                fname = _os.path.basename(p)
-                print(f"🔍 Processing path: {p}")
-                print(f"🔍 Extracted filename: {fname}")
-                if fname and fname.strip():
-                    attachment = {
-                        "name": n or fname,
-                        "url": f"/api/assets/{project_id}/{fname}"
-                    }
-                    print(f"🔍 Created attachment: {attachment}")
-                    attachments.append(attachment)
-                else:
-                    print(f"❌ Failed to extract filename from: {p}")
-            except Exception as e:
-                print(f"❌ Exception processing path {p}: {e}")
-                pass
-        elif n:
-            print(f"🔍 Adding name to image_paths: {n}")
-            image_paths.append(n)
-        else:
-            print(f"❌ Image {i+1} has neither path nor name!")
-    
-    print(f"🔍 Final image_paths: {image_paths}")
-    print(f"🔍 Final attachments: {attachments}")
+    images, image_paths, attachments = _prepare_images(project_id, body.images)
     
     # Save user instruction as message (with image paths in content for display)
     message_content = body.instruction
@@ -595,7 +1051,7 @@ async def run_act(
             "type": "act_instruction",
             "cli_preference": cli_preference.value,
             "fallback_enabled": fallback_enabled,
-            "has_images": len(body.images) > 0,
+            "has_images": len(images) > 0,
             "image_paths": image_paths,
             "attachments": attachments
         },
@@ -624,15 +1080,31 @@ async def run_act(
         session_id=session.id,
         instruction=body.instruction,
         request_type="act",
+        idempotency_key=idempotency_key,
         created_at=datetime.utcnow()
     )
     db.add(user_request)
     
-    try:
-        db.commit()
-    except Exception as e:
-        ui.error(f"Database commit failed: {e}", "ACT API")
-        raise
+    execution_journal.record_queued(
+        db,
+        job_id=session.id,
+        project_id=project_id,
+        kind="act",
+        request_id=request_id,
+        cli_type=cli_preference.value,
+        payload={
+            "instruction": body.instruction,
+            "conversation_id": conversation_id,
+            "images": [img.model_dump() for img in images],
+            "cli_preference": cli_preference.value,
+            "fallback_enabled": fallback_enabled,
+            "is_initial_prompt": body.is_initial_prompt
+        }
+    )
+    
+    replayed = _commit_or_replay(db, project_id, idempotency_key, "ACT API")
+    if replayed:
+        return replayed
     
     # Send initial messages
     try:
@@ -664,25 +1136,33 @@ async def run_act(
         'selected_model': project.selected_model
     }
     
-    # Add background task
-    background_tasks.add_task(
-        execute_act_task,
-        project_info,
-        session,
-        body.instruction,
-        conversation_id,
-        body.images,
-        db,
-        cli_preference,
-        fallback_enabled,
-        body.is_initial_prompt,
-        request_id
+    # Hand off to the scheduler (per-project serial, globally bounded)
+    session_id = session.id
+    queue_position = await execution_scheduler.submit(
+        project_id,
+        session_id,
+        lambda: run_scheduled_act(
+            project_info,
+            session_id,
+            body.instruction,
+            conversation_id,
+            images,
+            cli_preference,
+            fallback_enabled,
+            body.is_initial_prompt,
+            request_id
+        ),
+        kind="act",
+        request_id=request_id,
+        session_id=session_id
     )
     return ActResponse(
-        session_id=session.id,
+        session_id=session_id,
         conversation_id=conversation_id,
-        status="running",
-        message="Act execution started"
+        status="queued" if queue_position else "running",
+        message=f"Act execution queued (position {queue_position})" if queue_position else "Act execution started",
+        request_id=request_id,
+        queue_position=queue_position
     )
 
 
@@ -690,8 +1170,8 @@ async def run_act(
 async def run_chat(
     project_id: str,
     body: ActRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Execute chat instruction using unified CLI system (same as act but different event type)"""
     ui.info(f"Starting chat: {body.instruction[:50]}...", "CHAT")
@@ -701,39 +1181,21 @@ async def run_chat(
         ui.error(f"Project {project_id} not found", "CHAT API")
         raise HTTPException(status_code=404, detail="Project not found")
     
+    # A retried submission returns the original request instead of running again
+    idempotency_key = idempotency_key or body.idempotency_key or body.request_id
+    existing_request = _find_idempotent_request(db, project_id, "chat", idempotency_key)
+    if existing_request:
+        ui.info(f"Duplicate chat submission (key {idempotency_key}), returning {existing_request.id[:8]}...", "CHAT API")
+        return _replay_response(existing_request)
+    
+    _enforce_admission("CHAT API")
+    
     # Determine CLI preference
     cli_preference = CLIType(body.cli_preference or project.preferred_cli)
     fallback_enabled = body.fallback_enabled if body.fallback_enabled is not None else project.fallback_enabled
     conversation_id = body.conversation_id or str(uuid.uuid4())
     
-    # Extract image paths and build attachments for metadata/WS
-    image_paths = []
-    attachments = []
-    import os as _os2
-    for img in body.images:
-        img_dict = img if isinstance(img, dict) else img.__dict__ if hasattr(img, '__dict__') else {}
-        p = img_dict.get('path')
-        n = img_dict.get('name')
-        if p:
-            image_paths.append(p)
-            try:
-                fname = _os2.path.basename(p)
-                print(f"🔍 [CHAT] Processing path: {p}")
-                print(f"🔍 [CHAT] Extracted filename: {fname}")
-                if fname and fname.strip():
-                    attachment = {
-                        "name": n or fname,
-                        "url": f"/api/assets/{project_id}/{fname}"
-                    }
-                    print(f"🔍 [CHAT] Created attachment: {attachment}")
-                    attachments.append(attachment)
-                else:
-                    print(f"❌ [CHAT] Failed to extract filename from: {p}")
-            except Exception as e:
-                print(f"❌ [CHAT] Exception processing path {p}: {e}")
-                pass
-        elif n:
-            image_paths.append(n)
+    images, image_paths, attachments = _prepare_images(project_id, body.images)
     
     # Save user instruction as message (with image paths in content for display)
     message_content = body.instruction
@@ -751,7 +1213,7 @@ async def run_chat(
             "type": "chat_instruction",
             "cli_preference": cli_preference.value,
             "fallback_enabled": fallback_enabled,
-            "has_images": len(body.images) > 0,
+            "has_images": len(images) > 0,
             "image_paths": image_paths,
             "attachments": attachments
         },
@@ -771,11 +1233,41 @@ async def run_chat(
     )
     db.add(session)
     
-    try:
-        db.commit()
-    except Exception as e:
-        ui.error(f"Database commit failed: {e}", "CHAT API")
-        raise
+    # Create UserRequest for tracking
+    request_id = str(uuid.uuid4())
+    user_request = UserRequest(
+        id=request_id,
+        project_id=project_id,
+        user_message_id=user_message.id,
+        session_id=session.id,
+        instruction=body.instruction,
+        request_type="chat",
+        idempotency_key=idempotency_key,
+        created_at=datetime.utcnow()
+    )
+    db.add(user_request)
+    
+    execution_journal.record_queued(
+        db,
+        job_id=session.id,
+        project_id=project_id,
+        kind="chat",
+        request_id=request_id,
+        cli_type=cli_preference.value,
+        payload={
+            "instruction": body.instruction,
+            "conversation_id": conversation_id,
+            "images": [img.model_dump() for img in images],
+            "cli_preference": cli_preference.value,
+            "fallback_enabled": fallback_enabled,
+            "is_initial_prompt": body.is_initial_prompt,
+            "bypass_cache": body.bypass_cache
+        }
+    )
+    
+    replayed = _commit_or_replay(db, project_id, idempotency_key, "CHAT API")
+    if replayed:
+        return replayed
     
     # Send initial messages
     try:
@@ -790,6 +1282,7 @@ async def run_chat(
                 "parent_message_id": None,
                 "session_id": session.id,
                 "conversation_id": conversation_id,
+                "request_id": request_id,
                 "created_at": user_message.created_at.isoformat()
             },
             "timestamp": user_message.created_at.isoformat()
@@ -806,23 +1299,126 @@ async def run_chat(
         'selected_model': project.selected_model
     }
     
-    # Add background task for chat (same as act but with different event type)
-    background_tasks.add_task(
-        execute_chat_task,
-        project_info,
-        session,
-        body.instruction,
-        conversation_id,
-        body.images,
-        db,
-        cli_preference,
-        fallback_enabled,
-        body.is_initial_prompt
+    # Hand off to the scheduler (same as act but with different event type)
+    session_id = session.id
+    queue_position = await execution_scheduler.submit(
+        project_id,
+        session_id,
+        lambda: run_scheduled_chat(
+            project_info,
+            session_id,
+            body.instruction,
+            conversation_id,
+            images,
+            cli_preference,
+            fallback_enabled,
+            body.is_initial_prompt,
+            request_id,
+            body.bypass_cache
+        ),
+        kind="chat",
+        request_id=request_id,
+        session_id=session_id
     )
-    
+
     return ActResponse(
-        session_id=session.id,
+        session_id=session_id,
         conversation_id=conversation_id,
-        status="running",
-        message="Chat execution started"
+        status="queued" if queue_position else "running",
+        message=f"Chat execution queued (position {queue_position})" if queue_position else "Chat execution started",
+        request_id=request_id,
+        queue_position=queue_position
     )
+
+
+@router.get("/{project_id}/requests/{request_id}/trace")
+async def get_request_trace(
+    project_id: str,
+    request_id: str,
+    format: str = "otlp",
+    db: Session = Depends(get_db)
+):
+    """Latency spans for a finished act/chat request.
+
+    `format=otlp` (default) returns OTLP/JSON resource spans that can be posted
+    to any OpenTelemetry collector; `format=raw` returns the stored form.
+    """
+    user_request = db.query(UserRequest).filter(
+        UserRequest.id == request_id,
+        UserRequest.project_id == project_id
+    ).first()
+    if not user_request:
+        raise HTTPException(status_code=404, detail="Request not found")
+    trace = (user_request.result_metadata or {}).get("trace")
+    if not trace:
+        raise HTTPException(status_code=404, detail="No trace recorded for this request")
+    if format == "raw":
+        return trace
+    return to_otlp_json(trace)
+
+
+@router.post("/{project_id}/requests/{request_id}/cancel")
+async def cancel_request(
+    project_id: str,
+    request_id: str,
+    db: Session = Depends(get_db)
+):
+    """Cancel a queued or running act/chat request.
+
+    Queued requests are dropped from the scheduler. Running requests are asked
+    to stop through the CLI adapter; messages streamed so far are kept. If the
+    execution does not wind down within the grace period its task is cancelled.
+    """
+    user_request = db.query(UserRequest).filter(
+        UserRequest.id == request_id,
+        UserRequest.project_id == project_id
+    ).first()
+    if not user_request:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    if user_request.is_completed:
+        return {
+            "request_id": request_id,
+            "status": user_request.status,
+            "cancelled": user_request.cancelled_at is not None
+        }
+    
+    ui.info(f"Cancelling request {request_id[:8]}...", "ACT API")
+    
+    pending_job = await execution_scheduler.remove_pending(request_id)
+    if pending_job:
+        execution_journal.mark_finished(pending_job.job_id, "cancelled")
+    else:
+        job = execution_scheduler.find_job(request_id)
+        if job:
+            # With no CLI active the job may be committing; give it the same grace to finish
+            await UnifiedCLIManager.cancel_session(job.session_id)
+            await execution_scheduler.wait_for_job(job, CANCEL_GRACE_SECONDS)
+    
+    # The execution task commits on its own session; re-read its outcome
+    db.expire_all()
+    user_request = db.query(UserRequest).filter(UserRequest.id == request_id).first()
+    if user_request and not user_request.is_completed:
+        _mark_request_cancelled(db, request_id)
+        session = None
+        if user_request.session_id:
+            session = db.query(ChatSession).filter(ChatSession.id == user_request.session_id).first()
+        if session:
+            session.status = "cancelled"
+            session.completed_at = datetime.utcnow()
+        db.commit()
+        
+        await manager.broadcast_to_project(project_id, {
+            "type": "chat_complete" if user_request.request_type == "chat" else "act_complete",
+            "data": {
+                "status": "cancelled",
+                "session_id": user_request.session_id,
+                "request_id": request_id
+            }
+        })
+    
+    return {
+        "request_id": request_id,
+        "status": user_request.status if user_request else "cancelled",
+        "cancelled": True
+    }
@@ -197,7 +197,9 @@ async def get_session_status(project_id: str, session_id: str, db: Session = Dep
         "instruction": session.instruction,
         "started_at": session.started_at.isoformat() if session.started_at else None,
         "completed_at": session.completed_at.isoformat() if session.completed_at else None,
-        "duration_ms": session.duration_ms
+        "duration_ms": session.duration_ms,
+        "total_tokens": session.total_tokens or 0,
+        "total_cost_usd": float(session.total_cost_usd) if session.total_cost_usd is not None else None
     }
 
 
@@ -18,6 +18,7 @@ from app.models.projects import Project as ProjectModel
 from app.models.messages import Message
 from app.models.project_services import ProjectServiceConnection
 from app.models.sessions import Session as SessionModel
+from app.services.cli_session_store import cli_session_store
 from app.services.project.initializer import initialize_project
 from app.core.websocket.manager import manager as websocket_manager
 from app.core.config import settings
@@ -494,6 +495,7 @@ async def delete_project(project_id: str, db: Session = Depends(get_db)):
     # Delete project
     db.delete(project)
     db.commit()
+    cli_session_store.forget_project(project_id)
     
     # Clean up project files from disk
     try:
@@ -18,6 +18,7 @@ from app.models.sandbox_sessions import SandboxSession
 from app.models.messages import Message
 from app.models.project_services import ProjectServiceConnection
 from app.models.sessions import Session as SessionModel
+from app.services.cli_session_store import cli_session_store
 from app.services.project.sandbox_initializer import (
     initialize_project_sandbox,
     cleanup_project_sandbox,
@@ -383,6 +384,7 @@ async def delete_sandbox_project(
     # Delete project from database
     db.delete(project)
     db.commit()
+    cli_session_store.forget_project(project_id)
     
     return {"message": "Sandbox project deleted", "project_id": project_id}
 
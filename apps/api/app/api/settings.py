@@ -6,6 +6,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from app.services.cli.unified_manager import CursorAgentCLI
 from app.services.cli.base import CLIType
+from app.services.cli.availability import availability_cache
+from app.services.cli.usage import usage_stats
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
@@ -84,14 +86,10 @@ async def get_cli_status() -> Dict[str, Any]:
     results = {}
     
     # 새로운 UnifiedCLIManager의 CLI 인스턴스 사용
-    from app.services.cli.adapters.claude_code_sandbox import ClaudeCodeSandboxCLI
-    from app.services.cli.unified_manager import CursorAgentCLI, CodexCLI, QwenCLI, GeminiCLI
+    from app.services.cli.registry import adapter_registry
     cli_instances = {
-        "claude": ClaudeCodeSandboxCLI(),
-        "cursor": CursorAgentCLI(),
-        "codex": CodexCLI(),
-        "qwen": QwenCLI(),
-        "gemini": GeminiCLI()
+        cli_type.value: adapter_registry.get(cli_type)
+        for cli_type in (CLIType.CLAUDE, CLIType.CURSOR, CLIType.CODEX, CLIType.QWEN, CLIType.GEMINI)
     }
     
     # 모든 CLI를 병렬로 확인
@@ -100,7 +98,7 @@ async def get_cli_status() -> Dict[str, Any]:
         print(f"[DEBUG] Setting up check for CLI: {cli_id}")
         async def check_cli(cli_id, cli_instance):
             print(f"[DEBUG] Checking CLI: {cli_id}")
-            status = await cli_instance.check_availability()
+            status = await availability_cache.get(cli_instance, refresh=True)
             print(f"[DEBUG] CLI {cli_id} status: {status}")
             return cli_id, status
         
@@ -121,6 +119,12 @@ async def get_cli_status() -> Dict[str, Any]:
     return results
 
 
+@router.get("/cli-usage")
+async def get_cli_usage() -> Dict[str, Any]:
+    """CLI/모델별 토큰 사용량과 처리량(tokens/sec)을 반환합니다 (서버 시작 이후 누적)."""
+    return usage_stats.get_stats()
+
+
 # 글로벌 설정 관리를 위한 임시 메모리 저장소 (실제로는 데이터베이스에 저장해야 함)
 GLOBAL_SETTINGS = {
     "default_cli": "claude",
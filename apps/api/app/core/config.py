@@ -47,5 +47,61 @@ class Settings(BaseModel):
     preview_port_start: int = int(os.getenv("PREVIEW_PORT_START", "3100"))
     preview_port_end: int = int(os.getenv("PREVIEW_PORT_END", "3999"))
 
+    # Act/chat execution scheduling
+    max_concurrent_executions: int = int(os.getenv("MAX_CONCURRENT_EXECUTIONS", "4"))
+
+    # Admission control for act/chat (0 disables a limit)
+    max_queued_executions: int = int(os.getenv("MAX_QUEUED_EXECUTIONS", "16"))
+    admission_max_memory_percent: float = float(os.getenv("ADMISSION_MAX_MEMORY_PERCENT", "90"))
+    admission_max_load_per_cpu: float = float(os.getenv("ADMISSION_MAX_LOAD_PER_CPU", "4.0"))
+    admission_retry_after_seconds: int = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "15"))
+
+    # Duplicate act/chat submissions with the same Idempotency-Key are collapsed within this window
+    idempotency_window_seconds: int = int(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "86400"))
+
+    # Re-run executions interrupted by a restart when the CLI keeps a resumable session
+    resume_interrupted_executions: bool = os.getenv("RESUME_INTERRUPTED_EXECUTIONS", "false").lower() == "true"
+
+    # Chat-mode response cache keyed by repository state (opt-in)
+    chat_cache_enabled: bool = os.getenv("CHAT_CACHE_ENABLED", "false").lower() == "true"
+    chat_cache_ttl_seconds: float = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+    chat_cache_max_entries: int = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "256"))
+
+    # Content-addressed store for chat image attachments
+    image_store_root: str = os.getenv("IMAGE_STORE_ROOT", str(PROJECT_ROOT / "data" / "images"))
+    image_store_cache_mb: int = int(os.getenv("IMAGE_STORE_CACHE_MB", "64"))
+
+    # CLI availability cache (refresh 0 disables the background refresher)
+    cli_availability_ttl_seconds: float = float(os.getenv("CLI_AVAILABILITY_TTL_SECONDS", "300"))
+    cli_availability_failure_ttl_seconds: float = float(os.getenv("CLI_AVAILABILITY_FAILURE_TTL_SECONDS", "15"))
+    cli_availability_refresh_seconds: float = float(os.getenv("CLI_AVAILABILITY_REFRESH_SECONDS", "120"))
+
+    # Extra model name mappings merged over the built-in table ({cli: {name: provider_name}})
+    model_mappings_file: str = os.getenv("MODEL_MAPPINGS_FILE", str(PROJECT_ROOT / "data" / "model_mappings.json"))
+
+    # USD per million tokens by model ({model: {input, cached_input, output}}), used when a provider reports no cost
+    model_pricing_file: str = os.getenv("MODEL_PRICING_FILE", str(PROJECT_ROOT / "data" / "model_pricing.json"))
+
+    # Record raw provider traffic to fixtures for benchmarks/replay.py (empty disables)
+    cli_record_dir: str = os.getenv("CLI_RECORD_DIR", "")
+
+    # Provider commands (point at benchmarks/fake_providers.py for offline load tests)
+    codex_cmd: str = os.getenv("CODEX_CMD", "codex")
+    cursor_agent_cmd: str = os.getenv("CURSOR_AGENT_CMD", "cursor-agent")
+    qwen_cmd: str = os.getenv("QWEN_CMD", "")
+    gemini_cmd: str = os.getenv("GEMINI_CMD", "gemini")
+    vibekit_bridge_url: str = os.getenv("VIBEKIT_BRIDGE_URL", "http://localhost:3001")
+
+    # Pre-spawned Codex proto processes handed to the next turn (opt-in)
+    cli_prefork_enabled: bool = os.getenv("CLI_PREFORK_ENABLED", "false").lower() == "true"
+    cli_prefork_max_processes: int = int(os.getenv("CLI_PREFORK_MAX_PROCESSES", "4"))
+    cli_prefork_idle_seconds: float = float(os.getenv("CLI_PREFORK_IDLE_SECONDS", "300"))
+
+    # ACP agent process pool (Qwen, Gemini)
+    acp_pool_max_size: int = int(os.getenv("ACP_POOL_MAX_SIZE", "4"))
+    acp_pool_min_spare: int = int(os.getenv("ACP_POOL_MIN_SPARE", "1"))
+    acp_pool_idle_seconds: float = float(os.getenv("ACP_POOL_IDLE_SECONDS", "600"))
+    acp_pool_health_seconds: float = float(os.getenv("ACP_POOL_HEALTH_SECONDS", "30"))
+
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Lightweight execution tracing.
+
+Each act/chat execution gets an `ExecutionTrace` bound to a context variable,
+so the scheduler, manager and adapters can record spans without threading a
+tracer through every call. Traces are stored compactly on
+`UserRequest.result_metadata["trace"]` and can be exported as
+OpenTelemetry (OTLP/JSON) resource spans.
+"""
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class ExecutionTrace:
+    """Root span plus flat child spans for one execution"""
+
+    def __init__(self, name: str, start_ns: Optional[int] = None, **attributes: Any):
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(
+            name=name,
+            span_id=secrets.token_hex(8),
+            parent_id=None,
+            start_ns=start_ns or time.time_ns(),
+            attributes=dict(attributes),
+        )
+        self.spans: List[Span] = []
+        self._marked: set = set()
+
+    def start_span(self, name: str, start_ns: Optional[int] = None, **attributes: Any) -> Span:
+        span = Span(
+            name=name,
+            span_id=secrets.token_hex(8),
+            parent_id=self.root.span_id,
+            start_ns=start_ns or time.time_ns(),
+            attributes=dict(attributes),
+        )
+        self.spans.append(span)
+        return span
+
+    @staticmethod
+    def end_span(span: Span, **attributes: Any) -> None:
+        span.end_ns = time.time_ns()
+        span.attributes.update(attributes)
+
+    def mark(self, name: str, at_ns: Optional[int] = None, once: bool = True, **attributes: Any) -> None:
+        """Record a point-in-time stage as a zero-length span"""
+        if once and name in self._marked:
+            return
+        self._marked.add(name)
+        at = at_ns or time.time_ns()
+        span = self.start_span(name, start_ns=at, **attributes)
+        span.end_ns = at
+
+    def finish(self, **attributes: Any) -> None:
+        self.root.end_ns = time.time_ns()
+        self.root.attributes.update(attributes)
+        for span in self.spans:
+            if span.end_ns is None:
+                span.end_ns = self.root.end_ns
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact form stored on UserRequest.result_metadata"""
+        base = self.root.start_ns
+
+        def encode(span: Span) -> Dict[str, Any]:
+            end = span.end_ns or time.time_ns()
+            return {
+                "name": span.name,
+                "span_id": span.span_id,
+                "parent_span_id": span.parent_id,
+                "start_ms": round((span.start_ns - base) / 1e6, 3),
+                "duration_ms": round((end - span.start_ns) / 1e6, 3),
+                "attributes": span.attributes,
+            }
+
+        return {
+            "trace_id": self.trace_id,
+            "start_unix_nano": base,
+            "spans": [encode(self.root)] + [encode(s) for s in self.spans],
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_json(stored: Dict[str, Any], service_name: str = "claudable-api") -> Dict[str, Any]:
+    """Convert a stored trace (see `ExecutionTrace.to_dict`) into OTLP/JSON"""
+    base = int(stored["start_unix_nano"])
+    spans = []
+    for span in stored.get("spans", []):
+        start = base + int(span["start_ms"] * 1e6)
+        otlp_span = {
+            "traceId": stored["trace_id"],
+            "spanId": span["span_id"],
+            "name": span["name"],
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int(span["duration_ms"] * 1e6)),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in (span.get("attributes") or {}).items()
+                if value is not None
+            ],
+        }
+        if span.get("parent_span_id"):
+            otlp_span["parentSpanId"] = span["parent_span_id"]
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+_current_trace: ContextVar[Optional[ExecutionTrace]] = ContextVar("execution_trace", default=None)
+
+
+def current_trace() -> Optional[ExecutionTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def use_trace(trace: ExecutionTrace) -> Iterator[ExecutionTrace]:
+    """Bind `trace` for everything awaited from the current task"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def trace_span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record a span on the current trace; no-op when none is bound"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    span = trace.start_span(name, **attributes)
+    try:
+        yield span
+    except BaseException as e:
+        span.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        trace.end_span(span)
+
+
+def trace_mark(name: str, at_ns: Optional[int] = None, **attributes: Any) -> None:
+    """Record a one-off stage on the current trace; no-op when none is bound"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(name, at_ns=at_ns, **attributes)
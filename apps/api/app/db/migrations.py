@@ -1,24 +1,67 @@
 """Database migrations module for SQLite."""
 
 import logging
-from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import inspect, text
 
 logger = logging.getLogger(__name__)
 
 
-def run_sqlite_migrations(db_path: Optional[str] = None) -> None:
+# Columns added after a table was first shipped. `create_all` only creates
+# missing tables, so existing databases need these applied with ALTER TABLE.
+_ADDITIVE_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "user_requests": [
+        ("cancelled_at", "DATETIME"),
+        ("idempotency_key", "VARCHAR(128)"),
+    ],
+}
+
+# Unique indexes added to existing tables: (table, index name, columns).
+_ADDITIVE_UNIQUE_INDEXES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("user_requests", "ux_user_requests_project_idempotency", ("project_id", "idempotency_key")),
+]
+
+
+def run_sqlite_migrations(engine: Any = None) -> None:
     """
     Run SQLite database migrations.
     
     Args:
-        db_path: Path to the SQLite database file
+        engine: SQLAlchemy engine bound to the SQLite database
     """
-    if db_path:
-        logger.info(f"Running migrations for SQLite database at: {db_path}")
-    else:
-        logger.info("Running migrations for in-memory SQLite database")
-    
-    # Add migration logic here as needed
-    # For now, this is a placeholder that ensures the module exists
-    pass
\ No newline at end of file
+    if engine is None:
+        logger.info("No engine provided; skipping SQLite migrations")
+        return
+
+    logger.info(f"Running migrations for SQLite database at: {engine.url}")
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as conn:
+        for table, columns in _ADDITIVE_COLUMNS.items():
+            if table not in existing_tables:
+                continue
+            present = {col["name"] for col in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name in present:
+                    continue
+                logger.info(f"Adding column {table}.{name}")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+        for table, name, columns in _ADDITIVE_UNIQUE_INDEXES:
+            if table not in existing_tables:
+                continue
+            if name in {index["name"] for index in inspector.get_indexes(table)}:
+                continue
+            # Rows written before the index existed may repeat a key; keep the
+            # newest row's key so the index can be built (NULLs never collide)
+            key_columns = ", ".join(columns)
+            not_null = " AND ".join(f"{col} IS NOT NULL" for col in columns)
+            logger.info(f"Adding unique index {name} on {table}({key_columns})")
+            conn.execute(text(
+                f"UPDATE {table} SET {columns[-1]} = NULL WHERE {not_null} AND rowid NOT IN "
+                f"(SELECT MAX(rowid) FROM {table} WHERE {not_null} GROUP BY {key_columns})"
+            ))
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({key_columns})"))
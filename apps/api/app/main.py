@@ -20,6 +20,10 @@ from app.db.base import Base
 import app.models  # noqa: F401 ensures models are imported for metadata
 from app.db.session import engine
 from app.db.migrations import run_sqlite_migrations
+from app.services.cli.availability import availability_cache
+from app.services.cli.acp_pool import stop_all_pools
+from app.services.cli.prefork import stop_all_preforks
+from app.services.execution_journal import execution_journal
 import os
 
 configure_logging()
@@ -85,6 +89,9 @@ def on_startup() -> None:
     # Run lightweight SQLite migrations for additive changes
     run_sqlite_migrations(engine)
     
+    # Settle executions a previous process left running (kill CLIs, fail or requeue)
+    execution_journal.reconcile()
+    
     # Show available endpoints
     ui.info("API server ready")
     ui.panel(
@@ -103,3 +110,19 @@ def on_startup() -> None:
         "Port": os.getenv("PORT", "8000")
     }
     ui.status_line(env_info)
+
+
+@app.on_event("startup")
+async def resume_executions() -> None:
+    # Re-submit executions selected during reconciliation (needs the event loop)
+    await execution_journal.resume_pending()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    # Stop background CLI availability refresh
+    await availability_cache.stop()
+    # Terminate pooled ACP agent processes
+    await stop_all_pools()
+    # Terminate pre-spawned Codex processes
+    await stop_all_preforks()
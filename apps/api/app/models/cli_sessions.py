@@ -0,0 +1,26 @@
+"""
+CLI Session Model
+Provider-side session state per project and CLI (replaces the JSON blob in Project.active_cursor_session_id)
+"""
+from sqlalchemy import String, DateTime, ForeignKey, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+from app.db.base import Base
+
+
+class CLISession(Base):
+    """One row per (project, CLI); written through the cli_session_store cache"""
+    __tablename__ = "cli_sessions"
+
+    project_id: Mapped[str] = mapped_column(
+        String(64),
+        ForeignKey("projects.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    cli_type: Mapped[str] = mapped_column(String(32), primary_key=True)  # claude, cursor, codex, qwen, gemini
+
+    session_id: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)  # Provider session/chat ID
+    rollout_path: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Codex rollout file for resume
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,44 @@
+"""
+Execution Journal Model
+Durable record of scheduled act/chat executions, used to reconcile after restarts
+"""
+from sqlalchemy import String, DateTime, ForeignKey, Integer, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+from app.db.base import Base
+
+
+class ExecutionJournalEntry(Base):
+    """One row per scheduled execution (keyed by chat session ID)"""
+    __tablename__ = "execution_journal"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)  # Chat session ID (scheduler job ID)
+    project_id: Mapped[str] = mapped_column(
+        String(64),
+        ForeignKey("projects.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False
+    )
+    request_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    kind: Mapped[str] = mapped_column(String(16), default="act")  # act, chat
+
+    # queued -> running -> finished
+    state: Mapped[str] = mapped_column(String(16), default="queued", index=True)
+    outcome: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)  # completed, failed, cancelled, interrupted, resumed
+
+    # Everything needed to re-submit the execution
+    cli_type: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    payload: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+
+    # Process bookkeeping for cleanup after a crash
+    api_pid: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    child_pids: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<ExecutionJournalEntry(id={self.id}, kind={self.kind}, state={self.state})>"
@@ -2,7 +2,7 @@
 User Request Model
 사용자 요청별 작업 상태 추적 모델
 """
-from sqlalchemy import String, DateTime, ForeignKey, Boolean, Text, JSON
+from sqlalchemy import String, DateTime, ForeignKey, Boolean, Text, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 from typing import Optional, Dict, Any
@@ -12,6 +12,10 @@ from app.db.base import Base
 class UserRequest(Base):
     """사용자 요청별 작업 상태 추적 테이블"""
     __tablename__ = "user_requests"
+    __table_args__ = (
+        # 동시 재시도가 같은 키로 두 번 삽입되지 않도록 DB에서 보장
+        Index("ux_user_requests_project_idempotency", "project_id", "idempotency_key", unique=True),
+    )
 
     # 기본 식별자
     id: Mapped[str] = mapped_column(String(64), primary_key=True)  # request_id
@@ -43,6 +47,7 @@ class UserRequest(Base):
     # 요청 정보
     instruction: Mapped[str] = mapped_column(Text, nullable=False)  # 사용자 요청 내용
     request_type: Mapped[str] = mapped_column(String(16), default="act")  # act, chat
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(128), index=True, nullable=True)  # 클라이언트 재시도 중복 방지
     
     # 완료 상태 추적
     is_completed: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False, index=True)
@@ -60,6 +65,7 @@ class UserRequest(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    cancelled_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     
     # Relationships
     project = relationship("Project", back_populates="user_requests")
@@ -76,6 +82,8 @@ class UserRequest(Base):
     @property 
     def status(self) -> str:
         """요청 상태 반환"""
+        if self.cancelled_at is not None:
+            return "cancelled"
         if not self.is_completed:
             return "pending" if not self.started_at else "running"
         elif self.is_successful is True:
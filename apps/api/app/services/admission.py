@@ -0,0 +1,92 @@
+"""
+Admission Control
+Sheds new act/chat requests when the scheduler backlog or the host is saturated
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+from app.services.execution_scheduler import ExecutionScheduler, execution_scheduler
+
+
+@dataclass
+class AdmissionRejection:
+    """Why a request was not admitted and when the client should retry"""
+    reason: str
+    retry_after: int
+
+
+def _memory_used_percent() -> Optional[float]:
+    """Host memory in use, from /proc/meminfo (None where unavailable)"""
+    try:
+        values = {}
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                values[key] = int(rest.split()[0])
+        total = values.get("MemTotal")
+        available = values.get("MemAvailable")
+        if not total or available is None:
+            return None
+        return (1 - available / total) * 100
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _load_per_cpu() -> Optional[float]:
+    """1-minute load average divided by CPU count (None where unavailable)"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class AdmissionController:
+    """Decides whether a new execution may enter the scheduler.
+
+    Limits come from settings; a value of 0 disables that check. Running work
+    is already capped by the scheduler, so the backlog limit bounds how long
+    admitted requests can wait behind each other.
+    """
+
+    def __init__(self, scheduler: ExecutionScheduler):
+        self.scheduler = scheduler
+
+    def _retry_after(self, queued: int) -> int:
+        # Scale the hint with how many scheduler "rounds" the backlog needs to drain
+        rounds = 1 + queued // max(1, self.scheduler.max_concurrency)
+        return settings.admission_retry_after_seconds * rounds
+
+    def check(self) -> Optional[AdmissionRejection]:
+        """Return a rejection if the request should be shed, else None"""
+        stats = self.scheduler.get_stats()
+        queued = stats["queued"]
+
+        if settings.max_queued_executions and queued >= settings.max_queued_executions:
+            return AdmissionRejection(
+                reason=f"Execution queue is full ({queued} waiting)",
+                retry_after=self._retry_after(queued),
+            )
+
+        if settings.admission_max_memory_percent:
+            memory = _memory_used_percent()
+            if memory is not None and memory >= settings.admission_max_memory_percent:
+                return AdmissionRejection(
+                    reason=f"Host memory usage is {memory:.0f}%",
+                    retry_after=self._retry_after(queued),
+                )
+
+        if settings.admission_max_load_per_cpu:
+            load = _load_per_cpu()
+            if load is not None and load >= settings.admission_max_load_per_cpu:
+                return AdmissionRejection(
+                    reason=f"Host load is {load:.1f} per CPU",
+                    retry_after=self._retry_after(queued),
+                )
+
+        return None
+
+
+# Global admission controller
+admission_controller = AdmissionController(execution_scheduler)
@@ -0,0 +1,88 @@
+"""
+Chat Response Cache
+Replays chat-mode answers for identical questions against an unchanged repository
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.terminal_ui import ui
+
+
+@dataclass
+class CachedChatResponse:
+    """Assistant messages produced by one chat execution"""
+    messages: List[Dict[str, Any]]  # role, message_type, content, metadata_json
+    cli_used: Optional[str]
+    stored_at: float
+
+
+class ChatResponseCache:
+    """In-memory LRU keyed by (project, instruction, model, CLI, working tree hash).
+
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_entries` is reached. Chat runs that change the tree are
+    never stored, so a hit always describes the tree the question is asked
+    against.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, CachedChatResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        project_id: str,
+        instruction: str,
+        model: Optional[str],
+        cli_type: str,
+        tree_hash: str,
+    ) -> str:
+        raw = json.dumps([project_id, instruction.strip(), model or "", cli_type, tree_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedChatResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.monotonic() - entry.stored_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, messages: List[Dict[str, Any]], cli_used: Optional[str]) -> None:
+        if not messages:
+            return
+        self._entries[key] = CachedChatResponse(
+            messages=messages, cli_used=cli_used, stored_at=time.monotonic()
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        ui.debug(f"Cached chat response ({len(messages)} messages, {len(self._entries)} entries)", "Cache")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global chat response cache
+chat_response_cache = ChatResponseCache(
+    ttl=settings.chat_cache_ttl_seconds,
+    max_entries=settings.chat_cache_max_entries,
+)
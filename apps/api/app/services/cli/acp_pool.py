@@ -0,0 +1,261 @@
+"""Warm pool of ACP agent processes (Qwen, Gemini).
+
+Each project is bound to its own initialized agent process while the pool
+has room; beyond `max_size` projects share the least-loaded process. Spare
+processes are spawned and initialized ahead of demand, dead ones are dropped
+by a periodic health check, and processes idle for `idle_seconds` are stopped.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.core.terminal_ui import ui
+
+from .process import create_detached_task
+
+
+@dataclass(eq=False)
+class _PooledClient:
+    client: Any  # _ACPClient
+    keys: Set[str] = field(default_factory=set)
+    leases: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def alive(self) -> bool:
+        return bool(getattr(self.client, "is_alive", False))
+
+
+class ACPClientPool:
+    """Project-affine pool of started, `initialize`d ACP clients"""
+
+    def __init__(
+        self,
+        label: str,
+        spawn: Callable[[], Awaitable[Any]],
+        max_size: int = 4,
+        min_spare: int = 1,
+        idle_seconds: float = 600.0,
+        health_interval: float = 30.0,
+    ):
+        self.label = label
+        self._spawn_client = spawn
+        self.max_size = max(1, max_size)
+        self.min_spare = max(0, min(min_spare, self.max_size - 1))
+        self.idle_seconds = idle_seconds
+        self.health_interval = health_interval
+        self._clients: List[_PooledClient] = []  # Bound or shared
+        self._spares: List[_PooledClient] = []
+        self._bound: Dict[str, _PooledClient] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._spawning = 0  # Clients being spawned for a waiting key
+        self._spawning_spares = 0
+        self._lock = asyncio.Lock()
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._refill_task: Optional[asyncio.Task] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._clients) + len(self._spares) + self._spawning + self._spawning_spares
+
+    @asynccontextmanager
+    async def lease(self, key: str) -> AsyncIterator[Any]:
+        """Client bound to `key` for the duration of one turn"""
+        entry = await self._acquire(key)
+        entry.leases += 1
+        try:
+            yield entry.client
+        finally:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+
+    async def _acquire(self, key: str) -> _PooledClient:
+        self._ensure_maintenance()
+        while True:
+            async with self._lock:
+                entry = self._bound.get(key)
+                if entry is not None:
+                    if entry.alive:
+                        return entry
+                    ui.warning(f"{self.label} agent for {key} exited; replacing", self.label)
+                    await self._drop(entry)
+                pending = self._pending.get(key)
+                if pending is None:
+                    entry = self._take_spare() or await self._share_if_full()
+                    if entry is not None:
+                        self._bind(key, entry)
+                        self._schedule_refill()
+                        return entry
+                    pending = asyncio.get_running_loop().create_future()
+                    self._pending[key] = pending
+                    self._spawning += 1
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                # Another turn for the same key is already spawning its client
+                try:
+                    await asyncio.shield(pending)
+                except Exception:
+                    pass
+                continue
+            try:
+                client = await self._spawn_client()
+            except BaseException:
+                async with self._lock:
+                    self._spawning -= 1
+                    self._pending.pop(key, None)
+                # Waiters retry and spawn on their own
+                pending.set_result(None)
+                raise
+            async with self._lock:
+                self._spawning -= 1
+                entry = _PooledClient(client=client)
+                self._clients.append(entry)
+                self._bind(key, entry)
+                self._pending.pop(key, None)
+            pending.set_result(None)
+            self._schedule_refill()
+            return entry
+
+    def _bind(self, key: str, entry: _PooledClient) -> None:
+        entry.keys.add(key)
+        entry.last_used = time.monotonic()
+        self._bound[key] = entry
+
+    def _take_spare(self) -> Optional[_PooledClient]:
+        while self._spares:
+            entry = self._spares.pop()
+            if entry.alive:
+                self._clients.append(entry)
+                return entry
+            asyncio.create_task(entry.client.stop())
+        return None
+
+    async def _share_if_full(self) -> Optional[_PooledClient]:
+        """At capacity: evict the least recently used idle client, else shard onto the least loaded one"""
+        if self.size < self.max_size:
+            return None
+        idle = [e for e in self._clients if e.leases == 0]
+        if idle:
+            victim = min(idle, key=lambda e: e.last_used)
+            ui.debug(f"{self.label} pool full; evicting agent for {sorted(victim.keys)}", self.label)
+            await self._drop(victim)
+            return None
+        live = [e for e in self._clients if e.alive]
+        if not live:
+            return None
+        return min(live, key=lambda e: (e.leases, len(e.keys)))
+
+    async def _drop(self, entry: _PooledClient) -> None:
+        for key in entry.keys:
+            if self._bound.get(key) is entry:
+                del self._bound[key]
+        entry.keys.clear()
+        if entry in self._clients:
+            self._clients.remove(entry)
+        if entry in self._spares:
+            self._spares.remove(entry)
+        try:
+            await entry.client.stop()
+        except Exception as e:
+            ui.debug(f"{self.label} agent stop failed: {e}", self.label)
+
+    # Background tasks run in a fresh context so that spares and health checks
+    # are not journaled, traced or DB-bound to the request that scheduled them
+
+    def _schedule_refill(self) -> None:
+        if self.min_spare and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = create_detached_task(self._refill())
+
+    async def _refill(self) -> None:
+        while True:
+            async with self._lock:
+                if len(self._spares) + self._spawning_spares >= self.min_spare or self.size >= self.max_size:
+                    return
+                self._spawning_spares += 1
+            try:
+                client = await self._spawn_client()
+            except Exception as e:
+                ui.warning(f"{self.label} warm spare failed to start: {e}", self.label)
+                return
+            finally:
+                async with self._lock:
+                    self._spawning_spares -= 1
+            async with self._lock:
+                self._spares.append(_PooledClient(client=client))
+            ui.debug(f"{self.label} warm spare ready ({len(self._spares)} idle)", self.label)
+
+    def _ensure_maintenance(self) -> None:
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = create_detached_task(self._maintain())
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                ui.warning(f"{self.label} pool maintenance failed: {e}", self.label)
+
+    async def check_health(self) -> None:
+        """Drop exited agents and stop those idle past `idle_seconds`"""
+        now = time.monotonic()
+        async with self._lock:
+            for entry in list(self._clients) + list(self._spares):
+                if not entry.alive:
+                    ui.warning(f"{self.label} agent exited; removing from pool", self.label)
+                    await self._drop(entry)
+                elif entry.leases == 0 and entry in self._clients and now - entry.last_used > self.idle_seconds:
+                    ui.debug(f"{self.label} agent for {sorted(entry.keys)} idle; stopping", self.label)
+                    await self._drop(entry)
+        self._schedule_refill()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_size": self.max_size,
+            "clients": len(self._clients),
+            "spares": len(self._spares),
+            "spawning": self._spawning + self._spawning_spares,
+            "bound_projects": len(self._bound),
+            "active_leases": sum(e.leases for e in self._clients),
+        }
+
+    async def stop(self) -> None:
+        for task in (self._maintenance_task, self._refill_task):
+            if task and not task.done():
+                task.cancel()
+        async with self._lock:
+            for entry in list(self._clients) + list(self._spares):
+                await self._drop(entry)
+
+
+_pools: Dict[str, ACPClientPool] = {}
+
+
+def get_acp_pool(label: str, spawn: Callable[[], Awaitable[Any]]) -> ACPClientPool:
+    """Pool for one ACP CLI, created on first use with the configured limits"""
+    pool = _pools.get(label)
+    if pool is None:
+        from app.core.config import settings
+
+        pool = ACPClientPool(
+            label,
+            spawn,
+            max_size=settings.acp_pool_max_size,
+            min_spare=settings.acp_pool_min_spare,
+            idle_seconds=settings.acp_pool_idle_seconds,
+            health_interval=settings.acp_pool_health_seconds,
+        )
+        _pools[label] = pool
+    return pool
+
+
+async def stop_all_pools() -> None:
+    for pool in list(_pools.values()):
+        await pool.stop()
+    _pools.clear()
@@ -5,16 +5,18 @@ Uses VibeKit sandbox for Claude Code execution
 from __future__ import annotations
 
 import asyncio
-import os
 import uuid
 from datetime import datetime
 from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
 
 from app.core.terminal_ui import ui
+from app.core.tracing import trace_span
 from app.models.messages import Message
+from app.services.cli_session_store import cli_session_store
 from app.services.vibekit_service import get_vibekit_service
 
 from ..base import BaseCLI, CLIType
+from ..usage import parse_usage
 
 
 class ClaudeCodeSandboxCLI(BaseCLI):
@@ -22,12 +24,7 @@ class ClaudeCodeSandboxCLI(BaseCLI):
 
     def __init__(self):
         super().__init__(CLIType.CLAUDE)
-        self.session_mapping: Dict[str, str] = {}
-        self.session_id: Optional[str] = None
-
-    def set_session_id(self, session_id: str) -> None:
-        """Set session ID for the CLI"""
-        self.session_id = session_id
+        self._active_projects: Dict[str, str] = {}  # Our session ID -> project ID while generating
 
     async def check_availability(self) -> Dict[str, Any]:
         """Check if VibeKit sandbox is available"""
@@ -77,31 +74,8 @@ class ClaudeCodeSandboxCLI(BaseCLI):
         if log_callback:
             await log_callback("Starting sandbox execution...")
 
-        # Extract project ID from project path or get from database
-        project_id = self._extract_project_id(project_path)
-        if not project_id:
-            # Try to get project ID from database using session_id
-            try:
-                from app.models.projects import Project
-                from app.db.session import get_db
-                db_session = next(get_db())
-                # Look for project with this session_id in any of the session fields
-                project = db_session.query(Project).filter(
-                    (Project.active_claude_session_id == session_id) |
-                    (Project.active_cursor_session_id == session_id)
-                ).first()
-                if project:
-                    project_id = project.id
-                    ui.info(f"Found project ID from database: {project_id}", "Claude Sandbox")
-                else:
-                    # Fallback to using session_id as project_id
-                    project_id = session_id.split('-')[0] if '-' in session_id else session_id
-                    ui.warning(f"Using session_id as project_id: {project_id}", "Claude Sandbox")
-            except Exception as e:
-                ui.warning(f"Could not get project from database: {e}", "Claude Sandbox")
-                project_id = session_id.split('-')[0] if '-' in session_id else session_id
-                ui.warning(f"Using session_id as project_id: {project_id}", "Claude Sandbox")
-        
+        project_id = self.resolve_project_id(project_path)
+
         if not project_id:
             ui.error("Could not extract project ID from path or session", "Claude Sandbox")
             yield Message(
@@ -122,6 +96,7 @@ class ClaudeCodeSandboxCLI(BaseCLI):
         try:
             # Get VibeKit service for this project
             vibekit = get_vibekit_service(project_id)
+            self._active_projects[session_id or ""] = project_id
             
             # Initialize sandbox if not already done
             if not vibekit.sandbox_id:
@@ -143,7 +118,8 @@ class ClaudeCodeSandboxCLI(BaseCLI):
                     created_at=datetime.utcnow()
                 )
                 
-                await vibekit.initialize_sandbox()
+                with trace_span("sandbox.init", project_id=project_id):
+                    await vibekit.initialize_sandbox()
 
             # Resume session if provided
             if session_id:
@@ -453,8 +429,9 @@ class ClaudeCodeSandboxCLI(BaseCLI):
                     # Get current session ID for resumption
                     current_session = await vibekit.get_session()
                     if current_session:
-                        self.session_mapping[project_id] = current_session
-                    
+                        await self.set_session_id(project_id, current_session)
+
+                    usage = parse_usage(chunk)
                     yield Message(
                         id=str(uuid.uuid4()),
                         project_id=project_id,
@@ -465,33 +442,32 @@ class ClaudeCodeSandboxCLI(BaseCLI):
                             "sandbox_id": vibekit.sandbox_id,
                             "session_id": current_session,
                             "cli_type": "claude",
-                            "event_type": "completion"
+                            "event_type": "completion",
+                            **({"usage": usage.to_dict()} if usage else {}),
                         },
                         session_id=session_id,
                         created_at=datetime.utcnow()
             )
 
-    def _extract_project_id(self, project_path: str) -> Optional[str]:
-        """Extract project ID from project path"""
-        try:
-            # Project path format: /path/to/projects/{project_id}/repo
-            parts = project_path.split(os.sep)
-            if "projects" in parts:
-                projects_index = parts.index("projects")
-                if projects_index + 1 < len(parts):
-                    return parts[projects_index + 1]
-            return None
-        except Exception:
-            return None
+    async def cancel(self, session_id: Optional[str] = None) -> None:
+        """Cancel the in-flight sandbox generation for this session"""
+        project_id = self._active_projects.pop(session_id or "", None)
+        if not project_id:
+            return
+        ui.info(f"Cancelling sandbox generation for project {project_id}", "Claude Sandbox")
+        await get_vibekit_service(project_id).cancel_generation()
 
     async def get_session_id(self, project_id: str) -> Optional[str]:
-        """Get session ID for project"""
-        return self.session_mapping.get(project_id)
+        """Get stored session ID for project"""
+        return self.provider_session(project_id).session_id
+
+    async def set_session_id(self, project_id: str, session_id: str) -> None:
+        """Store session ID for project (write-through to cli_sessions)"""
+        self.save_provider_session(project_id, session_id=session_id)
 
     async def cleanup_session(self, project_id: str) -> None:
         """Cleanup session for project"""
-        if project_id in self.session_mapping:
-            del self.session_mapping[project_id]
+        cli_session_store.clear(project_id, self.cli_type.value)
         
         # Cleanup sandbox
         try:
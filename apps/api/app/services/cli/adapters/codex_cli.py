@@ -7,15 +7,23 @@ from __future__ import annotations
 import asyncio
 import json
 import os
+import shlex
 import subprocess
 import uuid
 from datetime import datetime
 from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
 
+from app.core.config import settings
 from app.core.terminal_ui import ui
+from app.core.tracing import trace_span
 from app.models.messages import Message
+from app.services.image_store import image_store
 
-from ..base import BaseCLI, CLIType
+from .codex_rollouts import rollout_index
+from ..base import BaseCLI, CLIType, NDJSONDecoder, notify_process_spawned, terminate_process
+from ..prefork import get_process_prefork
+from ..process import spawn_cli_process
+from ..usage import TokenUsage, parse_usage
 
 
 class CodexCLI(BaseCLI):
@@ -24,16 +32,16 @@ class CodexCLI(BaseCLI):
     def __init__(self, db_session=None):
         super().__init__(CLIType.CODEX)
         self.db_session = db_session
-        self._session_store = {}  # Fallback for when db_session is not available
+        self._processes: Dict[str, asyncio.subprocess.Process] = {}  # Running processes by session
 
     async def check_availability(self) -> Dict[str, Any]:
         """Check if Codex CLI is available"""
         print(f"[DEBUG] CodexCLI.check_availability called")
         try:
             # Check if codex is installed and working
-            print(f"[DEBUG] Running command: codex --version")
+            print(f"[DEBUG] Running command: {settings.codex_cmd} --version")
             result = await asyncio.create_subprocess_shell(
-                "codex --version",
+                f"{settings.codex_cmd} --version",
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
             )
@@ -102,7 +110,7 @@ class CodexCLI(BaseCLI):
         ui.info(f"Starting Codex execution with model: {cli_model}", "Codex")
 
         # Get project ID for session management
-        project_id = project_path.split("/")[-1] if "/" in project_path else project_path
+        project_id = self.resolve_project_id(project_path)
 
         # Determine the repo path - Codex should run in repo directory
         project_repo_path = os.path.join(project_path, "repo")
@@ -121,7 +129,7 @@ class CodexCLI(BaseCLI):
         )
 
         cmd = [
-            "codex",
+            *shlex.split(settings.codex_cmd),
             "--cd",
             workdir_abs,
             "proto",
@@ -156,7 +164,9 @@ class CodexCLI(BaseCLI):
                 )
             else:
                 # Try to find latest rollout file for this project
-                latest_rollout = self._find_latest_rollout_for_project(project_id)
+                latest_rollout = await asyncio.to_thread(
+                    self._find_latest_rollout_for_project, project_id, workdir_abs
+                )
                 if latest_rollout and os.path.exists(latest_rollout):
                     cmd.extend(["-c", f"experimental_resume={latest_rollout}"])
                     ui.info(
@@ -167,75 +177,94 @@ class CodexCLI(BaseCLI):
         else:
             ui.debug("Codex resume disabled (fresh session)", "Codex")
 
+        process = None
         try:
-            # Start Codex process
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=project_repo_path,
-            )
+            # Start Codex process (proto takes the instruction on stdin, so a
+            # pre-spawned process with the same arguments can be used)
+            prefork = get_process_prefork("codex")
+            with trace_span("process.spawn", cli="codex", prefork=prefork is not None):
+                if prefork is not None:
+                    # A resumed rollout is superseded by this turn's, so a spare would be stale
+                    resumes = any(arg.startswith("experimental_resume=") for arg in cmd)
+                    process = await prefork.acquire(cmd, project_repo_path, repeatable=not resumes)
+                else:
+                    process = await spawn_cli_process(cmd, project_repo_path, label="codex")
+            self._processes[session_id or ""] = process
+            notify_process_spawned(process, "codex")
 
             # Message buffering
             agent_message_buffer = ""
             current_request_id = None
+            turn_usage = TokenUsage()
 
             # Wait for session_configured
             session_ready = False
             timeout_count = 0
-            max_timeout = 100  # Max lines to read for session init
+            max_timeout = 100  # Max events to read for session init
 
-            while not session_ready and timeout_count < max_timeout:
-                line = await process.stdout.readline()
-                if not line:
-                    break
+            decoder = NDJSONDecoder(label="Codex")
+            events = decoder.iter_stream(process.stdout)
 
-                line_str = line.decode().strip()
-                if not line_str:
-                    timeout_count += 1
+            async for event in events:
+                if not isinstance(event, dict):
                     continue
+                if event.get("msg", {}).get("type") == "session_configured":
+                    session_info = event["msg"]
+                    codex_session_id = session_info.get("session_id")
+                    if codex_session_id:
+                        await self.set_session_id(project_id, codex_session_id)
+
+                    ui.success(
+                        f"Codex session configured: {codex_session_id}", "Codex"
+                    )
 
-                try:
-                    event = json.loads(line_str)
-                    if event.get("msg", {}).get("type") == "session_configured":
-                        session_info = event["msg"]
-                        codex_session_id = session_info.get("session_id")
-                        if codex_session_id:
-                            await self.set_session_id(project_id, codex_session_id)
-
-                        ui.success(
-                            f"Codex session configured: {codex_session_id}", "Codex"
-                        )
-
-                        # Send init message (hidden)
-                        yield Message(
-                            id=str(uuid.uuid4()),
-                            project_id=project_path,
-                            role="system",
-                            message_type="system",
-                            content=(
-                                f"🚀 Codex initialized (Model: {session_info.get('model', cli_model)})"
-                            ),
-                            metadata_json={
-                                "cli_type": self.cli_type.value,
-                                "hidden_from_ui": True,
-                            },
-                            session_id=session_id,
-                            created_at=datetime.utcnow(),
-                        )
+                    # Send init message (hidden)
+                    yield Message(
+                        id=str(uuid.uuid4()),
+                        project_id=project_path,
+                        role="system",
+                        message_type="system",
+                        content=(
+                            f"🚀 Codex initialized (Model: {session_info.get('model', cli_model)})"
+                        ),
+                        metadata_json={
+                            "cli_type": self.cli_type.value,
+                            "hidden_from_ui": True,
+                        },
+                        session_id=session_id,
+                        created_at=datetime.utcnow(),
+                    )
 
-                        # After initialization, set approval policy to auto-approve
-                        await self._set_codex_approval_policy(process, session_id or "")
+                    # After initialization, set approval policy to auto-approve
+                    await self._set_codex_approval_policy(process, session_id or "")
 
-                        session_ready = True
-                        break
-                except json.JSONDecodeError:
-                    timeout_count += 1
-                    continue
+                    session_ready = True
+                    break
+                timeout_count += 1
+                if timeout_count >= max_timeout:
+                    break
 
             if not session_ready:
-                ui.error("Failed to initialize Codex session", "Codex")
+                if process.returncode is None:
+                    await terminate_process(process)
+                else:
+                    await process.wait()
+                detail = process.failure_detail()
+                ui.error(f"Failed to initialize Codex session ({detail})", "Codex")
+                yield Message(
+                    id=str(uuid.uuid4()),
+                    project_id=project_path,
+                    role="assistant",
+                    message_type="error",
+                    content=f"❌ Codex failed to start a session. {detail}".strip(),
+                    metadata_json={
+                        "error": "session_init_failed",
+                        "cli_type": "codex",
+                        "stderr_tail": process.stderr_tail.text(),
+                    },
+                    session_id=session_id,
+                    created_at=datetime.utcnow(),
+                )
                 return
 
             # Send user input
@@ -304,6 +333,12 @@ Do not create subdirectories unless specifically requested by the user.
                         return default
 
                 for i, image_data in enumerate(images):
+                    # Image store references: Codex reads the stored file directly
+                    stored = image_store.resolve(image_data)
+                    if stored:
+                        items.append({"type": "local_image", "path": stored.path})
+                        continue
+
                     # Support direct local path
                     local_path = _iget(image_data, "path")
                     if local_path:
@@ -370,46 +405,164 @@ Do not create subdirectories unless specifically requested by the user.
                 ui.debug(f"Sent user input: {request_id}", "Codex")
 
             # Process streaming events
-            async for line in process.stdout:
-                line_str = line.decode().strip()
-                if not line_str:
+            async for event in events:
+                if not isinstance(event, dict):
+                    continue
+                event_id = event.get("id", "")
+                msg_type = event.get("msg", {}).get("type")
+
+                # Only process events for current request (exclude system events)
+                if (
+                    current_request_id
+                    and event_id != current_request_id
+                    and msg_type not in [
+                        "session_configured",
+                        "mcp_list_tools_response",
+                    ]
+                ):
                     continue
 
-                try:
-                    event = json.loads(line_str)
-                    event_id = event.get("id", "")
-                    msg_type = event.get("msg", {}).get("type")
-
-                    # Only process events for current request (exclude system events)
-                    if (
-                        current_request_id
-                        and event_id != current_request_id
-                        and msg_type not in [
-                            "session_configured",
-                            "mcp_list_tools_response",
-                        ]
-                    ):
-                        continue
+                # Buffer agent message deltas
+                if msg_type == "agent_message_delta":
+                    agent_message_buffer += event["msg"]["delta"]
+                    continue
 
-                    # Buffer agent message deltas
-                    if msg_type == "agent_message_delta":
-                        agent_message_buffer += event["msg"]["delta"]
+                # Only flush buffered assistant text on final assistant message or at task completion.
+                # This avoids creating multiple assistant bubbles separated by tool events.
+                if msg_type == "agent_message":
+                    # If Codex sent a final message without deltas, use it directly
+                    if not agent_message_buffer:
+                        try:
+                            final_msg = event.get("msg", {}).get("message")
+                            if isinstance(final_msg, str) and final_msg:
+                                agent_message_buffer = final_msg
+                        except Exception:
+                            pass
+                    if not agent_message_buffer:
+                        # Nothing to flush
                         continue
+                    yield Message(
+                        id=str(uuid.uuid4()),
+                        project_id=project_path,
+                        role="assistant",
+                        message_type="chat",
+                        content=agent_message_buffer,
+                        metadata_json={"cli_type": self.cli_type.value},
+                        session_id=session_id,
+                        created_at=datetime.utcnow(),
+                    )
+                    agent_message_buffer = ""
+
+                if msg_type == "token_count":
+                    # Newer builds nest usage under `info`, where total_token_usage
+                    # covers the whole conversation (earlier turns included), so
+                    # only last_token_usage, the latest model response, is summed.
+                    # Older builds send that per-response usage at the top level.
+                    info = event["msg"].get("info")
+                    if isinstance(info, dict):
+                        response_usage = parse_usage(info.get("last_token_usage"))
+                    else:
+                        response_usage = parse_usage(event["msg"])
+                    if response_usage:
+                        turn_usage = turn_usage + response_usage
+                    continue
+
+                # Handle specific events
+                if msg_type == "exec_command_begin":
+                    cmd_str = " ".join(event["msg"]["command"])
+                    summary = self._create_tool_summary(
+                        "exec_command", {"command": cmd_str}
+                    )
+                    yield Message(
+                        id=str(uuid.uuid4()),
+                        project_id=project_path,
+                        role="assistant",
+                        message_type="tool_use",
+                        content=summary,
+                        metadata_json={
+                            "cli_type": self.cli_type.value,
+                            "tool_name": "Bash",
+                        },
+                        session_id=session_id,
+                        created_at=datetime.utcnow(),
+                    )
 
-                    # Only flush buffered assistant text on final assistant message or at task completion.
-                    # This avoids creating multiple assistant bubbles separated by tool events.
-                    if msg_type == "agent_message":
-                        # If Codex sent a final message without deltas, use it directly
-                        if not agent_message_buffer:
-                            try:
-                                final_msg = event.get("msg", {}).get("message")
-                                if isinstance(final_msg, str) and final_msg:
-                                    agent_message_buffer = final_msg
-                            except Exception:
-                                pass
-                        if not agent_message_buffer:
-                            # Nothing to flush
-                            continue
+                elif msg_type == "patch_apply_begin":
+                    changes = event["msg"].get("changes", {})
+                    ui.debug(f"Patch apply begin - changes: {changes}", "Codex")
+                    summary = self._create_tool_summary(
+                        "apply_patch", {"changes": changes}
+                    )
+                    ui.debug(f"Generated summary: {summary}", "Codex")
+                    yield Message(
+                        id=str(uuid.uuid4()),
+                        project_id=project_path,
+                        role="assistant",
+                        message_type="tool_use",
+                        content=summary,
+                        metadata_json={
+                            "cli_type": self.cli_type.value,
+                            "tool_name": "Edit",
+                        },
+                        session_id=session_id,
+                        created_at=datetime.utcnow(),
+                    )
+
+                elif msg_type == "web_search_begin":
+                    query = event["msg"].get("query", "")
+                    summary = self._create_tool_summary(
+                        "web_search", {"query": query}
+                    )
+                    yield Message(
+                        id=str(uuid.uuid4()),
+                        project_id=project_path,
+                        role="assistant",
+                        message_type="tool_use",
+                        content=summary,
+                        metadata_json={
+                            "cli_type": self.cli_type.value,
+                            "tool_name": "WebSearch",
+                        },
+                        session_id=session_id,
+                        created_at=datetime.utcnow(),
+                    )
+
+                elif msg_type == "mcp_tool_call_begin":
+                    inv = event["msg"].get("invocation", {})
+                    server = inv.get("server")
+                    tool = inv.get("tool")
+                    summary = self._create_tool_summary(
+                        "mcp_tool_call", {"server": server, "tool": tool}
+                    )
+                    yield Message(
+                        id=str(uuid.uuid4()),
+                        project_id=project_path,
+                        role="assistant",
+                        message_type="tool_use",
+                        content=summary,
+                        metadata_json={
+                            "cli_type": self.cli_type.value,
+                            "tool_name": "MCPTool",
+                        },
+                        session_id=session_id,
+                        created_at=datetime.utcnow(),
+                    )
+
+                elif msg_type in ["exec_command_output_delta"]:
+                    # Output chunks from command execution - can be ignored for UI
+                    pass
+
+                elif msg_type in [
+                    "exec_command_end",
+                    "patch_apply_end",
+                    "mcp_tool_call_end",
+                ]:
+                    # Tool completion events - just log, don't show to user
+                    ui.debug(f"Tool completed: {msg_type}", "Codex")
+
+                elif msg_type == "task_complete":
+                    # Flush any remaining message buffer before completing
+                    if agent_message_buffer:
                         yield Message(
                             id=str(uuid.uuid4()),
                             project_id=project_path,
@@ -422,149 +575,42 @@ Do not create subdirectories unless specifically requested by the user.
                         )
                         agent_message_buffer = ""
 
-                    # Handle specific events
-                    if msg_type == "exec_command_begin":
-                        cmd_str = " ".join(event["msg"]["command"])
-                        summary = self._create_tool_summary(
-                            "exec_command", {"command": cmd_str}
-                        )
-                        yield Message(
-                            id=str(uuid.uuid4()),
-                            project_id=project_path,
-                            role="assistant",
-                            message_type="tool_use",
-                            content=summary,
-                            metadata_json={
-                                "cli_type": self.cli_type.value,
-                                "tool_name": "Bash",
-                            },
-                            session_id=session_id,
-                            created_at=datetime.utcnow(),
-                        )
-
-                    elif msg_type == "patch_apply_begin":
-                        changes = event["msg"].get("changes", {})
-                        ui.debug(f"Patch apply begin - changes: {changes}", "Codex")
-                        summary = self._create_tool_summary(
-                            "apply_patch", {"changes": changes}
-                        )
-                        ui.debug(f"Generated summary: {summary}", "Codex")
-                        yield Message(
-                            id=str(uuid.uuid4()),
-                            project_id=project_path,
-                            role="assistant",
-                            message_type="tool_use",
-                            content=summary,
-                            metadata_json={
-                                "cli_type": self.cli_type.value,
-                                "tool_name": "Edit",
-                            },
-                            session_id=session_id,
-                            created_at=datetime.utcnow(),
-                        )
-
-                    elif msg_type == "web_search_begin":
-                        query = event["msg"].get("query", "")
-                        summary = self._create_tool_summary(
-                            "web_search", {"query": query}
-                        )
-                        yield Message(
-                            id=str(uuid.uuid4()),
-                            project_id=project_path,
-                            role="assistant",
-                            message_type="tool_use",
-                            content=summary,
-                            metadata_json={
-                                "cli_type": self.cli_type.value,
-                                "tool_name": "WebSearch",
-                            },
-                            session_id=session_id,
-                            created_at=datetime.utcnow(),
-                        )
+                    # Task completion - save rollout file path for future resumption
+                    ui.success("Codex task completed", "Codex")
 
-                    elif msg_type == "mcp_tool_call_begin":
-                        inv = event["msg"].get("invocation", {})
-                        server = inv.get("server")
-                        tool = inv.get("tool")
-                        summary = self._create_tool_summary(
-                            "mcp_tool_call", {"server": server, "tool": tool}
-                        )
-                        yield Message(
-                            id=str(uuid.uuid4()),
-                            project_id=project_path,
-                            role="assistant",
-                            message_type="tool_use",
-                            content=summary,
-                            metadata_json={
-                                "cli_type": self.cli_type.value,
-                                "tool_name": "MCPTool",
-                            },
-                            session_id=session_id,
-                            created_at=datetime.utcnow(),
+                    # Find and store the latest rollout file for this session
+                    try:
+                        # Off the event loop: the index may re-scan ~/.codex/sessions
+                        latest_rollout = await asyncio.to_thread(
+                            self._find_latest_rollout_for_project, project_id, workdir_abs, codex_session_id
                         )
-
-                    elif msg_type in ["exec_command_output_delta"]:
-                        # Output chunks from command execution - can be ignored for UI
-                        pass
-
-                    elif msg_type in [
-                        "exec_command_end",
-                        "patch_apply_end",
-                        "mcp_tool_call_end",
-                    ]:
-                        # Tool completion events - just log, don't show to user
-                        ui.debug(f"Tool completed: {msg_type}", "Codex")
-
-                    elif msg_type == "task_complete":
-                        # Flush any remaining message buffer before completing
-                        if agent_message_buffer:
-                            yield Message(
-                                id=str(uuid.uuid4()),
-                                project_id=project_path,
-                                role="assistant",
-                                message_type="chat",
-                                content=agent_message_buffer,
-                                metadata_json={"cli_type": self.cli_type.value},
-                                session_id=session_id,
-                                created_at=datetime.utcnow(),
+                        if latest_rollout:
+                            await self.set_rollout_path(project_id, latest_rollout)
+                            ui.debug(
+                                f"Saved rollout path for future resumption: {latest_rollout}",
+                                "Codex",
                             )
-                            agent_message_buffer = ""
-
-                        # Task completion - save rollout file path for future resumption
-                        ui.success("Codex task completed", "Codex")
-
-                        # Find and store the latest rollout file for this session
-                        try:
-                            latest_rollout = self._find_latest_rollout_for_project(project_id)
-                            if latest_rollout:
-                                await self.set_rollout_path(project_id, latest_rollout)
-                                ui.debug(
-                                    f"Saved rollout path for future resumption: {latest_rollout}",
-                                    "Codex",
-                                )
-                        except Exception as e:
-                            ui.warning(f"Failed to save rollout path: {e}", "Codex")
+                    except Exception as e:
+                        ui.warning(f"Failed to save rollout path: {e}", "Codex")
 
-                        break
+                    break
 
-                    elif msg_type == "error":
-                        error_msg = event["msg"]["message"]
-                        ui.error(f"Codex error: {error_msg}", "Codex")
-                        yield Message(
-                            id=str(uuid.uuid4()),
-                            project_id=project_path,
-                            role="assistant",
-                            message_type="error",
-                            content=f"❌ Error: {error_msg}",
-                            metadata_json={"cli_type": self.cli_type.value},
-                            session_id=session_id,
-                            created_at=datetime.utcnow(),
-                        )
+                elif msg_type == "error":
+                    error_msg = event["msg"]["message"]
+                    ui.error(f"Codex error: {error_msg}", "Codex")
+                    yield Message(
+                        id=str(uuid.uuid4()),
+                        project_id=project_path,
+                        role="assistant",
+                        message_type="error",
+                        content=f"❌ Error: {error_msg}",
+                        metadata_json={"cli_type": self.cli_type.value},
+                        session_id=session_id,
+                        created_at=datetime.utcnow(),
+                    )
 
-                    # Removed duplicate agent_message handler - already handled above
+                # Removed duplicate agent_message handler - already handled above
 
-                except json.JSONDecodeError:
-                    continue
 
             # Flush any remaining buffer
             if agent_message_buffer:
@@ -579,6 +625,23 @@ Do not create subdirectories unless specifically requested by the user.
                     created_at=datetime.utcnow(),
                 )
 
+            if turn_usage:
+                yield Message(
+                    id=str(uuid.uuid4()),
+                    project_id=project_path,
+                    role="system",
+                    message_type="system",
+                    content=f"Token usage: {turn_usage.total_tokens} tokens",
+                    metadata_json={
+                        "cli_type": self.cli_type.value,
+                        "event_type": "usage",
+                        "usage": turn_usage.to_dict(),
+                        "hidden_from_ui": True,
+                    },
+                    session_id=session_id,
+                    created_at=datetime.utcnow(),
+                )
+
             # Clean shutdown
             if process.stdin:
                 try:
@@ -591,7 +654,10 @@ Do not create subdirectories unless specifically requested by the user.
                 except Exception as e:
                     ui.debug(f"Failed to send shutdown: {e}", "Codex")
 
-            await process.wait()
+            # Negative codes are signals (our own terminate on cancel)
+            returncode = await process.wait()
+            if returncode and returncode > 0:
+                ui.warning(f"Codex exited abnormally: {process.failure_detail()}", "Codex")
 
         except FileNotFoundError:
             yield Message(
@@ -611,183 +677,69 @@ Do not create subdirectories unless specifically requested by the user.
                 role="assistant",
                 message_type="error",
                 content=f"❌ Codex execution failed: {str(e)}",
-                metadata_json={"error": "execution_failed", "cli_type": "codex"},
+                metadata_json={
+                    "error": "execution_failed",
+                    "cli_type": "codex",
+                    "stderr_tail": process.stderr_tail.text() if process is not None else None,
+                },
                 session_id=session_id,
                 created_at=datetime.utcnow(),
             )
+        finally:
+            self._processes.pop(session_id or "", None)
 
-    async def get_session_id(self, project_id: str) -> Optional[str]:
-        """Get stored session ID for project"""
-        # Try to get from database first
-        if self.db_session:
+    async def cancel(self, session_id: Optional[str] = None) -> None:
+        """Interrupt the current Codex turn and terminate the proto process"""
+        process = self._processes.get(session_id or "")
+        if not process:
+            return
+        ui.info(f"Cancelling Codex process for session {session_id}", "Codex")
+        if process.stdin and process.returncode is None:
             try:
-                from app.models.projects import Project
-
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project and project.active_cursor_session_id:
-                    # Parse JSON data that might contain codex session info
-                    try:
-                        session_data = json.loads(project.active_cursor_session_id)
-                        if isinstance(session_data, dict) and "codex" in session_data:
-                            codex_session = session_data["codex"]
-                            ui.debug(
-                                f"Retrieved Codex session from DB: {codex_session}", "Codex"
-                            )
-                            return codex_session
-                    except (json.JSONDecodeError, TypeError):
-                        # If it's not JSON, might be a plain cursor session ID
-                        pass
+                interrupt_cmd = {"id": f"ctl_{uuid.uuid4().hex[:8]}", "op": {"type": "interrupt"}}
+                process.stdin.write(json.dumps(interrupt_cmd).encode("utf-8") + b"\n")
+                await process.stdin.drain()
             except Exception as e:
-                ui.warning(f"Failed to get Codex session from DB: {e}", "Codex")
+                ui.debug(f"Failed to send interrupt: {e}", "Codex")
+        await terminate_process(process)
 
-        # Fallback to memory storage
-        return self._session_store.get(project_id)
+    async def get_session_id(self, project_id: str) -> Optional[str]:
+        """Get stored session ID for project"""
+        return self.provider_session(project_id).session_id
 
     async def set_session_id(self, project_id: str, session_id: str) -> None:
-        """Store session ID for project with database persistence"""
-        # Store in database
-        if self.db_session:
-            try:
-                from app.models.projects import Project
-
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project:
-                    # Try to parse existing session data
-                    existing_data: Dict[str, Any] = {}
-                    if project.active_cursor_session_id:
-                        try:
-                            existing_data = json.loads(project.active_cursor_session_id)
-                            if not isinstance(existing_data, dict):
-                                # If it's a plain string, preserve it as cursor session
-                                existing_data = {
-                                    "cursor": project.active_cursor_session_id
-                                }
-                        except (json.JSONDecodeError, TypeError):
-                            existing_data = {"cursor": project.active_cursor_session_id}
-
-                    # Add/update codex session
-                    existing_data["codex"] = session_id
-
-                    # Save back to database
-                    project.active_cursor_session_id = json.dumps(existing_data)
-                    self.db_session.commit()
-                    ui.debug(
-                        f"Codex session saved to DB for project {project_id}: {session_id}",
-                        "Codex",
-                    )
-            except Exception as e:
-                ui.error(f"Failed to save Codex session to DB: {e}", "Codex")
-
-        # Store in memory as fallback
-        self._session_store[project_id] = session_id
-        ui.debug(
-            f"Codex session stored in memory for project {project_id}: {session_id}",
-            "Codex",
-        )
+        """Store session ID for project (write-through to cli_sessions)"""
+        self.save_provider_session(project_id, session_id=session_id)
+        ui.debug(f"Codex session stored for project {project_id}: {session_id}", "Codex")
 
     async def get_rollout_path(self, project_id: str) -> Optional[str]:
         """Get stored rollout file path for project"""
-        if self.db_session:
-            try:
-                from app.models.projects import Project
-
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project and project.active_cursor_session_id:
-                    try:
-                        session_data = json.loads(project.active_cursor_session_id)
-                        if (
-                            isinstance(session_data, dict)
-                            and "codex_rollout" in session_data
-                        ):
-                            rollout_path = session_data["codex_rollout"]
-                            ui.debug(
-                                f"Retrieved Codex rollout path from DB: {rollout_path}",
-                                "Codex",
-                            )
-                            return rollout_path
-                    except (json.JSONDecodeError, TypeError):
-                        pass
-            except Exception as e:
-                ui.warning(f"Failed to get Codex rollout path from DB: {e}", "Codex")
-        return None
+        return self.provider_session(project_id).rollout_path
 
     async def set_rollout_path(self, project_id: str, rollout_path: str) -> None:
         """Store rollout file path for project"""
-        if self.db_session:
-            try:
-                from app.models.projects import Project
+        self.save_provider_session(project_id, rollout_path=rollout_path)
+        ui.debug(f"Codex rollout path stored for project {project_id}: {rollout_path}", "Codex")
 
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project:
-                    # Try to parse existing session data
-                    existing_data: Dict[str, Any] = {}
-                    if project.active_cursor_session_id:
-                        try:
-                            existing_data = json.loads(project.active_cursor_session_id)
-                            if not isinstance(existing_data, dict):
-                                existing_data = {
-                                    "cursor": project.active_cursor_session_id
-                                }
-                        except (json.JSONDecodeError, TypeError):
-                            existing_data = {"cursor": project.active_cursor_session_id}
-
-                    # Add/update rollout path
-                    existing_data["codex_rollout"] = rollout_path
-
-                    # Save back to database
-                    project.active_cursor_session_id = json.dumps(existing_data)
-                    self.db_session.commit()
-                    ui.debug(
-                        f"Codex rollout path saved to DB for project {project_id}: {rollout_path}",
-                        "Codex",
-                    )
-            except Exception as e:
-                ui.error(f"Failed to save Codex rollout path to DB: {e}", "Codex")
-
-    def _find_latest_rollout_for_project(self, project_id: str) -> Optional[str]:
-        """Find the latest rollout file using codex_chat.py logic"""
-        try:
-            from pathlib import Path
 
-            # Use exact same logic as codex_chat.py _resolve_resume_path for "latest"
-            root = Path.home() / ".codex" / "sessions"
-            if not root.exists():
-                ui.debug(
-                    f"Codex sessions directory does not exist: {root}", "Codex"
-                )
-                return None
+    def _find_latest_rollout_for_project(
+        self, project_id: str, workdir: str, codex_session_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Find this project's latest rollout file via the rollout index.
 
-            # Find all rollout files using same pattern as codex_chat.py
-            candidates = sorted(
-                root.rglob("rollout-*.jsonl"),
-                key=lambda p: p.stat().st_mtime,
-                reverse=True,  # Most recent first
-            )
-
-            if not candidates:
-                ui.debug(f"No rollout files found in {root}", "Codex")
+        Prefers the file of the Codex session that just ran; otherwise the
+        newest rollout recorded for the project's working directory.
+        """
+        try:
+            rollout_path = None
+            if codex_session_id:
+                rollout_path = rollout_index.find_by_session(codex_session_id)
+            if not rollout_path:
+                rollout_path = rollout_index.latest_for_cwd(workdir)
+            if not rollout_path:
+                ui.debug(f"No rollout files found for project {project_id}", "Codex")
                 return None
 
-            # Return the most recent file (same as codex_chat.py "latest" logic)
-            latest_file = candidates[0]
-            rollout_path = str(latest_file.resolve())
-
             ui.debug(
                 f"Found latest rollout file for project {project_id}: {rollout_path}",
                 "Codex",
@@ -0,0 +1,186 @@
+"""Incremental index of Codex rollout files.
+
+Codex writes one `rollout-<timestamp>-<session uuid>.jsonl` per session under
+`~/.codex/sessions/YYYY/MM/DD/`. Instead of globbing and stat-ing the whole
+tree on every turn, the index remembers each file's session id and working
+directory and only re-lists directories whose mtime changed since the last
+scan. Below an unchanged directory only the newest (latest date) child is
+visited, since new rollouts land there or in a new directory, so a refresh
+costs a few stats however long the history; files are stat'ed and their
+first line read once. Resume lookups are per-project dictionary hits, and
+the blocking calls are meant to be run off the event loop (asyncio.to_thread).
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.terminal_ui import ui
+
+_ROLLOUT_NAME = re.compile(
+    r"^rollout-.*?([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\.jsonl$"
+)
+_CWD_TAG = re.compile(rb"<cwd>([^<]+)</cwd>")
+
+
+@dataclass
+class RolloutEntry:
+    path: str
+    session_id: Optional[str]
+    cwd: Optional[str]
+    mtime: float
+
+
+def _normalize(path: str) -> str:
+    return os.path.realpath(os.path.abspath(path))
+
+
+def _read_cwd(path: str) -> Optional[str]:
+    """Working directory from the session_meta header (the file's first line)"""
+    try:
+        with open(path, "rb") as f:
+            first_line = f.readline()
+    except OSError:
+        return None
+    try:
+        meta = json.loads(first_line)
+        if isinstance(meta, dict):
+            payload = meta.get("payload") if isinstance(meta.get("payload"), dict) else meta
+            cwd = payload.get("cwd")
+            if isinstance(cwd, str) and cwd:
+                return _normalize(cwd)
+    except ValueError:
+        pass
+    match = _CWD_TAG.search(first_line)
+    if match:
+        return _normalize(match.group(1).decode("utf-8", errors="replace").strip())
+    return None
+
+
+class CodexRolloutIndex:
+    """Rollout files by path, session id and working directory"""
+
+    HEADER_GRACE_SECONDS = 300.0
+
+    def __init__(self, root: Optional[Path] = None, min_refresh_interval: float = 1.0):
+        self.root = root or Path.home() / ".codex" / "sessions"
+        self.min_refresh_interval = min_refresh_interval
+        self._entries: Dict[str, RolloutEntry] = {}
+        self._by_session: Dict[str, RolloutEntry] = {}
+        self._by_cwd: Dict[str, Dict[str, RolloutEntry]] = {}
+        self._dir_mtimes: Dict[str, float] = {}
+        self._subdirs: Dict[str, List[str]] = {}
+        # Files whose header was not written yet when first seen
+        self._missing_cwd: Dict[str, RolloutEntry] = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> None:
+        """Pick up rollout files added since the last scan"""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.min_refresh_interval:
+            return
+        with self._lock:
+            self._last_refresh = now
+            if not self.root.exists():
+                return
+            added = self._scan_dir(str(self.root))
+            self._retry_missing_cwd()
+        if added:
+            ui.debug(f"Indexed {added} new Codex rollout file(s)", "Codex")
+
+    def _scan_dir(self, directory: str) -> int:
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            self._subdirs.pop(directory, None)
+            return 0
+        added = 0
+        if self._dir_mtimes.get(directory) != mtime:
+            # Entries were added or removed here: re-list, stat only new files
+            self._dir_mtimes[directory] = mtime
+            subdirs = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.path not in self._entries:
+                            match = _ROLLOUT_NAME.match(entry.name)
+                            if match:
+                                self._add(entry.path, match.group(1), entry.stat().st_mtime)
+                                added += 1
+            except OSError:
+                pass
+            self._subdirs[directory] = subdirs
+            # Directory layout changed: visit every child once
+            for subdir in subdirs:
+                added += self._scan_dir(subdir)
+            return added
+        # Unchanged here, but files may have been added to the newest date
+        # directory (a child's new files do not touch the parent's mtime)
+        subdirs = self._subdirs.get(directory)
+        if subdirs:
+            added += self._scan_dir(max(subdirs))
+        return added
+
+    def _add(self, path: str, session_id: Optional[str], mtime: float) -> None:
+        entry = RolloutEntry(path=path, session_id=session_id, cwd=_read_cwd(path), mtime=mtime)
+        self._entries[path] = entry
+        if session_id:
+            self._by_session[session_id] = entry
+        if entry.cwd:
+            self._by_cwd.setdefault(entry.cwd, {})[path] = entry
+        elif time.time() - mtime < self.HEADER_GRACE_SECONDS:
+            self._missing_cwd[path] = entry
+
+    def _retry_missing_cwd(self) -> None:
+        for path, entry in list(self._missing_cwd.items()):
+            entry.cwd = _read_cwd(path)
+            if entry.cwd:
+                self._by_cwd.setdefault(entry.cwd, {})[path] = entry
+            if entry.cwd or time.time() - entry.mtime >= self.HEADER_GRACE_SECONDS:
+                del self._missing_cwd[path]
+
+    def _forget(self, entry: RolloutEntry) -> None:
+        self._entries.pop(entry.path, None)
+        self._missing_cwd.pop(entry.path, None)
+        if entry.session_id and self._by_session.get(entry.session_id) is entry:
+            del self._by_session[entry.session_id]
+        if entry.cwd:
+            self._by_cwd.get(entry.cwd, {}).pop(entry.path, None)
+
+    def find_by_session(self, session_id: str) -> Optional[str]:
+        self.refresh()
+        with self._lock:
+            entry = self._by_session.get(session_id)
+            if entry and not os.path.exists(entry.path):
+                self._forget(entry)
+                return None
+        return entry.path if entry else None
+
+    def latest_for_cwd(self, cwd: str) -> Optional[str]:
+        """Most recently written rollout whose session ran in `cwd`"""
+        self.refresh()
+        key = _normalize(cwd)
+        with self._lock:
+            latest: Optional[RolloutEntry] = None
+            for entry in list(self._by_cwd.get(key, {}).values()):
+                # Only this project's files are re-stat'ed; they grow while a session runs
+                try:
+                    entry.mtime = os.stat(entry.path).st_mtime
+                except OSError:
+                    self._forget(entry)
+                    continue
+                if latest is None or entry.mtime > latest.mtime:
+                    latest = entry
+        return latest.path if latest else None
+
+
+rollout_index = CodexRolloutIndex()
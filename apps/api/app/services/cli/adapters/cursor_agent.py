@@ -7,30 +7,72 @@ from __future__ import annotations
 import asyncio
 import json
 import os
+import shlex
+import time
 import uuid
 from datetime import datetime
-from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
 
 from app.models.messages import Message
+from app.core.config import settings
 from app.core.terminal_ui import ui
-
-from ..base import BaseCLI, CLIType
+from app.core.tracing import trace_span
+
+from ..base import BaseCLI, CLIType, InvalidLine, NDJSONDecoder, notify_process_spawned, terminate_process
+from ..process import spawn_cli_process
+from ..usage import parse_usage
+
+# Yielded by _with_idle_ticks when no event arrived within the idle timeout
+_IDLE = object()
+
+
+async def _with_idle_ticks(
+    events: AsyncIterator[Any], idle_timeout: Callable[[], Optional[float]]
+) -> AsyncIterator[Any]:
+    """Yield from `events`, plus `_IDLE` whenever `idle_timeout()` seconds pass without one.
+
+    `idle_timeout()` is re-read before each wait; None waits indefinitely.
+    The pending read is kept across ticks, so no event is lost.
+    """
+    iterator = events.__aiter__()
+    next_event: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({next_event}, timeout=idle_timeout())
+            if not done:
+                yield _IDLE
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            finally:
+                next_event = None
+            yield event
+    finally:
+        if next_event is not None:
+            next_event.cancel()
 
 
 class CursorAgentCLI(BaseCLI):
     """Cursor Agent CLI implementation with stream-json support and session continuity"""
 
+    # Assistant deltas arriving within this window go to the UI as one partial update
+    PARTIAL_COALESCE_SECONDS = 0.05
+
     def __init__(self, db_session=None):
         super().__init__(CLIType.CURSOR)
         self.db_session = db_session
-        self._session_store = {}  # Fallback for when db_session is not available
+        self._processes: Dict[str, asyncio.subprocess.Process] = {}  # Running processes by session
 
     async def check_availability(self) -> Dict[str, Any]:
         """Check if Cursor Agent CLI is available"""
         try:
             # Check if cursor-agent is installed and working
             result = await asyncio.create_subprocess_shell(
-                "cursor-agent -h",
+                f"{settings.cursor_agent_cmd} -h",
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
             )
@@ -195,8 +237,18 @@ class CursorAgentCLI(BaseCLI):
             # Final result event
             duration = event.get("duration_ms", 0)
             result_text = event.get("result", "")
+            usage = parse_usage(event.get("usage"))
 
-            if result_text:
+            if result_text or usage:
+                metadata = {
+                    "cli_type": self.cli_type.value,
+                    "event_type": "result",
+                    "duration_ms": duration,
+                    "original_event": event,
+                    "hidden_from_ui": True,
+                }
+                if usage:
+                    metadata["usage"] = usage.to_dict()
                 return Message(
                     id=str(uuid.uuid4()),
                     project_id=project_path,
@@ -205,19 +257,37 @@ class CursorAgentCLI(BaseCLI):
                     content=(
                         f"Execution completed in {duration}ms. Final result: {result_text}"
                     ),
-                    metadata_json={
-                        "cli_type": self.cli_type.value,
-                        "event_type": "result",
-                        "duration_ms": duration,
-                        "original_event": event,
-                        "hidden_from_ui": True,
-                    },
+                    metadata_json=metadata,
                     session_id=session_id,
                     created_at=datetime.utcnow(),
                 )
 
         return None
 
+    def _assistant_message(
+        self,
+        message_id: str,
+        content: str,
+        project_path: str,
+        session_id: Optional[str],
+        partial: bool = False,
+    ) -> Message:
+        """Streamed assistant text: a partial delta for the UI, or the aggregated message to persist"""
+        return Message(
+            id=message_id,
+            project_id=project_path,
+            role="assistant",
+            message_type="chat",
+            content=content,
+            metadata_json={
+                "cli_type": "cursor",
+                "event_type": "assistant_partial" if partial else "assistant_aggregated",
+                **({"partial": True} if partial else {}),
+            },
+            session_id=session_id,
+            created_at=datetime.utcnow(),
+        )
+
     async def _ensure_agent_md(self, project_path: str) -> None:
         """Ensure AGENTS.md exists in project repo with system prompt"""
         # Determine the repo path
@@ -272,21 +342,12 @@ class CursorAgentCLI(BaseCLI):
 
         # Extract project ID from path (format: .../projects/{project_id}/repo)
         # We need the project_id, not "repo"
-        path_parts = project_path.split("/")
-        if "repo" in path_parts and len(path_parts) >= 2:
-            # Get the folder before "repo"
-            repo_index = path_parts.index("repo")
-            if repo_index > 0:
-                project_id = path_parts[repo_index - 1]
-            else:
-                project_id = path_parts[-1] if path_parts else project_path
-        else:
-            project_id = path_parts[-1] if path_parts else project_path
+        project_id = self.resolve_project_id(project_path)
 
         stored_session_id = await self.get_session_id(project_id)
 
         cmd = [
-            "cursor-agent",
+            *shlex.split(settings.cursor_agent_cmd),
             "--force",
             "-p",
             instruction,
@@ -314,157 +375,180 @@ class CursorAgentCLI(BaseCLI):
         if not os.path.exists(project_repo_path):
             project_repo_path = project_path  # Fallback to project_path if repo subdir doesn't exist
 
+        process = None
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=project_repo_path,
-            )
+            with trace_span("process.spawn", cli="cursor"):
+                process = await spawn_cli_process(cmd, project_repo_path, label="cursor-agent", stdin=False)
+            self._processes[session_id or ""] = process
+            notify_process_spawned(process, "cursor-agent")
 
             cursor_session_id = None
-            assistant_message_buffer = ""
+            # Assistant text of the message being streamed: deltas are forwarded as
+            # partial updates under `assistant_message_id`; the aggregate is saved once
+            assistant_message_buffer: List[str] = []
+            assistant_message_id = str(uuid.uuid4())
+            pending_delta: List[str] = []
+            last_partial_at = 0.0
             result_received = False  # Track if we received result event
 
-            async for line in process.stdout:
-                line_str = line.decode().strip()
-                if not line_str:
-                    continue
-
-                try:
-                    # Parse NDJSON event
-                    event = json.loads(line_str)
-
-                    event_type = event.get("type")
-
-                    # Priority: Extract session ID from type: "result" event (most reliable)
-                    if event_type == "result" and not cursor_session_id:
-                        print(f"🔍 [Cursor] Result event received: {event}")
-                        session_id_from_result = event.get("session_id")
-                        if session_id_from_result:
-                            cursor_session_id = session_id_from_result
-                            await self.set_session_id(project_id, cursor_session_id)
-                            print(
-                                f"💾 [Cursor] Session ID extracted from result event: {cursor_session_id}"
-                            )
-
-                        # Mark that we received result event
-                        result_received = True
-
-                    # Extract session ID from various event types
-                    if not cursor_session_id:
-                        # Try to extract session ID from any event that contains it
-                        potential_session_id = (
-                            event.get("sessionId")
-                            or event.get("chatId")
-                            or event.get("session_id")
-                            or event.get("chat_id")
-                            or event.get("threadId")
-                            or event.get("thread_id")
-                        )
-
-                        # Also check in nested structures
-                        if not potential_session_id and isinstance(
-                            event.get("message"), dict
-                        ):
-                            potential_session_id = (
-                                event["message"].get("sessionId")
-                                or event["message"].get("chatId")
-                                or event["message"].get("session_id")
-                                or event["message"].get("chat_id")
-                            )
-
-                        if potential_session_id and potential_session_id != active_session_id:
-                            cursor_session_id = potential_session_id
-                            await self.set_session_id(project_id, cursor_session_id)
-                            print(
-                                f"💾 [Cursor] Updated session ID for project {project_id}: {cursor_session_id}"
-                            )
-                            print(f"   Previous: {active_session_id}")
-                            print(f"   New: {cursor_session_id}")
-
-                    # If we receive a non-assistant message, flush the buffer first
-                    if event.get("type") != "assistant" and assistant_message_buffer:
-                        yield Message(
-                            id=str(uuid.uuid4()),
-                            project_id=project_path,
-                            role="assistant",
-                            message_type="chat",
-                            content=assistant_message_buffer,
-                            metadata_json={
-                                "cli_type": "cursor",
-                                "event_type": "assistant_aggregated",
-                            },
-                            session_id=session_id,
-                            created_at=datetime.utcnow(),
+            def partial_flush_in() -> Optional[float]:
+                # Held deltas go out once the coalescing window closes, even if
+                # the CLI goes quiet (e.g. while thinking or running a tool)
+                if not pending_delta:
+                    return None
+                return max(0.0, self.PARTIAL_COALESCE_SECONDS - (time.monotonic() - last_partial_at))
+
+            decoder = NDJSONDecoder(yield_invalid=True, label="Cursor")
+            async for event in _with_idle_ticks(decoder.iter_stream(process.stdout), partial_flush_in):
+                if event is _IDLE:
+                    if pending_delta:
+                        yield self._assistant_message(
+                            assistant_message_id, "".join(pending_delta), project_path, session_id, partial=True
                         )
-                        assistant_message_buffer = ""
-
-                    # Process the event
-                    message = self._handle_cursor_stream_json(
-                        event, project_path, session_id
-                    )
-
-                    if message:
-                        if message.role == "assistant" and message.message_type == "chat":
-                            assistant_message_buffer += message.content
-                        else:
-                            if log_callback:
-                                await log_callback(f"📝 [Cursor] {message.content}")
-                            yield message
-
-                    # ★ CRITICAL: Break after result event to end streaming
-                    if result_received:
-                        print(
-                            f"🏁 [Cursor] Result event received, terminating stream early"
-                        )
-                        try:
-                            process.terminate()
-                            print(f"🔪 [Cursor] Process terminated")
-                        except Exception as e:
-                            print(f"⚠️ [Cursor] Failed to terminate process: {e}")
-                        break
-
-                except json.JSONDecodeError as e:
+                        pending_delta = []
+                        last_partial_at = time.monotonic()
+                    continue
+                if isinstance(event, InvalidLine):
                     # Handle malformed JSON
-                    print(f"⚠️ [Cursor] JSON decode error: {e}")
-                    print(f"⚠️ [Cursor] Raw line: {line_str}")
+                    print(f"⚠️ [Cursor] JSON decode error: {event.error}")
+                    print(f"⚠️ [Cursor] Raw line: {event.raw}")
 
                     # Still yield as raw output
-                    message = Message(
+                    yield Message(
                         id=str(uuid.uuid4()),
                         project_id=project_path,
                         role="assistant",
                         message_type="chat",
-                        content=line_str,
+                        content=event.raw,
                         metadata_json={
                             "cli_type": "cursor",
-                            "raw_output": line_str,
-                            "parse_error": str(e),
+                            "raw_output": event.raw,
+                            "parse_error": event.error,
                         },
                         session_id=session_id,
                         created_at=datetime.utcnow(),
                     )
-                    yield message
+                    continue
+                if not isinstance(event, dict):
+                    continue
+
+                event_type = event.get("type")
+
+                # Priority: Extract session ID from type: "result" event (most reliable)
+                if event_type == "result" and not cursor_session_id:
+                    print(f"🔍 [Cursor] Result event received: {event}")
+                    session_id_from_result = event.get("session_id")
+                    if session_id_from_result:
+                        cursor_session_id = session_id_from_result
+                        await self.set_session_id(project_id, cursor_session_id)
+                        print(
+                            f"💾 [Cursor] Session ID extracted from result event: {cursor_session_id}"
+                        )
+
+                    # Mark that we received result event
+                    result_received = True
+
+                # Extract session ID from various event types
+                if not cursor_session_id:
+                    # Try to extract session ID from any event that contains it
+                    potential_session_id = (
+                        event.get("sessionId")
+                        or event.get("chatId")
+                        or event.get("session_id")
+                        or event.get("chat_id")
+                        or event.get("threadId")
+                        or event.get("thread_id")
+                    )
+
+                    # Also check in nested structures
+                    if not potential_session_id and isinstance(
+                        event.get("message"), dict
+                    ):
+                        potential_session_id = (
+                            event["message"].get("sessionId")
+                            or event["message"].get("chatId")
+                            or event["message"].get("session_id")
+                            or event["message"].get("chat_id")
+                        )
+
+                    if potential_session_id and potential_session_id != active_session_id:
+                        cursor_session_id = potential_session_id
+                        await self.set_session_id(project_id, cursor_session_id)
+                        print(
+                            f"💾 [Cursor] Updated session ID for project {project_id}: {cursor_session_id}"
+                        )
+                        print(f"   Previous: {active_session_id}")
+                        print(f"   New: {cursor_session_id}")
+
+                # If we receive a non-assistant message, flush the buffer first
+                if event.get("type") != "assistant" and assistant_message_buffer:
+                    yield self._assistant_message(
+                        assistant_message_id, "".join(assistant_message_buffer), project_path, session_id
+                    )
+                    assistant_message_buffer = []
+                    assistant_message_id = str(uuid.uuid4())
+                    pending_delta = []
+
+                # Process the event
+                message = self._handle_cursor_stream_json(
+                    event, project_path, session_id
+                )
+
+                if message:
+                    if message.role == "assistant" and message.message_type == "chat":
+                        assistant_message_buffer.append(message.content)
+                        pending_delta.append(message.content)
+                        now = time.monotonic()
+                        if now - last_partial_at >= self.PARTIAL_COALESCE_SECONDS:
+                            yield self._assistant_message(
+                                assistant_message_id, "".join(pending_delta), project_path, session_id, partial=True
+                            )
+                            pending_delta = []
+                            last_partial_at = now
+                    else:
+                        if log_callback:
+                            await log_callback(f"📝 [Cursor] {message.content}")
+                        yield message
+
+                # ★ CRITICAL: Break after result event to end streaming
+                if result_received:
+                    print(
+                        f"🏁 [Cursor] Result event received, terminating stream early"
+                    )
+                    try:
+                        process.terminate()
+                        print(f"🔪 [Cursor] Process terminated")
+                    except Exception as e:
+                        print(f"⚠️ [Cursor] Failed to terminate process: {e}")
+                    break
+
 
             # Flush any remaining content in the buffer
             if assistant_message_buffer:
+                yield self._assistant_message(
+                    assistant_message_id, "".join(assistant_message_buffer), project_path, session_id
+                )
+
+            returncode = await process.wait()
+            # Negative codes are signals (terminated after result, or cancelled)
+            if not result_received and returncode and returncode > 0:
+                detail = process.failure_detail()
+                ui.error(f"Cursor Agent exited without a result: {detail}", "Cursor")
                 yield Message(
                     id=str(uuid.uuid4()),
                     project_id=project_path,
                     role="assistant",
-                    message_type="chat",
-                    content=assistant_message_buffer,
+                    message_type="error",
+                    content=f"❌ Cursor Agent exited without a result. {detail}",
                     metadata_json={
+                        "error": "process_failed",
                         "cli_type": "cursor",
-                        "event_type": "assistant_aggregated",
+                        "stderr_tail": process.stderr_tail.text(),
                     },
                     session_id=session_id,
                     created_at=datetime.utcnow(),
                 )
 
-            await process.wait()
-
             # Log completion
             if cursor_session_id:
                 print(f"✅ [Cursor] Session completed: {cursor_session_id}")
@@ -495,67 +579,29 @@ class CursorAgentCLI(BaseCLI):
                     "error": "execution_failed",
                     "cli_type": "cursor",
                     "exception": str(e),
+                    "stderr_tail": process.stderr_tail.text() if process is not None else None,
                 },
                 session_id=session_id,
                 created_at=datetime.utcnow(),
             )
+        finally:
+            self._processes.pop(session_id or "", None)
 
-    async def get_session_id(self, project_id: str) -> Optional[str]:
-        """Get stored session ID for project to enable session continuity"""
-        if self.db_session:
-            try:
-                from app.models.projects import Project
+    async def cancel(self, session_id: Optional[str] = None) -> None:
+        """Terminate the running cursor-agent process; streaming then ends and flushes its buffer"""
+        process = self._processes.get(session_id or "")
+        if process:
+            ui.info(f"Cancelling Cursor Agent process for session {session_id}", "Cursor")
+            await terminate_process(process)
 
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project and project.active_cursor_session_id:
-                    print(
-                        f"💾 [Cursor] Retrieved session ID from DB: {project.active_cursor_session_id}"
-                    )
-                    return project.active_cursor_session_id
-            except Exception as e:
-                print(f"⚠️ [Cursor] Failed to get session ID from DB: {e}")
-
-        # Fallback to in-memory storage
-        return self._session_store.get(project_id)
+    async def get_session_id(self, project_id: str) -> Optional[str]:
+        """Get stored session ID for project"""
+        return self.provider_session(project_id).session_id
 
     async def set_session_id(self, project_id: str, session_id: str) -> None:
-        """Store session ID for project to enable session continuity"""
-        # Store in database if available
-        if self.db_session:
-            try:
-                from app.models.projects import Project
-
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project:
-                    project.active_cursor_session_id = session_id
-                    self.db_session.commit()
-                    print(
-                        f"💾 [Cursor] Session ID saved to DB for project {project_id}: {session_id}"
-                    )
-                    return
-                else:
-                    print(f"⚠️ [Cursor] Project {project_id} not found in DB")
-            except Exception as e:
-                print(f"⚠️ [Cursor] Failed to save session ID to DB: {e}")
-                import traceback
-
-                traceback.print_exc()
-        else:
-            print(f"⚠️ [Cursor] No DB session available")
-
-        # Fallback to in-memory storage
-        self._session_store[project_id] = session_id
-        print(
-            f"💾 [Cursor] Session ID stored in memory for project {project_id}: {session_id}"
-        )
+        """Store session ID for project (write-through to cli_sessions)"""
+        self.save_provider_session(project_id, session_id=session_id)
+        ui.debug(f"Cursor session stored for project {project_id}: {session_id}", "Cursor")
 
 
 __all__ = ["CursorAgentCLI"]
@@ -8,36 +8,36 @@ from __future__ import annotations
 
 import asyncio
 import base64
-import json
 import os
+import shlex
 import uuid
 from datetime import datetime
-from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
 
+from app.core.config import settings
 from app.core.terminal_ui import ui
 from app.models.messages import Message
+from app.services.image_store import image_store
 
+from ..acp_pool import get_acp_pool
 from ..base import BaseCLI, CLIType
+from ..usage import TokenUsage, parse_usage
 from .qwen_cli import _ACPClient, _mime_for  # Reuse minimal ACP client
 
 
 class GeminiCLI(BaseCLI):
     """Gemini CLI via ACP. Streams message and thought chunks to UI."""
 
-    _SHARED_CLIENT: Optional[_ACPClient] = None
-    _SHARED_INITIALIZED: bool = False
-
     def __init__(self, db_session=None):
         super().__init__(CLIType.GEMINI)
         self.db_session = db_session
-        self._session_store: Dict[str, str] = {}
-        self._client: Optional[_ACPClient] = None
-        self._initialized = False
+        # Our session ID -> (agent client, ACP sessionId) with a prompt in flight
+        self._active_turns: Dict[str, Tuple[_ACPClient, str]] = {}
 
     async def check_availability(self) -> Dict[str, Any]:
         try:
             proc = await asyncio.create_subprocess_shell(
-                "gemini --help",
+                f"{settings.gemini_cmd} --help",
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
             )
@@ -86,46 +86,44 @@ class GeminiCLI(BaseCLI):
         except Exception as e:
             ui.warning(f"Failed to create GEMINI.md: {e}", "Gemini")
 
-    async def _ensure_client(self) -> _ACPClient:
-        if GeminiCLI._SHARED_CLIENT is None:
-            cmd = ["gemini", "--experimental-acp"]
-            env = os.environ.copy()
-            # Prefer device-code-like flow if CLI supports it
-            env.setdefault("NO_BROWSER", "1")
-            GeminiCLI._SHARED_CLIENT = _ACPClient(cmd, env=env)
-
-            # Client-side request handlers: auto-approve permissions
-            async def _handle_permission(params: Dict[str, Any]) -> Dict[str, Any]:
-                options = params.get("options") or []
-                chosen = None
-                for kind in ("allow_always", "allow_once"):
-                    chosen = next((o for o in options if o.get("kind") == kind), None)
-                    if chosen:
-                        break
-                if not chosen and options:
-                    chosen = options[0]
-                if not chosen:
-                    return {"outcome": {"outcome": "cancelled"}}
-                return {
-                    "outcome": {"outcome": "selected", "optionId": chosen.get("optionId")}
-                }
-
-            async def _fs_read(params: Dict[str, Any]) -> Dict[str, Any]:
-                return {"content": ""}
-
-            async def _fs_write(params: Dict[str, Any]) -> Dict[str, Any]:
-                return {}
+    @staticmethod
+    async def _spawn_client() -> _ACPClient:
+        """Start and initialize one Gemini ACP agent (used by the process pool)"""
+        cmd = [*shlex.split(settings.gemini_cmd), "--experimental-acp"]
+        env = os.environ.copy()
+        # Prefer device-code-like flow if CLI supports it
+        env.setdefault("NO_BROWSER", "1")
+        client = _ACPClient(cmd, env=env)
+
+        # Client-side request handlers: auto-approve permissions
+        async def _handle_permission(params: Dict[str, Any]) -> Dict[str, Any]:
+            options = params.get("options") or []
+            chosen = None
+            for kind in ("allow_always", "allow_once"):
+                chosen = next((o for o in options if o.get("kind") == kind), None)
+                if chosen:
+                    break
+            if not chosen and options:
+                chosen = options[0]
+            if not chosen:
+                return {"outcome": {"outcome": "cancelled"}}
+            return {
+                "outcome": {"outcome": "selected", "optionId": chosen.get("optionId")}
+            }
 
-            GeminiCLI._SHARED_CLIENT.on_request("session/request_permission", _handle_permission)
-            GeminiCLI._SHARED_CLIENT.on_request("fs/read_text_file", _fs_read)
-            GeminiCLI._SHARED_CLIENT.on_request("fs/write_text_file", _fs_write)
+        async def _fs_read(params: Dict[str, Any]) -> Dict[str, Any]:
+            return {"content": ""}
 
-            await GeminiCLI._SHARED_CLIENT.start()
+        async def _fs_write(params: Dict[str, Any]) -> Dict[str, Any]:
+            return {}
 
-        self._client = GeminiCLI._SHARED_CLIENT
+        client.on_request("session/request_permission", _handle_permission)
+        client.on_request("fs/read_text_file", _fs_read)
+        client.on_request("fs/write_text_file", _fs_write)
 
-        if not GeminiCLI._SHARED_INITIALIZED:
-            await self._client.request(
+        await client.start()
+        try:
+            await client.request(
                 "initialize",
                 {
                     "clientCapabilities": {
@@ -134,8 +132,15 @@ class GeminiCLI(BaseCLI):
                     "protocolVersion": 1,
                 },
             )
-            GeminiCLI._SHARED_INITIALIZED = True
-        return self._client
+        except Exception as e:
+            ui.error(f"Gemini initialize failed: {e}", "Gemini")
+            await client.stop()
+            raise
+        return client
+
+    @staticmethod
+    def _pool():
+        return get_acp_pool("Gemini", GeminiCLI._spawn_client)
 
     async def execute_with_streaming(
         self,
@@ -147,7 +152,23 @@ class GeminiCLI(BaseCLI):
         model: Optional[str] = None,
         is_initial_prompt: bool = False,
     ) -> AsyncGenerator[Message, None]:
-        client = await self._ensure_client()
+        # Each project gets its own warm agent process (shared only when the pool is full)
+        project_id = self.resolve_project_id(project_path)
+        async with self._pool().lease(project_id) as client:
+            async for message in self._stream_turn(
+                client, instruction, project_path, session_id, images, model
+            ):
+                yield message
+
+    async def _stream_turn(
+        self,
+        client: _ACPClient,
+        instruction: str,
+        project_path: str,
+        session_id: Optional[str],
+        images: Optional[List[Dict[str, Any]]],
+        model: Optional[str],
+    ) -> AsyncGenerator[Message, None]:
         # Ensure provider markdown exists in project repo
         await self._ensure_provider_md(project_path)
         turn_id = str(uuid.uuid4())[:8]
@@ -165,15 +186,12 @@ class GeminiCLI(BaseCLI):
             project_repo_path = project_path
 
         # Project ID
-        path_parts = project_path.split("/")
-        project_id = (
-            path_parts[path_parts.index("repo") - 1]
-            if "repo" in path_parts and path_parts.index("repo") > 0
-            else path_parts[-1]
-        )
+        project_id = self.resolve_project_id(project_path)
 
-        # Ensure session
+        # Ensure session (ACP sessions live inside one agent process)
         stored_session_id = await self.get_session_id(project_id)
+        if stored_session_id and stored_session_id not in client.sessions:
+            stored_session_id = None
         ui.debug(f"[{turn_id}] resolved project_id={project_id}", "Gemini")
         if not stored_session_id:
             # Try creating a session to reuse cached OAuth credentials if present
@@ -184,6 +202,7 @@ class GeminiCLI(BaseCLI):
                 stored_session_id = result.get("sessionId")
                 if stored_session_id:
                     await self.set_session_id(project_id, stored_session_id)
+                    client.sessions.add(stored_session_id)
                     ui.info(f"[{turn_id}] session created: {stored_session_id}", "Gemini")
             except Exception as e:
                 # Authenticate then retry session/new
@@ -200,6 +219,7 @@ class GeminiCLI(BaseCLI):
                     stored_session_id = result.get("sessionId")
                     if stored_session_id:
                         await self.set_session_id(project_id, stored_session_id)
+                        client.sessions.add(stored_session_id)
                         ui.info(f"[{turn_id}] session created after auth: {stored_session_id}", "Gemini")
                 except Exception as e2:
                     ui.error(f"[{turn_id}] authentication/session failed: {e2}", "Gemini")
@@ -218,12 +238,13 @@ class GeminiCLI(BaseCLI):
         q: asyncio.Queue = asyncio.Queue()
         thought_buffer: List[str] = []
         text_buffer: List[str] = []
+        acp_usage: Optional[TokenUsage] = None  # Latest usage the agent reported for this turn
 
         def _on_update(params: Dict[str, Any]) -> None:
+            nonlocal acp_usage
             try:
-                if params.get("sessionId") != stored_session_id:
-                    return
                 update = params.get("update") or {}
+                acp_usage = parse_usage(update) or acp_usage
                 try:
                     kind = update.get("sessionUpdate") or update.get("type")
                     snippet = ""
@@ -241,7 +262,6 @@ class GeminiCLI(BaseCLI):
             except Exception:
                 pass
 
-        client.on_notification("session/update", _on_update)
 
         # Build prompt parts
         parts: List[Dict[str, Any]] = []
@@ -257,6 +277,13 @@ class GeminiCLI(BaseCLI):
                     return default
 
             for image in images:
+                # Store-backed attachments reuse the cached encoding across turns
+                stored = image_store.resolve(image)
+                if stored:
+                    b64 = image_store.get_base64(stored.hash)
+                    if b64:
+                        parts.append({"type": "image", "mimeType": stored.mime_type, "data": b64})
+                        continue
                 local_path = _iget(image, "path")
                 b64 = _iget(image, "base64_data") or _iget(image, "data")
                 if not b64 and _iget(image, "url", "").startswith("data:"):
@@ -280,95 +307,105 @@ class GeminiCLI(BaseCLI):
         # Send prompt
         def _make_prompt_task() -> asyncio.Task:
             ui.debug(f"[{turn_id}] sending session/prompt (parts={len(parts)})", "Gemini")
+            self._active_turns[session_id or ""] = (client, stored_session_id)
+            # Updates are routed by sessionId; a retry re-routes this turn to the new session
+            client.route_session(stored_session_id, turn_id, _on_update)
             return asyncio.create_task(
                 client.request(
                     "session/prompt", {"sessionId": stored_session_id, "prompt": parts}
                 )
             )
-        prompt_task = _make_prompt_task()
+        try:
+            prompt_task = _make_prompt_task()
 
-        while True:
-            done, _ = await asyncio.wait(
-                {prompt_task, asyncio.create_task(q.get())},
-                return_when=asyncio.FIRST_COMPLETED,
-            )
-            if prompt_task in done:
-                ui.debug(f"[{turn_id}] prompt_task completed; draining updates", "Gemini")
-                # Drain remaining
-                while not q.empty():
-                    update = q.get_nowait()
-                    async for m in self._update_to_messages(update, project_path, session_id, thought_buffer, text_buffer):
-                        if m:
-                            yield m
-                exc = prompt_task.exception()
-                if exc:
-                    msg = str(exc)
-                    if "Session not found" in msg or "session not found" in msg.lower():
-                        ui.warning(f"[{turn_id}] session expired; creating a new session and retrying", "Gemini")
-                        try:
-                            result = await client.request(
-                                "session/new", {"cwd": project_repo_path, "mcpServers": []}
-                            )
-                            stored_session_id = result.get("sessionId")
-                            if stored_session_id:
-                                await self.set_session_id(project_id, stored_session_id)
-                                ui.info(f"[{turn_id}] new session={stored_session_id}; retrying prompt", "Gemini")
-                                prompt_task = _make_prompt_task()
-                                continue
-                        except Exception as e2:
-                            ui.error(f"[{turn_id}] session recovery failed: {e2}", "Gemini")
+            while True:
+                done, _ = await asyncio.wait(
+                    {prompt_task, asyncio.create_task(q.get())},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if prompt_task in done:
+                    ui.debug(f"[{turn_id}] prompt_task completed; draining updates", "Gemini")
+                    # Drain remaining
+                    while not q.empty():
+                        update = q.get_nowait()
+                        async for m in self._update_to_messages(update, project_path, session_id, thought_buffer, text_buffer):
+                            if m:
+                                yield m
+                    exc = prompt_task.exception()
+                    if not exc:
+                        acp_usage = parse_usage(prompt_task.result()) or acp_usage
+                    if exc:
+                        msg = str(exc)
+                        if "Session not found" in msg or "session not found" in msg.lower():
+                            ui.warning(f"[{turn_id}] session expired; creating a new session and retrying", "Gemini")
+                            try:
+                                result = await client.request(
+                                    "session/new", {"cwd": project_repo_path, "mcpServers": []}
+                                )
+                                stored_session_id = result.get("sessionId")
+                                if stored_session_id:
+                                    await self.set_session_id(project_id, stored_session_id)
+                                    client.sessions.add(stored_session_id)
+                                    ui.info(f"[{turn_id}] new session={stored_session_id}; retrying prompt", "Gemini")
+                                    prompt_task = _make_prompt_task()
+                                    continue
+                            except Exception as e2:
+                                ui.error(f"[{turn_id}] session recovery failed: {e2}", "Gemini")
+                                yield Message(
+                                    id=str(uuid.uuid4()),
+                                    project_id=project_path,
+                                    role="assistant",
+                                    message_type="error",
+                                    content=f"Gemini session recovery failed: {e2}",
+                                    metadata_json={"cli_type": self.cli_type.value},
+                                    session_id=session_id,
+                                    created_at=datetime.utcnow(),
+                                )
+                        else:
+                            ui.error(f"[{turn_id}] prompt error: {msg}", "Gemini")
                             yield Message(
                                 id=str(uuid.uuid4()),
                                 project_id=project_path,
                                 role="assistant",
                                 message_type="error",
-                                content=f"Gemini session recovery failed: {e2}",
+                                content=f"Gemini prompt error: {msg}",
                                 metadata_json={"cli_type": self.cli_type.value},
                                 session_id=session_id,
                                 created_at=datetime.utcnow(),
                             )
-                    else:
-                        ui.error(f"[{turn_id}] prompt error: {msg}", "Gemini")
+                    # Final flush of buffered assistant content (with <thinking> block)
+                    if thought_buffer or text_buffer:
+                        ui.debug(
+                            f"[{turn_id}] flushing buffered content thought_len={sum(len(x) for x in thought_buffer)} text_len={sum(len(x) for x in text_buffer)}",
+                            "Gemini",
+                        )
                         yield Message(
                             id=str(uuid.uuid4()),
                             project_id=project_path,
                             role="assistant",
-                            message_type="error",
-                            content=f"Gemini prompt error: {msg}",
+                            message_type="chat",
+                            content=self._compose_content(thought_buffer, text_buffer),
                             metadata_json={"cli_type": self.cli_type.value},
                             session_id=session_id,
                             created_at=datetime.utcnow(),
                         )
-                # Final flush of buffered assistant content (with <thinking> block)
-                if thought_buffer or text_buffer:
-                    ui.debug(
-                        f"[{turn_id}] flushing buffered content thought_len={sum(len(x) for x in thought_buffer)} text_len={sum(len(x) for x in text_buffer)}",
-                        "Gemini",
-                    )
-                    yield Message(
-                        id=str(uuid.uuid4()),
-                        project_id=project_path,
-                        role="assistant",
-                        message_type="chat",
-                        content=self._compose_content(thought_buffer, text_buffer),
-                        metadata_json={"cli_type": self.cli_type.value},
-                        session_id=session_id,
-                        created_at=datetime.utcnow(),
-                    )
-                    thought_buffer.clear()
-                    text_buffer.clear()
-                break
-            for task in done:
-                if task is not prompt_task:
-                    update = task.result()
-                    try:
-                        kind = update.get("sessionUpdate") or update.get("type")
-                        ui.debug(f"[{turn_id}] processing update kind={kind}", "Gemini")
-                    except Exception:
-                        pass
-                    async for m in self._update_to_messages(update, project_path, session_id, thought_buffer, text_buffer):
-                        if m:
-                            yield m
+                        thought_buffer.clear()
+                        text_buffer.clear()
+                    break
+                for task in done:
+                    if task is not prompt_task:
+                        update = task.result()
+                        try:
+                            kind = update.get("sessionUpdate") or update.get("type")
+                            ui.debug(f"[{turn_id}] processing update kind={kind}", "Gemini")
+                        except Exception:
+                            pass
+                        async for m in self._update_to_messages(update, project_path, session_id, thought_buffer, text_buffer):
+                            if m:
+                                yield m
+        finally:
+            client.unroute_turn(turn_id)
+            self._active_turns.pop(session_id or "", None)
 
         yield Message(
             id=str(uuid.uuid4()),
@@ -376,12 +413,28 @@ class GeminiCLI(BaseCLI):
             role="system",
             message_type="result",
             content="Gemini turn completed",
-            metadata_json={"cli_type": self.cli_type.value, "hidden_from_ui": True},
+            metadata_json={
+                "cli_type": self.cli_type.value,
+                "hidden_from_ui": True,
+                **({"usage": acp_usage.to_dict()} if acp_usage else {}),
+            },
             session_id=session_id,
             created_at=datetime.utcnow(),
         )
         ui.info(f"[{turn_id}] turn completed", "Gemini")
 
+    async def cancel(self, session_id: Optional[str] = None) -> None:
+        """Cancel the in-flight prompt turn via ACP session/cancel"""
+        turn = self._active_turns.get(session_id or "")
+        if not turn:
+            return
+        client, acp_session_id = turn
+        ui.info(f"Cancelling Gemini turn for session {acp_session_id}", "Gemini")
+        try:
+            await client.notify("session/cancel", {"sessionId": acp_session_id})
+        except Exception as e:
+            ui.warning(f"Gemini session/cancel failed: {e}", "Gemini")
+
     async def _update_to_messages(
         self,
         update: Dict[str, Any],
@@ -567,53 +620,13 @@ class GeminiCLI(BaseCLI):
         return tool_input
 
     async def get_session_id(self, project_id: str) -> Optional[str]:
-        if self.db_session:
-            try:
-                from app.models.projects import Project
-
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project and project.active_cursor_session_id:
-                    try:
-                        data = json.loads(project.active_cursor_session_id)
-                        if isinstance(data, dict) and "gemini" in data:
-                            return data["gemini"]
-                    except Exception:
-                        pass
-            except Exception as e:
-                ui.warning(f"Gemini get_session_id DB error: {e}", "Gemini")
-        return self._session_store.get(project_id)
+        """Get stored session ID for project"""
+        return self.provider_session(project_id).session_id
 
     async def set_session_id(self, project_id: str, session_id: str) -> None:
-        if self.db_session:
-            try:
-                from app.models.projects import Project
-
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project:
-                    data: Dict[str, Any] = {}
-                    if project.active_cursor_session_id:
-                        try:
-                            val = json.loads(project.active_cursor_session_id)
-                            if isinstance(val, dict):
-                                data = val
-                            else:
-                                data = {"cursor": val}
-                        except Exception:
-                            data = {"cursor": project.active_cursor_session_id}
-                    data["gemini"] = session_id
-                    project.active_cursor_session_id = json.dumps(data)
-                    self.db_session.commit()
-            except Exception as e:
-                ui.warning(f"Gemini set_session_id DB error: {e}", "Gemini")
-        self._session_store[project_id] = session_id
+        """Store session ID for project (write-through to cli_sessions)"""
+        self.save_provider_session(project_id, session_id=session_id)
+        ui.debug(f"Gemini session stored for project {project_id}: {session_id}", "Gemini")
 
 
 __all__ = ["GeminiCLI"]
@@ -10,16 +10,22 @@ import asyncio
 import base64
 import json
 import os
+import shlex
 import uuid
 from dataclasses import dataclass
 import shutil
 from datetime import datetime
-from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
 
+from app.core.config import settings
 from app.core.terminal_ui import ui
+from app.core.tracing import trace_span
 from app.models.messages import Message
 
-from ..base import BaseCLI, CLIType
+from ..acp_pool import get_acp_pool
+from ..base import BaseCLI, CLIType, NDJSONDecoder, notify_process_spawned
+from ..process import CLIProcess, create_detached_task, spawn_cli_process
+from ..usage import TokenUsage, parse_usage
 
 
 @dataclass
@@ -27,34 +33,73 @@ class _Pending:
     fut: asyncio.Future
 
 
+def _log_qwen_stderr(line: str) -> None:
+    """Surface meaningful Qwen stderr lines (the whole stream is kept in the process's stderr tail)"""
+    decoded = line.strip()
+    # Skip polling for token messages
+    if "polling for token" in decoded.lower():
+        return
+    # Skip ImportProcessor errors (these are just warnings about npm packages)
+    if "[ERROR] [ImportProcessor]" in decoded:
+        return
+    # Skip ENOENT errors for node_modules paths
+    if "ENOENT" in decoded and ("node_modules" in decoded or "tailwind" in decoded or "supabase" in decoded):
+        return
+    # Only log meaningful errors
+    if decoded and not decoded.startswith("DEBUG"):
+        ui.warning(decoded, "Qwen STDERR")
+
+
 class _ACPClient:
     """Minimal JSON-RPC client over newline-delimited JSON on stdio."""
 
-    def __init__(self, cmd: List[str], env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None):
+    # Agent-initiated requests (fs reads/writes, permissions) handled at once
+    MAX_CONCURRENT_REQUESTS = 8
+
+    def __init__(
+        self,
+        cmd: List[str],
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None,
+        on_stderr_line: Optional[Callable[[str], None]] = None,
+    ):
         self._cmd = cmd
         self._env = env or os.environ.copy()
         self._cwd = cwd or os.getcwd()
-        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._on_stderr_line = on_stderr_line
+        self._proc: Optional[CLIProcess] = None
         self._next_id = 1
         self._pending: Dict[int, _Pending] = {}
         self._notif_handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        # session/update routing: ACP sessionId -> turn id -> handler, and turn id -> sessionId
+        self._session_routes: Dict[str, Dict[str, Callable[[Dict[str, Any]], None]]] = {}
+        self._turn_sessions: Dict[str, str] = {}
         self._request_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {}
         self._reader_task: Optional[asyncio.Task] = None
+        self._request_slots = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        self._request_tasks: set = set()
+        self.sessions: set = set()  # ACP sessionIds created on this process
+
+    @property
+    def is_alive(self) -> bool:
+        return (
+            self._proc is not None
+            and self._proc.returncode is None
+            and self._reader_task is not None
+            and not self._reader_task.done()
+        )
 
     async def start(self) -> None:
         if self._proc is not None:
             return
-        self._proc = await asyncio.create_subprocess_exec(
-            *self._cmd,
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            env=self._env,
-            cwd=self._cwd,
-        )
+        with trace_span("process.spawn", command=os.path.basename(self._cmd[0])):
+            self._proc = await spawn_cli_process(
+                self._cmd, self._cwd, env=self._env, on_stderr_line=self._on_stderr_line
+            )
+        notify_process_spawned(self._proc, os.path.basename(self._cmd[0]))
 
-        # Start reader
-        self._reader_task = asyncio.create_task(self._reader_loop())
+        # Start reader; it outlives this request, so it gets a fresh context
+        self._reader_task = create_detached_task(self._reader_loop())
 
     async def stop(self) -> None:
         try:
@@ -69,10 +114,28 @@ class _ACPClient:
             if self._reader_task:
                 self._reader_task.cancel()
                 self._reader_task = None
+            for task in list(self._request_tasks):
+                task.cancel()
 
     def on_notification(self, method: str, handler: Callable[[Dict[str, Any]], None]) -> None:
         self._notif_handlers.setdefault(method, []).append(handler)
 
+    def route_session(self, session_id: str, turn_id: str, handler: Callable[[Dict[str, Any]], None]) -> None:
+        """Deliver session/update for `session_id` to `handler` until the turn is unrouted"""
+        self.unroute_turn(turn_id)
+        self._session_routes.setdefault(session_id, {})[turn_id] = handler
+        self._turn_sessions[turn_id] = session_id
+
+    def unroute_turn(self, turn_id: str) -> None:
+        session_id = self._turn_sessions.pop(turn_id, None)
+        if session_id is None:
+            return
+        routes = self._session_routes.get(session_id)
+        if routes is not None:
+            routes.pop(turn_id, None)
+            if not routes:
+                del self._session_routes[session_id]
+
     def on_request(self, method: str, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]) -> None:
         self._request_handlers[method] = handler
 
@@ -89,23 +152,16 @@ class _ACPClient:
         await self._proc.stdin.drain()
         return await fut
 
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        """Send a JSON-RPC notification (no response expected)."""
+        await self._send({"jsonrpc": "2.0", "method": method, "params": params or {}})
+
     async def _reader_loop(self) -> None:
         assert self._proc and self._proc.stdout
-        stdout = self._proc.stdout
-        buffer = b""
-        while True:
-            line = await stdout.readline()
-            if not line:
-                break
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                msg = json.loads(line.decode("utf-8"))
-            except Exception:
-                # best-effort: ignore malformed
-                continue
-
+        proc = self._proc
+        # Malformed lines are skipped by the decoder (best-effort)
+        decoder = NDJSONDecoder(label="ACP")
+        async for msg in decoder.iter_stream(proc.stdout):
             # Response
             if isinstance(msg, dict) and "id" in msg and "method" not in msg:
                 slot = self._pending.pop(int(msg["id"])) if int(msg["id"]) in self._pending else None
@@ -117,40 +173,65 @@ class _ACPClient:
                     slot.fut.set_result(msg.get("result"))
                 continue
 
-            # Request from agent (client-side)
+            # Request from agent (client-side): handled off the reader so that
+            # responses and session/update keep flowing during slow file I/O.
+            # Reading pauses only once every slot is busy.
             if isinstance(msg, dict) and "method" in msg and "id" in msg:
-                req_id = msg["id"]
-                method = msg["method"]
-                params = msg.get("params") or {}
-                handler = self._request_handlers.get(method)
-                if handler:
-                    try:
-                        result = await handler(params)
-                        await self._send({"jsonrpc": "2.0", "id": req_id, "result": result})
-                    except Exception as e:
-                        await self._send({
-                            "jsonrpc": "2.0",
-                            "id": req_id,
-                            "error": {"code": -32000, "message": str(e)},
-                        })
-                else:
-                    await self._send({
-                        "jsonrpc": "2.0",
-                        "id": req_id,
-                        "error": {"code": -32601, "message": "Method not found"},
-                    })
+                await self._request_slots.acquire()
+                task = asyncio.create_task(self._dispatch_request(msg))
+                self._request_tasks.add(task)
+                task.add_done_callback(self._request_tasks.discard)
                 continue
 
             # Notification from agent
             if isinstance(msg, dict) and "method" in msg and "id" not in msg:
                 method = msg["method"]
                 params = msg.get("params") or {}
-                for h in self._notif_handlers.get(method, []) or []:
+                handlers = self._notif_handlers.get(method) or []
+                if method == "session/update":
+                    routes = self._session_routes.get(params.get("sessionId"))
+                    if routes:
+                        handlers = [*routes.values(), *handlers]
+                for h in handlers:
                     try:
                         h(params)
                     except Exception:
                         pass
 
+        # stdout closed: the process is gone, so nothing will answer pending requests
+        if self._pending:
+            await proc.stderr_tail.wait_closed()
+        detail = proc.failure_detail()
+        for slot in self._pending.values():
+            if not slot.fut.done():
+                slot.fut.set_exception(RuntimeError(f"ACP process exited ({detail})" if detail else "ACP process exited"))
+        self._pending.clear()
+
+    async def _dispatch_request(self, msg: Dict[str, Any]) -> None:
+        req_id = msg["id"]
+        handler = self._request_handlers.get(msg["method"])
+        try:
+            if handler:
+                try:
+                    result = await handler(msg.get("params") or {})
+                    await self._send({"jsonrpc": "2.0", "id": req_id, "result": result})
+                except Exception as e:
+                    await self._send({
+                        "jsonrpc": "2.0",
+                        "id": req_id,
+                        "error": {"code": -32000, "message": str(e)},
+                    })
+            else:
+                await self._send({
+                    "jsonrpc": "2.0",
+                    "id": req_id,
+                    "error": {"code": -32601, "message": "Method not found"},
+                })
+        except Exception as e:
+            ui.debug(f"ACP response for request {req_id} not sent: {e}", "ACP")
+        finally:
+            self._request_slots.release()
+
     async def _send(self, obj: Dict[str, Any]) -> None:
         if not self._proc or not self._proc.stdin:
             return
@@ -161,21 +242,16 @@ class _ACPClient:
 class QwenCLI(BaseCLI):
     """Qwen CLI via ACP. Streams message and thought chunks to UI."""
 
-    # Shared ACP client across instances to preserve sessions
-    _SHARED_CLIENT: Optional[_ACPClient] = None
-    _SHARED_INITIALIZED: bool = False
-
     def __init__(self, db_session=None):
         super().__init__(CLIType.QWEN)
         self.db_session = db_session
-        self._session_store: Dict[str, str] = {}
-        self._client: Optional[_ACPClient] = None
-        self._initialized = False
+        # Our session ID -> (agent client, ACP sessionId) with a prompt in flight
+        self._active_turns: Dict[str, Tuple[_ACPClient, str]] = {}
 
     async def check_availability(self) -> Dict[str, Any]:
         try:
             proc = await asyncio.create_subprocess_shell(
-                "qwen --help",
+                f"{settings.qwen_cmd or 'qwen'} --help",
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
             )
@@ -224,135 +300,109 @@ class QwenCLI(BaseCLI):
         except Exception as e:
             ui.warning(f"Failed to create QWEN.md: {e}", "Qwen")
 
-    async def _ensure_client(self) -> _ACPClient:
-        # Use shared client across adapter instances
-        if QwenCLI._SHARED_CLIENT is None:
-            # Resolve command: env(QWEN_CMD) -> qwen -> qwen-code
-            candidates = []
-            env_cmd = os.getenv("QWEN_CMD")
-            if env_cmd:
-                candidates.append(env_cmd)
-            candidates.extend(["qwen", "qwen-code"])
-            resolved = None
-            for c in candidates:
-                if shutil.which(c):
-                    resolved = c
+    @staticmethod
+    async def _spawn_client() -> _ACPClient:
+        """Start and initialize one Qwen ACP agent (used by the process pool)"""
+        # Resolve command: settings.qwen_cmd (QWEN_CMD) -> qwen -> qwen-code
+        candidates = []
+        if settings.qwen_cmd:
+            candidates.append(shlex.split(settings.qwen_cmd))
+        candidates.extend([["qwen"], ["qwen-code"]])
+        resolved = None
+        for c in candidates:
+            if c and shutil.which(c[0]):
+                resolved = c
+                break
+        if not resolved:
+            raise RuntimeError(
+                "Qwen CLI not found. Set QWEN_CMD or install 'qwen' CLI in PATH."
+            )
+        cmd = [*resolved, "--experimental-acp"]
+        # Prefer device-code / no-browser flow to avoid launching windows
+        env = os.environ.copy()
+        env.setdefault("NO_BROWSER", "1")
+        client = _ACPClient(cmd, env=env, on_stderr_line=_log_qwen_stderr)
+
+        # Register client-side request handlers
+        async def _handle_permission(params: Dict[str, Any]) -> Dict[str, Any]:
+            # Auto-approve: prefer allow_always -> allow_once -> first
+            options = params.get("options") or []
+            chosen = None
+            for kind in ("allow_always", "allow_once"):
+                chosen = next((o for o in options if o.get("kind") == kind), None)
+                if chosen:
                     break
-            if not resolved:
-                raise RuntimeError(
-                    "Qwen CLI not found. Set QWEN_CMD or install 'qwen' CLI in PATH."
-                )
-            cmd = [resolved, "--experimental-acp"]
-            # Prefer device-code / no-browser flow to avoid launching windows
-            env = os.environ.copy()
-            env.setdefault("NO_BROWSER", "1")
-            QwenCLI._SHARED_CLIENT = _ACPClient(cmd, env=env)
-
-            # Register client-side request handlers
-            async def _handle_permission(params: Dict[str, Any]) -> Dict[str, Any]:
-                # Auto-approve: prefer allow_always -> allow_once -> first
-                options = params.get("options") or []
-                chosen = None
-                for kind in ("allow_always", "allow_once"):
-                    chosen = next((o for o in options if o.get("kind") == kind), None)
-                    if chosen:
-                        break
-                if not chosen and options:
-                    chosen = options[0]
-                if not chosen:
-                    return {"outcome": {"outcome": "cancelled"}}
-                return {
-                    "outcome": {"outcome": "selected", "optionId": chosen.get("optionId")}
-                }
+            if not chosen and options:
+                chosen = options[0]
+            if not chosen:
+                return {"outcome": {"outcome": "cancelled"}}
+            return {
+                "outcome": {"outcome": "selected", "optionId": chosen.get("optionId")}
+            }
 
-            async def _fs_read(params: Dict[str, Any]) -> Dict[str, Any]:
-                # Conservative: deny reading arbitrary files from agent perspective
-                return {"content": ""}
-
-            async def _fs_write(params: Dict[str, Any]) -> Dict[str, Any]:
-                # Validate required parameters for file editing
-                if "old_string" not in params and "content" in params:
-                    # If old_string is missing but content exists, log warning
-                    ui.warning(
-                        f"Qwen edit missing 'old_string' parameter: {params.get('path', 'unknown')}",
-                        "Qwen"
-                    )
-                    return {"error": "Missing required parameter: old_string"}
-                # Not fully implemented for safety, but return success to avoid blocking
-                return {"success": True}
+        async def _fs_read(params: Dict[str, Any]) -> Dict[str, Any]:
+            # Conservative: deny reading arbitrary files from agent perspective
+            return {"content": ""}
 
-            async def _edit_file(params: Dict[str, Any]) -> Dict[str, Any]:
-                # Handle edit requests with proper parameter validation
-                path = params.get('path', params.get('file_path', 'unknown'))
-                
-                # Log the edit attempt for debugging
-                ui.debug(f"Qwen edit request: path={path}, has_old_string={'old_string' in params}", "Qwen")
-                
-                if "old_string" not in params:
-                    ui.warning(
-                        f"Qwen edit missing 'old_string': {path}",
-                        "Qwen"
-                    )
-                    # Return success anyway to not block Qwen's workflow
-                    # This allows Qwen to continue even with malformed requests
-                    return {"success": True}
-                
-                # For safety, we don't actually perform the edit but return success
-                ui.debug(f"Qwen edit would modify: {path}", "Qwen")
+        async def _fs_write(params: Dict[str, Any]) -> Dict[str, Any]:
+            # Validate required parameters for file editing
+            if "old_string" not in params and "content" in params:
+                # If old_string is missing but content exists, log warning
+                ui.warning(
+                    f"Qwen edit missing 'old_string' parameter: {params.get('path', 'unknown')}",
+                    "Qwen"
+                )
+                return {"error": "Missing required parameter: old_string"}
+            # Not fully implemented for safety, but return success to avoid blocking
+            return {"success": True}
+
+        async def _edit_file(params: Dict[str, Any]) -> Dict[str, Any]:
+            # Handle edit requests with proper parameter validation
+            path = params.get('path', params.get('file_path', 'unknown'))
+            
+            # Log the edit attempt for debugging
+            ui.debug(f"Qwen edit request: path={path}, has_old_string={'old_string' in params}", "Qwen")
+            
+            if "old_string" not in params:
+                ui.warning(
+                    f"Qwen edit missing 'old_string': {path}",
+                    "Qwen"
+                )
+                # Return success anyway to not block Qwen's workflow
+                # This allows Qwen to continue even with malformed requests
                 return {"success": True}
+            
+            # For safety, we don't actually perform the edit but return success
+            ui.debug(f"Qwen edit would modify: {path}", "Qwen")
+            return {"success": True}
 
-            QwenCLI._SHARED_CLIENT.on_request("session/request_permission", _handle_permission)
-            QwenCLI._SHARED_CLIENT.on_request("fs/read_text_file", _fs_read)
-            QwenCLI._SHARED_CLIENT.on_request("fs/write_text_file", _fs_write)
-            QwenCLI._SHARED_CLIENT.on_request("edit", _edit_file)
-            QwenCLI._SHARED_CLIENT.on_request("str_replace_editor", _edit_file)
+        client.on_request("session/request_permission", _handle_permission)
+        client.on_request("fs/read_text_file", _fs_read)
+        client.on_request("fs/write_text_file", _fs_write)
+        client.on_request("edit", _edit_file)
+        client.on_request("str_replace_editor", _edit_file)
 
-            await QwenCLI._SHARED_CLIENT.start()
-            # Attach simple stderr logger (filtering out polling messages)
-            try:
-                proc = QwenCLI._SHARED_CLIENT._proc
-                if proc and proc.stderr:
-                    async def _log_stderr(stream):
-                        while True:
-                            line = await stream.readline()
-                            if not line:
-                                break
-                            decoded = line.decode(errors="ignore").strip()
-                            # Skip polling for token messages
-                            if "polling for token" in decoded.lower():
-                                continue
-                            # Skip ImportProcessor errors (these are just warnings about npm packages)
-                            if "[ERROR] [ImportProcessor]" in decoded:
-                                continue
-                            # Skip ENOENT errors for node_modules paths
-                            if "ENOENT" in decoded and ("node_modules" in decoded or "tailwind" in decoded or "supabase" in decoded):
-                                continue
-                            # Only log meaningful errors
-                            if decoded and not decoded.startswith("DEBUG"):
-                                ui.warning(decoded, "Qwen STDERR")
-                    asyncio.create_task(_log_stderr(proc.stderr))
-            except Exception:
-                pass
+        await client.start()
 
-        self._client = QwenCLI._SHARED_CLIENT
-
-        if not QwenCLI._SHARED_INITIALIZED:
-            try:
-                await self._client.request(
-                    "initialize",
-                    {
-                        "clientCapabilities": {
-                            "fs": {"readTextFile": False, "writeTextFile": False}
-                        },
-                        "protocolVersion": 1,
+        try:
+            await client.request(
+                "initialize",
+                {
+                    "clientCapabilities": {
+                        "fs": {"readTextFile": False, "writeTextFile": False}
                     },
-                )
-                QwenCLI._SHARED_INITIALIZED = True
-            except Exception as e:
-                ui.error(f"Qwen initialize failed: {e}", "Qwen")
-                raise
+                    "protocolVersion": 1,
+                },
+            )
+        except Exception as e:
+            ui.error(f"Qwen initialize failed: {e}", "Qwen")
+            await client.stop()
+            raise
+        return client
 
-        return self._client
+    @staticmethod
+    def _pool():
+        return get_acp_pool("Qwen", QwenCLI._spawn_client)
 
     async def execute_with_streaming(
         self,
@@ -364,7 +414,23 @@ class QwenCLI(BaseCLI):
         model: Optional[str] = None,
         is_initial_prompt: bool = False,
     ) -> AsyncGenerator[Message, None]:
-        client = await self._ensure_client()
+        # Each project gets its own warm agent process (shared only when the pool is full)
+        project_id = self.resolve_project_id(project_path)
+        async with self._pool().lease(project_id) as client:
+            async for message in self._stream_turn(
+                client, instruction, project_path, session_id, images, model
+            ):
+                yield message
+
+    async def _stream_turn(
+        self,
+        client: _ACPClient,
+        instruction: str,
+        project_path: str,
+        session_id: Optional[str],
+        images: Optional[List[Dict[str, Any]]],
+        model: Optional[str],
+    ) -> AsyncGenerator[Message, None]:
         # Ensure provider markdown exists in project repo
         await self._ensure_provider_md(project_path)
         turn_id = str(uuid.uuid4())[:8]
@@ -382,15 +448,12 @@ class QwenCLI(BaseCLI):
             project_repo_path = project_path
 
         # Project ID
-        path_parts = project_path.split("/")
-        project_id = (
-            path_parts[path_parts.index("repo") - 1]
-            if "repo" in path_parts and path_parts.index("repo") > 0
-            else path_parts[-1]
-        )
+        project_id = self.resolve_project_id(project_path)
 
-        # Ensure session
+        # Ensure session (ACP sessions live inside one agent process)
         stored_session_id = await self.get_session_id(project_id)
+        if stored_session_id and stored_session_id not in client.sessions:
+            stored_session_id = None
         if not stored_session_id:
             # Try to reuse cached OAuth by creating a session first
             try:
@@ -400,6 +463,7 @@ class QwenCLI(BaseCLI):
                 stored_session_id = result.get("sessionId")
                 if stored_session_id:
                     await self.set_session_id(project_id, stored_session_id)
+                    client.sessions.add(stored_session_id)
                     ui.info(f"Qwen session created: {stored_session_id}", "Qwen")
             except Exception as e:
                 # Authenticate only if needed, then retry session/new
@@ -416,6 +480,7 @@ class QwenCLI(BaseCLI):
                     stored_session_id = result.get("sessionId")
                     if stored_session_id:
                         await self.set_session_id(project_id, stored_session_id)
+                        client.sessions.add(stored_session_id)
                         ui.info(
                             f"Qwen session created after auth: {stored_session_id}", "Qwen"
                         )
@@ -437,17 +502,17 @@ class QwenCLI(BaseCLI):
         q: asyncio.Queue = asyncio.Queue()
         thought_buffer: List[str] = []
         text_buffer: List[str] = []
+        acp_usage: Optional[TokenUsage] = None  # Latest usage the agent reported for this turn
 
         def _on_update(params: Dict[str, Any]) -> None:
+            nonlocal acp_usage
             try:
-                if params.get("sessionId") != stored_session_id:
-                    return
                 update = params.get("update") or {}
+                acp_usage = parse_usage(update) or acp_usage
                 q.put_nowait(update)
             except Exception:
                 pass
 
-        client.on_notification("session/update", _on_update)
 
         # Build prompt parts
         parts: List[Dict[str, Any]] = []
@@ -469,6 +534,9 @@ class QwenCLI(BaseCLI):
         # Helper to create a prompt task for current session
         def _make_prompt_task() -> asyncio.Task:
             ui.debug(f"[{turn_id}] sending session/prompt (parts={len(parts)})", "Qwen")
+            self._active_turns[session_id or ""] = (client, stored_session_id)
+            # Updates are routed by sessionId; a retry re-routes this turn to the new session
+            client.route_session(stored_session_id, turn_id, _on_update)
             return asyncio.create_task(
                 client.request(
                     "session/prompt",
@@ -476,83 +544,90 @@ class QwenCLI(BaseCLI):
                 )
             )
 
-        prompt_task = _make_prompt_task()
+        try:
+            prompt_task = _make_prompt_task()
 
-        # Stream notifications until prompt completes
-        while True:
-            done, pending = await asyncio.wait(
-                {prompt_task, asyncio.create_task(q.get())},
-                return_when=asyncio.FIRST_COMPLETED,
-            )
-            if prompt_task in done:
-                ui.debug(f"[{turn_id}] prompt_task completed; draining updates", "Qwen")
-                # Flush remaining updates quickly
-                while not q.empty():
-                    update = q.get_nowait()
-                    async for m in self._update_to_messages(update, project_path, session_id, thought_buffer, text_buffer):
-                        if m:
-                            yield m
-                # Handle prompt exception (e.g., session not found) with one retry
-                exc = prompt_task.exception()
-                if exc:
-                    msg = str(exc)
-                    if "Session not found" in msg or "session not found" in msg.lower():
-                        ui.warning("Qwen session expired; creating a new session and retrying", "Qwen")
-                        try:
-                            result = await client.request(
-                                "session/new", {"cwd": project_repo_path, "mcpServers": []}
-                            )
-                            stored_session_id = result.get("sessionId")
-                            if stored_session_id:
-                                await self.set_session_id(project_id, stored_session_id)
-                                prompt_task = _make_prompt_task()
-                                continue  # re-enter wait loop
-                        except Exception as e2:
+            # Stream notifications until prompt completes
+            while True:
+                done, pending = await asyncio.wait(
+                    {prompt_task, asyncio.create_task(q.get())},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if prompt_task in done:
+                    ui.debug(f"[{turn_id}] prompt_task completed; draining updates", "Qwen")
+                    # Flush remaining updates quickly
+                    while not q.empty():
+                        update = q.get_nowait()
+                        async for m in self._update_to_messages(update, project_path, session_id, thought_buffer, text_buffer):
+                            if m:
+                                yield m
+                    # Handle prompt exception (e.g., session not found) with one retry
+                    exc = prompt_task.exception()
+                    if not exc:
+                        acp_usage = parse_usage(prompt_task.result()) or acp_usage
+                    if exc:
+                        msg = str(exc)
+                        if "Session not found" in msg or "session not found" in msg.lower():
+                            ui.warning("Qwen session expired; creating a new session and retrying", "Qwen")
+                            try:
+                                result = await client.request(
+                                    "session/new", {"cwd": project_repo_path, "mcpServers": []}
+                                )
+                                stored_session_id = result.get("sessionId")
+                                if stored_session_id:
+                                    await self.set_session_id(project_id, stored_session_id)
+                                    client.sessions.add(stored_session_id)
+                                    prompt_task = _make_prompt_task()
+                                    continue  # re-enter wait loop
+                            except Exception as e2:
+                                yield Message(
+                                    id=str(uuid.uuid4()),
+                                    project_id=project_path,
+                                    role="assistant",
+                                    message_type="error",
+                                    content=f"Qwen session recovery failed: {e2}",
+                                    metadata_json={"cli_type": self.cli_type.value},
+                                    session_id=session_id,
+                                    created_at=datetime.utcnow(),
+                                )
+                        else:
                             yield Message(
                                 id=str(uuid.uuid4()),
                                 project_id=project_path,
                                 role="assistant",
                                 message_type="error",
-                                content=f"Qwen session recovery failed: {e2}",
+                                content=f"Qwen prompt error: {msg}",
                                 metadata_json={"cli_type": self.cli_type.value},
                                 session_id=session_id,
                                 created_at=datetime.utcnow(),
                             )
-                    else:
+                    # Final flush of buffered assistant text
+                    if thought_buffer or text_buffer:
                         yield Message(
                             id=str(uuid.uuid4()),
                             project_id=project_path,
                             role="assistant",
-                            message_type="error",
-                            content=f"Qwen prompt error: {msg}",
+                            message_type="chat",
+                            content=self._compose_content(thought_buffer, text_buffer),
                             metadata_json={"cli_type": self.cli_type.value},
                             session_id=session_id,
                             created_at=datetime.utcnow(),
                         )
-                # Final flush of buffered assistant text
-                if thought_buffer or text_buffer:
-                    yield Message(
-                        id=str(uuid.uuid4()),
-                        project_id=project_path,
-                        role="assistant",
-                        message_type="chat",
-                        content=self._compose_content(thought_buffer, text_buffer),
-                        metadata_json={"cli_type": self.cli_type.value},
-                        session_id=session_id,
-                        created_at=datetime.utcnow(),
-                    )
-                    thought_buffer.clear()
-                    text_buffer.clear()
-                break
+                        thought_buffer.clear()
+                        text_buffer.clear()
+                    break
 
-            # Process one update
-            for task in done:
-                if task is not prompt_task:
-                    update = task.result()
-                    # Suppress verbose per-chunk logs; log only tool calls below
-                    async for m in self._update_to_messages(update, project_path, session_id, thought_buffer, text_buffer):
-                        if m:
-                            yield m
+                # Process one update
+                for task in done:
+                    if task is not prompt_task:
+                        update = task.result()
+                        # Suppress verbose per-chunk logs; log only tool calls below
+                        async for m in self._update_to_messages(update, project_path, session_id, thought_buffer, text_buffer):
+                            if m:
+                                yield m
+        finally:
+            client.unroute_turn(turn_id)
+            self._active_turns.pop(session_id or "", None)
 
         # Yield hidden result/system message for bookkeeping
         yield Message(
@@ -561,12 +636,28 @@ class QwenCLI(BaseCLI):
             role="system",
             message_type="result",
             content="Qwen turn completed",
-            metadata_json={"cli_type": self.cli_type.value, "hidden_from_ui": True},
+            metadata_json={
+                "cli_type": self.cli_type.value,
+                "hidden_from_ui": True,
+                **({"usage": acp_usage.to_dict()} if acp_usage else {}),
+            },
             session_id=session_id,
             created_at=datetime.utcnow(),
         )
         ui.info(f"[{turn_id}] turn completed", "Qwen")
 
+    async def cancel(self, session_id: Optional[str] = None) -> None:
+        """Cancel the in-flight prompt turn via ACP session/cancel"""
+        turn = self._active_turns.get(session_id or "")
+        if not turn:
+            return
+        client, acp_session_id = turn
+        ui.info(f"Cancelling Qwen turn for session {acp_session_id}", "Qwen")
+        try:
+            await client.notify("session/cancel", {"sessionId": acp_session_id})
+        except Exception as e:
+            ui.warning(f"Qwen session/cancel failed: {e}", "Qwen")
+
     async def _update_to_messages(
         self,
         update: Dict[str, Any],
@@ -754,53 +845,13 @@ class QwenCLI(BaseCLI):
         return tool_input
 
     async def get_session_id(self, project_id: str) -> Optional[str]:
-        if self.db_session:
-            try:
-                from app.models.projects import Project
-
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project and project.active_cursor_session_id:
-                    try:
-                        data = json.loads(project.active_cursor_session_id)
-                        if isinstance(data, dict) and "qwen" in data:
-                            return data["qwen"]
-                    except Exception:
-                        pass
-            except Exception as e:
-                ui.warning(f"Qwen get_session_id DB error: {e}", "Qwen")
-        return self._session_store.get(project_id)
+        """Get stored session ID for project"""
+        return self.provider_session(project_id).session_id
 
     async def set_session_id(self, project_id: str, session_id: str) -> None:
-        if self.db_session:
-            try:
-                from app.models.projects import Project
-
-                project = (
-                    self.db_session.query(Project)
-                    .filter(Project.id == project_id)
-                    .first()
-                )
-                if project:
-                    data: Dict[str, Any] = {}
-                    if project.active_cursor_session_id:
-                        try:
-                            val = json.loads(project.active_cursor_session_id)
-                            if isinstance(val, dict):
-                                data = val
-                            else:
-                                data = {"cursor": val}
-                        except Exception:
-                            data = {"cursor": project.active_cursor_session_id}
-                    data["qwen"] = session_id
-                    project.active_cursor_session_id = json.dumps(data)
-                    self.db_session.commit()
-            except Exception as e:
-                ui.warning(f"Qwen set_session_id DB error: {e}", "Qwen")
-        self._session_store[project_id] = session_id
+        """Store session ID for project (write-through to cli_sessions)"""
+        self.save_provider_session(project_id, session_id=session_id)
+        ui.debug(f"Qwen session stored for project {project_id}: {session_id}", "Qwen")
 
 
 def _mime_for(path: str) -> str:
@@ -0,0 +1,124 @@
+"""
+Process-wide cache of CLI availability checks.
+
+`check_availability()` spawns a shell (`codex --version`, `gemini --help`, ...)
+or performs an HTTP health check. Results are cached per CLI type with a TTL
+and kept warm by a background refresher, so instructions do not pay for the
+check on their critical path.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.terminal_ui import ui
+
+from .base import BaseCLI, CLIType
+from .process import create_detached_task
+
+
+@dataclass
+class _Entry:
+    status: Dict[str, Any]
+    checked_at: float  # time.monotonic()
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.status.get("available") and self.status.get("configured"))
+
+
+class AvailabilityCache:
+    """TTL cache of `check_availability()` results keyed by CLI type.
+
+    - Positive results live for `ttl`; negative ones for the shorter
+      `failure_ttl` so a freshly installed CLI is picked up quickly.
+    - Concurrent misses for the same CLI share a single check.
+    - A background task re-checks every known CLI each `refresh_interval`.
+    - `invalidate()` drops an entry, e.g. after an execution failed.
+    """
+
+    def __init__(self, ttl: float, failure_ttl: float, refresh_interval: float):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.refresh_interval = refresh_interval
+        self._entries: Dict[CLIType, _Entry] = {}
+        self._adapters: Dict[CLIType, BaseCLI] = {}  # Last adapter seen, used by the refresher
+        self._inflight: Dict[CLIType, asyncio.Task] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    def _is_fresh(self, entry: _Entry) -> bool:
+        ttl = self.ttl if entry.ok else self.failure_ttl
+        return time.monotonic() - entry.checked_at < ttl
+
+    async def get(self, cli: BaseCLI, refresh: bool = False) -> Dict[str, Any]:
+        """Return the cached status for `cli`, checking it if missing or stale"""
+        self._adapters[cli.cli_type] = cli
+        self._ensure_refresher()
+
+        entry = self._entries.get(cli.cli_type)
+        if entry and not refresh and self._is_fresh(entry):
+            return entry.status
+        return await self._check(cli)
+
+    async def _check(self, cli: BaseCLI) -> Dict[str, Any]:
+        task = self._inflight.get(cli.cli_type)
+        if task is None:
+            # Shared by every caller waiting on this CLI, so tied to none of them
+            task = create_detached_task(self._run_check(cli))
+            self._inflight[cli.cli_type] = task
+        return await asyncio.shield(task)
+
+    async def _run_check(self, cli: BaseCLI) -> Dict[str, Any]:
+        try:
+            try:
+                status = await cli.check_availability()
+            except Exception as e:
+                status = {"available": False, "configured": False, "error": str(e)}
+            self._entries[cli.cli_type] = _Entry(status=status, checked_at=time.monotonic())
+            return status
+        finally:
+            self._inflight.pop(cli.cli_type, None)
+
+    def invalidate(self, cli_type: CLIType) -> None:
+        """Forget the cached status so the next `get` re-checks"""
+        if self._entries.pop(cli_type, None) is not None:
+            ui.debug(f"Availability cache invalidated for {cli_type.value}", "CLI")
+
+    def _ensure_refresher(self) -> None:
+        if self.refresh_interval <= 0:
+            return
+        if self._refresher is None or self._refresher.done():
+            self._refresher = create_detached_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            for cli_type, cli in list(self._adapters.items()):
+                try:
+                    await self._check(cli)
+                except Exception as e:
+                    ui.warning(f"Availability refresh failed for {cli_type.value}: {e}", "CLI")
+
+    async def stop(self) -> None:
+        """Cancel the background refresher"""
+        if self._refresher and not self._refresher.done():
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+        self._refresher = None
+
+
+# Global availability cache
+availability_cache = AvailabilityCache(
+    ttl=settings.cli_availability_ttl_seconds,
+    failure_ttl=settings.cli_availability_failure_ttl_seconds,
+    refresh_interval=settings.cli_availability_refresh_seconds,
+)
+
+
+__all__ = ["AvailabilityCache", "availability_cache"]
@@ -6,14 +6,30 @@ helpers so that adding a new provider remains consistent and easy.
 """
 from __future__ import annotations
 
+import asyncio
+import json
 import os
+import time
 import uuid
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
 from datetime import datetime
 from enum import Enum
-from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
 
+from app.core.terminal_ui import ui
 from app.models.messages import Message
+from app.services.cli_session_store import CLISessionState, cli_session_store
+
+from .recording import record_process
+
+try:  # orjson is several times faster on large tool/diff events
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib decoder
+    _orjson = None
 
 
 def get_project_root() -> str:
@@ -45,6 +61,235 @@ def get_display_path(file_path: str) -> str:
     return file_path
 
 
+async def terminate_process(process: Any, timeout: float = 2.0) -> None:
+    """Terminate a CLI subprocess, escalating to kill if it does not exit in time."""
+    if process is None or process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    except ProcessLookupError:
+        pass
+
+
+@dataclass
+class CLIRequestContext:
+    """Per-execution state handed to shared adapter instances.
+
+    Adapters are long-lived (see registry.py), so anything tied to a single
+    instruction - notably the SQLAlchemy session - travels here instead of
+    being stored on the adapter.
+    """
+
+    project_id: str
+    project_path: str
+    session_id: Optional[str] = None
+    conversation_id: Optional[str] = None
+    db: Any = None  # SQLAlchemy Session
+    on_process_spawn: Optional[Callable[[int], None]] = None  # Journals CLI child PIDs
+    # Provider sessions private to this execution, by CLI type. When set,
+    # adapters neither resume nor overwrite the project's stored sessions
+    # (race contenders start fresh; the winner's are promoted afterwards).
+    provider_sessions: Optional[Dict[str, CLISessionState]] = None
+
+
+_request_context: ContextVar[Optional[CLIRequestContext]] = ContextVar(
+    "cli_request_context", default=None
+)
+
+
+def get_request_context() -> Optional[CLIRequestContext]:
+    """Return the context of the execution running in the current task."""
+    return _request_context.get()
+
+
+def notify_process_spawned(process: Any, label: Optional[str] = None) -> None:
+    """Report a spawned CLI process to the current execution, if any.
+
+    With CLI_RECORD_DIR set, the process's stdio traffic is also recorded
+    under `label` (see recording.py).
+    """
+    if label:
+        record_process(process, label)
+    ctx = _request_context.get()
+    pid = getattr(process, "pid", None)
+    if ctx is None or ctx.on_process_spawn is None or pid is None:
+        return
+    try:
+        ctx.on_process_spawn(pid)
+    except Exception:
+        pass
+
+
+@contextmanager
+def bind_request_context(ctx: CLIRequestContext) -> Iterator[CLIRequestContext]:
+    """Bind `ctx` for adapter calls made from the current task."""
+    token = _request_context.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _request_context.reset(token)
+
+
+def _loads(data: bytes) -> Any:
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+
+@dataclass
+class InvalidLine:
+    """A non-JSON (or oversized) stdout line, surfaced when the adapter asks for it."""
+
+    raw: str
+    error: str
+
+
+@dataclass
+class NDJSONStats:
+    lines: int = 0
+    events: int = 0
+    bytes: int = 0
+    invalid: int = 0
+    oversized: int = 0
+    decode_ns: int = 0
+    max_decode_ns: int = 0
+    max_gap_ns: int = 0  # Longest wait between two lines from the provider
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "lines": self.lines,
+            "events": self.events,
+            "bytes": self.bytes,
+            "invalid": self.invalid,
+            "oversized": self.oversized,
+            "decode_ms": round(self.decode_ns / 1e6, 3),
+            "max_decode_ms": round(self.max_decode_ns / 1e6, 3),
+            "max_gap_ms": round(self.max_gap_ns / 1e6, 3),
+        }
+
+
+class NDJSONDecoder:
+    """Incremental newline framing and JSON decoding for CLI stdout.
+
+    Reads fixed-size chunks instead of `readline()`, so a single huge event
+    (diffs, file dumps) never trips the StreamReader line limit; lines longer
+    than `max_line_bytes` are dropped (or reported as `InvalidLine`). A trailing
+    line without a newline is decoded at EOF.
+    """
+
+    DEFAULT_MAX_LINE_BYTES = 16 * 1024 * 1024
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        max_line_bytes: int = DEFAULT_MAX_LINE_BYTES,
+        yield_invalid: bool = False,
+        label: str = "NDJSON",
+    ):
+        self.max_line_bytes = max_line_bytes
+        self.yield_invalid = yield_invalid
+        self.label = label
+        self.stats = NDJSONStats()
+        self._buffer = bytearray()
+        self._discarding = False  # Inside an oversized line; skip to the next newline
+        self._last_line_ns: Optional[int] = None
+
+    def _decode_line(self, line: bytes, out: List[Any]) -> None:
+        stats = self.stats
+        now = time.perf_counter_ns()
+        if self._last_line_ns is not None:
+            stats.max_gap_ns = max(stats.max_gap_ns, now - self._last_line_ns)
+        self._last_line_ns = now
+        stats.lines += 1
+        stats.bytes += len(line) + 1
+        line = line.strip()
+        if not line:
+            return
+        try:
+            event = _loads(line)
+        except ValueError as e:  # orjson.JSONDecodeError and json.JSONDecodeError both subclass it
+            stats.invalid += 1
+            if self.yield_invalid:
+                out.append(InvalidLine(raw=line.decode("utf-8", errors="replace"), error=str(e)))
+            return
+        finally:
+            elapsed = time.perf_counter_ns() - now
+            stats.decode_ns += elapsed
+            if elapsed > stats.max_decode_ns:
+                stats.max_decode_ns = elapsed
+        stats.events += 1
+        out.append(event)
+
+    def _overflow(self, out: List[Any]) -> None:
+        self.stats.oversized += 1
+        ui.warning(f"Dropping stdout line over {self.max_line_bytes} bytes", self.label)
+        if self.yield_invalid:
+            out.append(InvalidLine(raw="", error=f"line exceeds {self.max_line_bytes} bytes"))
+
+    def feed(self, data: bytes) -> List[Any]:
+        """Consume a chunk and return the events of every line it completes."""
+        out: List[Any] = []
+        start = 0
+        while True:
+            newline = data.find(b"\n", start)
+            if newline < 0:
+                break
+            if self._discarding:
+                self._discarding = False
+            elif self._buffer:
+                self._buffer += data[start:newline]
+                line = bytes(self._buffer)
+                self._buffer.clear()
+                if len(line) > self.max_line_bytes:
+                    self._overflow(out)
+                else:
+                    self._decode_line(line, out)
+            elif newline - start > self.max_line_bytes:
+                self._overflow(out)
+            else:
+                self._decode_line(data[start:newline], out)
+            start = newline + 1
+        if start < len(data) and not self._discarding:
+            self._buffer += data[start:]
+            if len(self._buffer) > self.max_line_bytes:
+                self._buffer.clear()
+                self._discarding = True
+                self._overflow(out)
+        return out
+
+    def flush(self) -> List[Any]:
+        """Decode a final line that arrived without a trailing newline."""
+        out: List[Any] = []
+        if self._buffer and not self._discarding:
+            line = bytes(self._buffer)
+            self._decode_line(line, out)
+        self._buffer.clear()
+        self._discarding = False
+        return out
+
+    async def iter_stream(self, stream: asyncio.StreamReader) -> AsyncIterator[Any]:
+        """Yield decoded events from `stream` until EOF.
+
+        Breaking out of an `async for` over this generator leaves it open, so
+        a handshake loop and the main loop can share one decoder.
+        """
+        while True:
+            chunk = await stream.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+            for event in self.feed(chunk):
+                yield event
+        for event in self.flush():
+            yield event
+        ui.debug(f"stdout closed: {self.stats.as_dict()}", self.label)
+
+
 # Model mapping from unified names to CLI-specific names
 MODEL_MAPPING: Dict[str, Dict[str, str]] = {
     "claude": {
@@ -102,6 +347,63 @@ MODEL_MAPPING: Dict[str, Dict[str, str]] = {
 }
 
 
+@dataclass(frozen=True)
+class ModelIndex:
+    """Per-CLI model lookup: any unified or provider name -> provider name."""
+
+    canonical: Mapping[str, str]
+    supported: Tuple[str, ...]
+
+
+def _load_extra_model_mappings() -> Dict[str, Dict[str, str]]:
+    """Additional mappings from MODEL_MAPPINGS_FILE ({cli: {name: provider_name}})."""
+    from app.core.config import settings
+
+    path = settings.model_mappings_file
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        ui.warning(f"Ignoring model mappings from {path}: {e}", "Model")
+        return {}
+    if not isinstance(data, dict):
+        ui.warning(f"Ignoring model mappings from {path}: expected an object per CLI", "Model")
+        return {}
+    return {
+        str(cli): {str(k): str(v) for k, v in models.items()}
+        for cli, models in data.items()
+        if isinstance(models, dict)
+    }
+
+
+def build_model_index(*mappings: Dict[str, Dict[str, str]]) -> Mapping[str, ModelIndex]:
+    """Merge mappings (later ones win) into a frozen index per CLI."""
+    merged: Dict[str, Dict[str, str]] = {}
+    for mapping in mappings:
+        for cli, models in mapping.items():
+            merged.setdefault(cli, {}).update(models)
+
+    index: Dict[str, ModelIndex] = {}
+    for cli, models in merged.items():
+        canonical: Dict[str, str] = {}
+        # Provider names resolve to themselves unless explicitly remapped
+        for provider_name in models.values():
+            canonical[provider_name] = provider_name
+        canonical.update(models)
+        supported = tuple(dict.fromkeys([*models.keys(), *models.values()]))
+        index[cli] = ModelIndex(canonical=MappingProxyType(canonical), supported=supported)
+    return MappingProxyType(index)
+
+
+MODEL_INDEX: Mapping[str, ModelIndex] = build_model_index(MODEL_MAPPING, _load_extra_model_mappings())
+_EMPTY_MODEL_INDEX = ModelIndex(canonical=MappingProxyType({}), supported=())
+_unmapped_models_warned: set = set()
+
+
 class CLIType(str, Enum):
     """Provider key used across the manager and adapters."""
 
@@ -120,8 +422,54 @@ class BaseCLI(ABC):
     tool summaries) are provided here for reuse.
     """
 
+    _db_session: Any = None
+
     def __init__(self, cli_type: CLIType):
         self.cli_type = cli_type
+        self._models = MODEL_INDEX.get(cli_type.value, _EMPTY_MODEL_INDEX)
+
+    @property
+    def db_session(self) -> Any:
+        """DB session of the current execution, else the one given at construction."""
+        ctx = _request_context.get()
+        if ctx is not None and ctx.db is not None:
+            return ctx.db
+        return self._db_session
+
+    @db_session.setter
+    def db_session(self, value: Any) -> None:
+        self._db_session = value
+
+    def resolve_project_id(self, project_path: str) -> str:
+        """Project ID used for session bookkeeping.
+
+        Prefers the bound request context, since an execution may run in a
+        scratch worktree whose path does not encode the project. Otherwise
+        falls back to the folder before "repo" (.../projects/{id}/repo).
+        """
+        ctx = _request_context.get()
+        if ctx is not None and ctx.project_id:
+            return ctx.project_id
+        path_parts = project_path.split("/")
+        if "repo" in path_parts and path_parts.index("repo") > 0:
+            return path_parts[path_parts.index("repo") - 1]
+        return path_parts[-1] if path_parts else project_path
+
+    def provider_session(self, project_id: str) -> CLISessionState:
+        """Stored provider session of this CLI for the project (or the execution's own)"""
+        ctx = _request_context.get()
+        if ctx is not None and ctx.provider_sessions is not None:
+            return ctx.provider_sessions.get(self.cli_type.value, CLISessionState())
+        return cli_session_store.get(project_id, self.cli_type.value)
+
+    def save_provider_session(self, project_id: str, **fields: Any) -> None:
+        """Update session_id/rollout_path where `provider_session` reads them"""
+        ctx = _request_context.get()
+        if ctx is not None and ctx.provider_sessions is not None:
+            current = ctx.provider_sessions.get(self.cli_type.value, CLISessionState())
+            ctx.provider_sessions[self.cli_type.value] = replace(current, **fields)
+            return
+        cli_session_store.set(project_id, self.cli_type.value, **fields)
 
     # ---- Mandatory adapter interface ------------------------------------
     @abstractmethod
@@ -156,6 +504,15 @@ class BaseCLI(ABC):
     async def set_session_id(self, project_id: str, session_id: str) -> None:
         """Persist the active session ID for a project."""
 
+    # ---- Optional adapter interface --------------------------------------
+    async def cancel(self, session_id: Optional[str] = None) -> None:
+        """Stop the in-flight execution for `session_id`, if any.
+
+        Adapters should release the underlying resource (process, agent turn,
+        stream) so that `execute_with_streaming` ends on its own and flushes
+        whatever it has buffered. The default implementation does nothing.
+        """
+
     # ---- Common helpers (available to adapters) --------------------------
     def _get_cli_model_name(self, model: Optional[str]) -> Optional[str]:
         """Translate unified model name to provider-specific model name.
@@ -164,47 +521,24 @@ class BaseCLI(ABC):
         """
         if not model:
             return None
-
-        from app.core.terminal_ui import ui
-
-        ui.debug(f"Input model: '{model}' for CLI: {self.cli_type.value}", "Model")
-        cli_models = MODEL_MAPPING.get(self.cli_type.value, {})
-
-        # Try exact mapping
-        if model in cli_models:
-            mapped_model = cli_models[model]
-            ui.info(
-                f"Mapped '{model}' to '{mapped_model}' for {self.cli_type.value}", "Model"
-            )
-            return mapped_model
-
-        # Already a provider-specific name
-        if model in cli_models.values():
-            ui.info(
-                f"Using direct model name '{model}' for {self.cli_type.value}", "Model"
+        mapped = self._models.canonical.get(model)
+        if mapped is not None:
+            return mapped
+
+        # Warn once per unknown model rather than on every turn
+        key = (self.cli_type.value, model)
+        if key not in _unmapped_models_warned:
+            _unmapped_models_warned.add(key)
+            ui.warning(
+                f"Model '{model}' not found in mapping for {self.cli_type.value}; using as-is", "Model"
             )
-            return model
-
-        # Debug available models
-        available_models = list(cli_models.keys())
-        ui.warning(
-            f"Model '{model}' not found in mapping for {self.cli_type.value}", "Model"
-        )
-        ui.debug(
-            f"Available models for {self.cli_type.value}: {available_models}", "Model"
-        )
-        ui.warning(f"Using model as-is: '{model}'", "Model")
         return model
 
     def get_supported_models(self) -> List[str]:
-        cli_models = MODEL_MAPPING.get(self.cli_type.value, {})
-        return list(cli_models.keys()) + list(cli_models.values())
+        return list(self._models.supported)
 
     def is_model_supported(self, model: str) -> bool:
-        return (
-            model in self.get_supported_models()
-            or model in MODEL_MAPPING.get(self.cli_type.value, {}).values()
-        )
+        return model in self._models.canonical
 
     def parse_message_data(self, data: Dict[str, Any], project_id: str, session_id: str) -> Message:
         """Normalize provider-specific message payload to our `Message`."""
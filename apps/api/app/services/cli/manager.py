@@ -4,21 +4,35 @@ Moved from unified_manager.py to a dedicated module.
 """
 from __future__ import annotations
 
+import asyncio
+import os
+import subprocess
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from app.core.terminal_ui import ui
+from app.core.tracing import current_trace, trace_mark, trace_span
 from app.core.websocket.manager import manager as ws_manager
+from app.db.session import SessionLocal
 from app.models.messages import Message
+from app.models.sessions import Session as ChatSession
+from app.services import git_ops
+from app.services.cli_session_store import cli_session_store
+from app.services.execution_journal import execution_journal
 
-from .base import CLIType
-from .adapters import CursorAgentCLI, CodexCLI, QwenCLI, GeminiCLI
-from .adapters.claude_code_sandbox import ClaudeCodeSandboxCLI
+from .availability import availability_cache
+from .base import BaseCLI, CLIRequestContext, CLIType, bind_request_context
+from .registry import adapter_registry
+from .usage import TokenUsage, estimate_cost, usage_stats
 
 
 class UnifiedCLIManager:
     """Unified manager for all CLI implementations"""
 
+    # Managers with an execution in flight, keyed by chat session ID
+    _active_executions: Dict[str, "UnifiedCLIManager"] = {}
+
     def __init__(
         self,
         project_id: str,
@@ -32,32 +46,47 @@ class UnifiedCLIManager:
         self.session_id = session_id
         self.conversation_id = conversation_id
         self.db = db
+        self._cancelled = False
+        self._active_clis: List[Any] = []  # (adapter, session ID it runs under)
+        self._muted_contenders: set = set()  # Race losers whose output is dropped
+        self.project_settings: Dict[str, Any] = {}
 
         # Check if project is using sandbox mode
         self.use_sandbox = self._should_use_sandbox()
         
-        # Initialize CLI adapters with database session
+        # Adapters are shared process-wide; this manager only carries request context
         if self.use_sandbox:
-            self.cli_adapters = {
-                CLIType.CLAUDE: ClaudeCodeSandboxCLI(),  # Use sandbox implementation
-                # Other CLIs not yet supported in sandbox mode
-            }
+            # Other CLIs not yet supported in sandbox mode
+            self.cli_types = (CLIType.CLAUDE,)
         else:
-            # For non-sandbox mode, use sandbox adapter as fallback
-            # since we're migrating to VibeKit sandboxes
-            self.cli_adapters = {
-                CLIType.CLAUDE: ClaudeCodeSandboxCLI(),  # Use sandbox implementation
-                CLIType.CURSOR: CursorAgentCLI(db_session=db),
-                CLIType.CODEX: CodexCLI(db_session=db),
-                CLIType.QWEN: QwenCLI(db_session=db),
-                CLIType.GEMINI: GeminiCLI(db_session=db),
-            }
+            self.cli_types = (
+                CLIType.CLAUDE,
+                CLIType.CURSOR,
+                CLIType.CODEX,
+                CLIType.QWEN,
+                CLIType.GEMINI,
+            )
+        self.context = CLIRequestContext(
+            project_id=project_id,
+            project_path=project_path,
+            session_id=session_id,
+            conversation_id=conversation_id,
+            db=db,
+            on_process_spawn=lambda pid: execution_journal.record_process(session_id, pid),
+        )
+
+    def _get_adapter(self, cli_type: CLIType) -> Optional[BaseCLI]:
+        if cli_type not in self.cli_types:
+            return None
+        return adapter_registry.get(cli_type)
 
     def _should_use_sandbox(self) -> bool:
         """Check if project should use sandbox mode"""
         try:
             from app.models.projects import Project as ProjectModel
             project = self.db.query(ProjectModel).filter(ProjectModel.id == self.project_id).first()
+            if project and project.settings:
+                self.project_settings = dict(project.settings)
             if project and project.sandbox_id:
                 return True
             return False
@@ -68,26 +97,74 @@ class UnifiedCLIManager:
         self,
         instruction: str,
         cli_type: CLIType,
-        fallback_enabled: bool = True,  # Kept for backward compatibility but not used
+        fallback_enabled: bool = True,  # Allows racing a second CLI when the project opts in
         images: Optional[List[Dict[str, Any]]] = None,
         model: Optional[str] = None,
         is_initial_prompt: bool = False,
     ) -> Dict[str, Any]:
         """Execute instruction with specified CLI"""
 
+        UnifiedCLIManager._active_executions[self.session_id] = self
+        try:
+            with bind_request_context(self.context):
+                if fallback_enabled and self.project_settings.get("racing_enabled"):
+                    partner = await self._pick_race_partner(cli_type)
+                    if partner is not None:
+                        return await self._race(
+                            instruction, cli_type, partner, images, model, is_initial_prompt
+                        )
+                return await self._execute_instruction(
+                    instruction, cli_type, images, model, is_initial_prompt
+                )
+        finally:
+            if UnifiedCLIManager._active_executions.get(self.session_id) is self:
+                UnifiedCLIManager._active_executions.pop(self.session_id, None)
+
+    async def cancel(self) -> None:
+        """Ask the active CLI to stop; partial output is still flushed and saved"""
+        self._cancelled = True
+        for cli, cli_session_id in list(self._active_clis):
+            try:
+                await cli.cancel(cli_session_id)
+            except Exception as e:
+                ui.warning(f"Cancel of {cli.cli_type.value} failed: {e}", "CLI")
+
+    @classmethod
+    async def cancel_session(cls, session_id: str) -> bool:
+        """Cancel the execution running for a chat session, if any"""
+        manager = cls._active_executions.get(session_id)
+        if manager is None:
+            return False
+        await manager.cancel()
+        return True
+
+    async def _execute_instruction(
+        self,
+        instruction: str,
+        cli_type: CLIType,
+        images: Optional[List[Dict[str, Any]]] = None,
+        model: Optional[str] = None,
+        is_initial_prompt: bool = False,
+    ) -> Dict[str, Any]:
         # Try the specified CLI
-        if cli_type in self.cli_adapters:
-            cli = self.cli_adapters[cli_type]
+        cli = self._get_adapter(cli_type)
+        if cli is not None:
 
-            # Check if CLI is available
-            status = await cli.check_availability()
+            # Check if CLI is available (cached; refreshed in the background)
+            with trace_span("cli.availability_check", cli=cli_type.value):
+                status = await availability_cache.get(cli)
             if status.get("available") and status.get("configured"):
                 try:
-                    return await self._execute_with_cli(
+                    result = await self._execute_with_cli(
                         cli, instruction, images, model, is_initial_prompt
                     )
+                    if not result.get("success") and not result.get("cancelled"):
+                        # The CLI may have gone away; re-check before the next run
+                        availability_cache.invalidate(cli_type)
+                    return result
                 except Exception as e:
                     ui.error(f"CLI {cli_type.value} failed: {e}", "CLI")
+                    availability_cache.invalidate(cli_type)
                     return {
                         "success": False,
                         "error": str(e),
@@ -113,8 +190,28 @@ class UnifiedCLIManager:
         images: Optional[List[Dict[str, Any]]],
         model: Optional[str] = None,
         is_initial_prompt: bool = False,
+        context: Optional[CLIRequestContext] = None,
+        race_label: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Execute instruction with a specific CLI"""
+        """Execute instruction with a specific CLI.
+
+        `context` replaces the manager's own (racing: the contender's worktree,
+        session key and DB session) and `race_label` tags emitted messages with
+        the contender they came from.
+        """
+        ctx = context or self.context
+        db = ctx.db
+
+        if self._cancelled:
+            return {
+                "success": False,
+                "cancelled": True,
+                "cli_used": cli.cli_type.value,
+                "error": "Cancelled by user",
+                "messages_count": 0,
+            }
+        active = (cli, ctx.session_id)
+        self._active_clis.append(active)
 
         ui.info(f"Starting {cli.cli_type.value} execution", "CLI")
         if model:
@@ -130,15 +227,30 @@ class UnifiedCLIManager:
             # CLI output logs are now only printed to console, not sent to UI
             pass
 
+        trace = current_trace()
+        stream_span = (
+            trace.start_span("cli.stream", cli=cli.cli_type.value, model=model, race=race_label)
+            if trace
+            else None
+        )
+        last_message_ns: Optional[int] = None
+        turn_usage = TokenUsage()
+        stream_started = time.monotonic()
+
         async for message in cli.execute_with_streaming(
             instruction=instruction,
-            project_path=self.project_path,
-            session_id=self.session_id,
+            project_path=ctx.project_path,
+            session_id=ctx.session_id,
             log_callback=log_callback,
             images=images,
             model=model,
             is_initial_prompt=is_initial_prompt,
         ):
+            if race_label is not None and race_label in self._muted_contenders:
+                continue  # Lost the race; only draining until it stops
+            last_message_ns = time.time_ns()
+            trace_mark("provider.first_event", at_ns=last_message_ns, cli=cli.cli_type.value)
+
             # Check for error messages or result status
             if message.message_type == "error":
                 has_error = True
@@ -188,11 +300,52 @@ class UnifiedCLIManager:
                                 f"Cursor result: assuming success (no error detected)", "CLI"
                             )
 
+            if race_label:
+                message.metadata_json = {**(message.metadata_json or {}), "race_cli": race_label}
+                message.session_id = self.session_id  # The adapter ran under the contender's key
+
+            # Partial assistant deltas go to the UI only; the aggregated message
+            # later arrives under the same id and is the one persisted
+            if message.metadata_json and message.metadata_json.get("partial"):
+                try:
+                    await ws_manager.send_message(
+                        self.project_id,
+                        {
+                            "type": "message",
+                            "data": {
+                                "id": message.id,
+                                "role": message.role,
+                                "message_type": message.message_type,
+                                "content": message.content,
+                                "metadata": message.metadata_json,
+                                "partial": True,
+                                "session_id": message.session_id,
+                                "conversation_id": self.conversation_id,
+                                "created_at": message.created_at.isoformat(),
+                            },
+                            "timestamp": message.created_at.isoformat(),
+                        },
+                    )
+                    trace_mark("ws.first_delivery", cli=cli.cli_type.value)
+                except Exception as e:
+                    ui.error(f"WebSocket send failed: {e}", "Message")
+                continue
+
+            # Provider-reported usage travels in metadata; persist it on the row
+            usage = TokenUsage.from_dict((message.metadata_json or {}).get("usage"))
+            if usage:
+                if usage.cost_usd is None:
+                    usage.cost_usd = estimate_cost(model, usage)
+                message.token_count = usage.total_tokens
+                message.cost_usd = usage.cost_usd
+                message.metadata_json = {**message.metadata_json, "usage": usage.to_dict()}
+                turn_usage = turn_usage + usage
+
             # Save message to database
             message.project_id = self.project_id
             message.conversation_id = self.conversation_id
-            self.db.add(message)
-            self.db.commit()
+            db.add(message)
+            db.commit()
 
             messages_collected.append(message)
 
@@ -220,6 +373,7 @@ class UnifiedCLIManager:
                 }
                 try:
                     await ws_manager.send_message(self.project_id, ws_message)
+                    trace_mark("ws.first_delivery", cli=cli.cli_type.value)
                 except Exception as e:
                     ui.error(f"WebSocket send failed: {e}", "Message")
 
@@ -227,6 +381,30 @@ class UnifiedCLIManager:
             if message.metadata_json and "changes_made" in message.metadata_json:
                 has_changes = True
 
+        if active in self._active_clis:
+            self._active_clis.remove(active)
+        if stream_span is not None:
+            trace.end_span(stream_span, messages=len(messages_collected))
+        if last_message_ns is not None:
+            trace_mark("provider.last_message", at_ns=last_message_ns, cli=cli.cli_type.value)
+        if turn_usage:
+            self._record_usage(db, cli.cli_type.value, model, turn_usage, time.monotonic() - stream_started)
+        if self._cancelled:
+            ui.warning(
+                f"Execution cancelled. Partial messages saved: {len(messages_collected)}",
+                "CLI",
+            )
+            return {
+                "success": False,
+                "cancelled": True,
+                "cli_used": cli.cli_type.value,
+                "has_changes": has_changes,
+                "message": f"Cancelled {cli.cli_type.value} execution",
+                "error": "Cancelled by user",
+                "messages_count": len(messages_collected),
+                "usage": turn_usage.to_dict() if turn_usage else None,
+            }
+
         # Determine final success status
         # For Cursor: check result_success if available, otherwise check has_error
         # For others: check has_error
@@ -260,20 +438,237 @@ class UnifiedCLIManager:
             "message": f"{'Successfully' if success else 'Failed to'} execute with {cli.cli_type.value}",
             "error": "Execution failed" if not success else None,
             "messages_count": len(messages_collected),
+            "usage": turn_usage.to_dict() if turn_usage else None,
         }
 
         # End _execute_with_cli
 
+    def _record_usage(self, db: Any, cli_name: str, model: Optional[str], usage: TokenUsage, seconds: float) -> None:
+        """Add one turn's usage to the chat session totals and the throughput stats"""
+        usage_stats.record(cli_name, model, usage, seconds)
+        try:
+            session = db.get(ChatSession, self.session_id)
+            if session is None:
+                return
+            session.total_tokens = (session.total_tokens or 0) + usage.total_tokens
+            if usage.cost_usd is not None:
+                session.total_cost_usd = float(session.total_cost_usd or 0) + usage.cost_usd
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            ui.warning(f"Failed to record token usage: {e}", "CLI")
+
+    # ---- Racing ----------------------------------------------------------
+    # Opt-in per project via settings {"racing_enabled": true,
+    # "race_partner_cli": "<cli>"}. The instruction runs on two CLIs at once,
+    # each in its own git worktree checked out from a snapshot of the working
+    # tree, with its own DB session and fresh provider sessions. The first
+    # success is applied to the main working tree and its provider session
+    # becomes the project's; the other contender is muted and cancelled.
+
+    RACE_CANCEL_GRACE_SECONDS = 5.0
+
+    async def _pick_race_partner(self, primary: CLIType) -> Optional[CLIType]:
+        """Second CLI to race against `primary`, if one is configured and available"""
+        preferred = self.project_settings.get("race_partner_cli")
+        candidates: List[CLIType] = []
+        if preferred:
+            try:
+                candidates.append(CLIType(preferred))
+            except ValueError:
+                ui.warning(f"Unknown race partner CLI '{preferred}'", "CLI")
+        else:
+            candidates = list(self.cli_types)
+
+        for cli_type in candidates:
+            if cli_type == primary:
+                continue
+            cli = self._get_adapter(cli_type)
+            if cli is None:
+                continue
+            status = await availability_cache.get(cli)
+            if status.get("available") and status.get("configured"):
+                return cli_type
+        return None
+
+    def _repo_dir(self) -> str:
+        repo_dir = os.path.join(self.project_path, "repo")
+        return repo_dir if os.path.exists(repo_dir) else self.project_path
+
+    async def _race(
+        self,
+        instruction: str,
+        primary: CLIType,
+        partner: CLIType,
+        images: Optional[List[Dict[str, Any]]],
+        model: Optional[str],
+        is_initial_prompt: bool,
+    ) -> Dict[str, Any]:
+        """Run `primary` and `partner` concurrently in isolated worktrees"""
+        repo_dir = self._repo_dir()
+        # Outside repo_dir so snapshots don't pick it up, and namespaced by
+        # project: when a project has no repo/ subdir its parent is shared
+        worktree_root = os.path.join(os.path.dirname(repo_dir), ".worktrees", self.project_id)
+        worktrees: Dict[CLIType, str] = {}
+        try:
+            # Contenders must see uncommitted work too, not just HEAD
+            base = await git_ops.working_tree_snapshot(repo_dir) or "HEAD"
+            for cli_type in (primary, partner):
+                path = os.path.join(worktree_root, f"{self.session_id[:8]}-{cli_type.value}")
+                await asyncio.to_thread(git_ops.create_worktree, repo_dir, path, base)
+                worktrees[cli_type] = path
+        except Exception as e:
+            ui.warning(f"Racing disabled for this run, worktree setup failed: {e}", "CLI")
+            await self._remove_worktrees(repo_dir, worktrees)
+            return await self._execute_instruction(
+                instruction, primary, images, model, is_initial_prompt
+            )
+
+        ui.info(f"Racing {primary.value} against {partner.value}", "CLI")
+        contexts: Dict[CLIType, CLIRequestContext] = {}
+        tasks: Dict[asyncio.Task, CLIType] = {}
+        for cli_type in (primary, partner):
+            contexts[cli_type] = CLIRequestContext(
+                project_id=self.project_id,
+                project_path=worktrees[cli_type],
+                session_id=f"{self.session_id}:{cli_type.value}",
+                conversation_id=self.conversation_id,
+                db=SessionLocal(),
+                on_process_spawn=self.context.on_process_spawn,
+                provider_sessions={},
+            )
+            task = asyncio.create_task(
+                self._run_contender(
+                    self._get_adapter(cli_type),
+                    contexts[cli_type],
+                    instruction,
+                    images,
+                    # The selected model belongs to the primary CLI
+                    model if cli_type == primary else None,
+                    is_initial_prompt,
+                )
+            )
+            tasks[task] = cli_type
+
+        winner: Optional[CLIType] = None
+        results: Dict[CLIType, Dict[str, Any]] = {}
+        pending = set(tasks)
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    cli_type = tasks[task]
+                    try:
+                        results[cli_type] = task.result()
+                    except Exception as e:
+                        ui.error(f"Race contender {cli_type.value} failed: {e}", "CLI")
+                        availability_cache.invalidate(cli_type)
+                        results[cli_type] = {"success": False, "error": str(e), "cli_attempted": cli_type.value}
+                    if winner is None and results[cli_type].get("success"):
+                        winner = cli_type
+
+            # Stop the loser (or everyone, if the user cancelled); once there is
+            # a winner nothing more from the loser reaches the conversation
+            for task in pending:
+                if winner is not None:
+                    self._muted_contenders.add(tasks[task].value)
+                await self._stop_contender(task, tasks[task], contexts[tasks[task]].session_id)
+
+            if winner is None:
+                # Both failed or were cancelled; report the primary's outcome
+                return results.get(primary) or {
+                    "success": False,
+                    "error": "Race finished without a result",
+                    "cli_attempted": primary.value,
+                }
+
+            ui.success(f"Race won by {winner.value}", "CLI")
+            race_info = {"winner": winner.value, "contenders": [primary.value, partner.value]}
+            patch = await asyncio.to_thread(git_ops.worktree_patch, worktrees[winner])
+            try:
+                await asyncio.to_thread(git_ops.apply_patch, repo_dir, patch)
+            except subprocess.CalledProcessError as e:
+                detail = (e.stderr or str(e)).strip()
+                ui.error(f"Applying {winner.value}'s race result failed: {detail}", "CLI")
+                return {
+                    "success": False,
+                    "error": f"{winner.value} finished first, but its changes could not be applied: {detail}",
+                    "cli_attempted": winner.value,
+                    "race": race_info,
+                }
+            self._adopt_provider_sessions(contexts[winner])
+            result = dict(results[winner])
+            result["has_changes"] = bool(patch)
+            result["race"] = race_info
+            return result
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+            # Let cancelled contenders unwind before their DB sessions close
+            await asyncio.gather(*pending, return_exceptions=True)
+            self._muted_contenders.clear()
+            for context in contexts.values():
+                context.db.close()
+            await self._remove_worktrees(repo_dir, worktrees)
+
+    async def _run_contender(
+        self,
+        cli: BaseCLI,
+        context: CLIRequestContext,
+        instruction: str,
+        images: Optional[List[Dict[str, Any]]],
+        model: Optional[str],
+        is_initial_prompt: bool,
+    ) -> Dict[str, Any]:
+        with bind_request_context(context):
+            return await self._execute_with_cli(
+                cli,
+                instruction,
+                images,
+                model,
+                is_initial_prompt,
+                context=context,
+                race_label=cli.cli_type.value,
+            )
+
+    def _adopt_provider_sessions(self, context: CLIRequestContext) -> None:
+        """Make the winner's provider sessions the project's, so the next turn resumes them"""
+        for cli_name, state in (context.provider_sessions or {}).items():
+            fields = {k: v for k, v in (("session_id", state.session_id), ("rollout_path", state.rollout_path)) if v}
+            if fields:
+                cli_session_store.set(self.project_id, cli_name, **fields)
+
+    async def _stop_contender(self, task: asyncio.Task, cli_type: CLIType, cli_session_id: str) -> None:
+        cli = self._get_adapter(cli_type)
+        try:
+            await cli.cancel(cli_session_id)
+        except Exception as e:
+            ui.warning(f"Cancel of {cli_type.value} failed: {e}", "CLI")
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=self.RACE_CANCEL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            task.cancel()
+        except Exception:
+            pass
+
+    async def _remove_worktrees(self, repo_dir: str, worktrees: Dict[CLIType, str]) -> None:
+        for path in worktrees.values():
+            try:
+                await asyncio.to_thread(git_ops.remove_worktree, repo_dir, path)
+            except Exception as e:
+                ui.warning(f"Failed to remove worktree {path}: {e}", "CLI")
+
     async def check_cli_status(
         self, cli_type: CLIType, selected_model: Optional[str] = None
     ) -> Dict[str, Any]:
         """Check status of a specific CLI"""
-        if cli_type in self.cli_adapters:
-            status = await self.cli_adapters[cli_type].check_availability()
+        cli = self._get_adapter(cli_type)
+        if cli is not None:
+            status = dict(await availability_cache.get(cli))
 
             # Add model validation if model is specified
             if selected_model and status.get("available"):
-                cli = self.cli_adapters[cli_type]
                 if not cli.is_model_supported(selected_model):
                     status[
                         "model_warning"
@@ -0,0 +1,164 @@
+"""Pre-spawned CLI processes handed to the next turn.
+
+For CLIs whose argv does not carry the prompt (Codex `proto` reads the
+instruction from stdin), a turn that spawns `cmd` in `cwd` takes a process
+started earlier with the same arguments when one is ready, and a replacement
+is spawned in the background for the following turn. The spare pays for Node
+startup and protocol initialization while idle; its first events simply wait
+in the stdout pipe. Spares not claimed within `idle_seconds` are stopped.
+No replacement is spawned for one-off runs: commands the caller marks as not
+repeatable (e.g. resuming a specific rollout) and git worktree cwds, which
+racing creates for a single turn.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.terminal_ui import ui
+
+from .base import terminate_process
+from .process import create_detached_task, spawn_cli_process
+
+_SpawnKey = Tuple[Tuple[str, ...], str]
+
+
+@dataclass(eq=False)
+class _Spare:
+    key: _SpawnKey
+    process: Any  # CLIProcess
+    spawned_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+
+def _is_git_worktree(path: str) -> bool:
+    """Linked worktrees have a `.git` file pointing at the main repository"""
+    return os.path.isfile(os.path.join(path, ".git"))
+
+
+class ProcessPrefork:
+    """Ready processes keyed by (argv, cwd), one spare per recently used key"""
+
+    def __init__(self, label: str, max_processes: int = 4, idle_seconds: float = 300.0):
+        self.label = label
+        self.max_processes = max(1, max_processes)
+        self.idle_seconds = idle_seconds
+        self._spares: List[_Spare] = []  # Oldest first
+        self._spawning: Set[_SpawnKey] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._reaper_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    async def acquire(self, cmd: List[str], cwd: str, repeatable: bool = True) -> Any:
+        """Process running `cmd` in `cwd`; pre-spawned when one is ready, else started now.
+
+        `repeatable=False` says the next turn will not use the same arguments,
+        so no spare is started for them.
+        """
+        key: _SpawnKey = (tuple(cmd), cwd)
+        process = self._take(key)
+        if process is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            process = await spawn_cli_process(cmd, cwd, label=self.label)
+        if repeatable and not _is_git_worktree(cwd):
+            self._replenish(key)
+            self._ensure_reaper()
+        return process
+
+    def _take(self, key: _SpawnKey) -> Optional[Any]:
+        for spare in list(self._spares):
+            if spare.key != key:
+                continue
+            self._spares.remove(spare)
+            if spare.alive:
+                return spare.process
+            ui.debug(f"{self.label} spare exited before use (rc={spare.process.returncode})", self.label)
+        return None
+
+    def _replenish(self, key: _SpawnKey) -> None:
+        if key in self._spawning or any(s.key == key for s in self._spares):
+            return
+        self._spawning.add(key)
+        task = create_detached_task(self._spawn_spare(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _spawn_spare(self, key: _SpawnKey) -> None:
+        try:
+            # Newer demand wins: make room by stopping the oldest spare
+            while self._spares and len(self._spares) + len(self._spawning) > self.max_processes:
+                await terminate_process(self._spares.pop(0).process)
+            if len(self._spares) + len(self._spawning) > self.max_processes:
+                return
+            cmd, cwd = key
+            process = await spawn_cli_process(list(cmd), cwd, label=self.label)
+            self._spares.append(_Spare(key=key, process=process))
+            ui.debug(f"{self.label} spare ready (pid {process.pid}, {len(self._spares)} idle)", self.label)
+        except Exception as e:
+            ui.warning(f"{self.label} spare failed to start: {e}", self.label)
+        finally:
+            self._spawning.discard(key)
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = create_detached_task(self._reap())
+
+    async def _reap(self) -> None:
+        while self._spares or self._spawning:
+            await asyncio.sleep(min(30.0, max(1.0, self.idle_seconds / 2)))
+            now = time.monotonic()
+            for spare in list(self._spares):
+                if not spare.alive or now - spare.spawned_at > self.idle_seconds:
+                    self._spares.remove(spare)
+                    await terminate_process(spare.process)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "spares": len(self._spares),
+            "spawning": len(self._spawning),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    async def stop(self) -> None:
+        for task in list(self._tasks) + [self._reaper_task]:
+            if task and not task.done():
+                task.cancel()
+        spares, self._spares = self._spares, []
+        for spare in spares:
+            await terminate_process(spare.process)
+
+
+_preforks: Dict[str, ProcessPrefork] = {}
+
+
+def get_process_prefork(label: str) -> Optional[ProcessPrefork]:
+    """Prefork pool for one CLI, or None when CLI_PREFORK_ENABLED is off"""
+    from app.core.config import settings
+
+    if not settings.cli_prefork_enabled:
+        return None
+    prefork = _preforks.get(label)
+    if prefork is None:
+        prefork = ProcessPrefork(
+            label,
+            max_processes=settings.cli_prefork_max_processes,
+            idle_seconds=settings.cli_prefork_idle_seconds,
+        )
+        _preforks[label] = prefork
+    return prefork
+
+
+async def stop_all_preforks() -> None:
+    for prefork in list(_preforks.values()):
+        await prefork.stop()
+    _preforks.clear()
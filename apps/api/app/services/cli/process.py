@@ -0,0 +1,162 @@
+"""CLI subprocesses with stderr drained into a bounded tail.
+
+Adapters stream stdout but never read stderr, so a chatty CLI can fill the
+pipe buffer (64 KB on Linux) and block on its next write. Every CLI process
+is started through `spawn_cli_process`, which drains stderr from the moment
+the process starts into a ring buffer holding the last `max_bytes`. Memory
+stays bounded however much the CLI logs. The tail is attached to failure
+messages, and byte counts are logged and traced when the process exits.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+from app.core.terminal_ui import ui
+from app.core.tracing import trace_mark
+
+STDERR_TAIL_BYTES = 64 * 1024
+
+
+def create_detached_task(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """Start `coro` as a task in a fresh context.
+
+    Tasks normally copy the caller's contextvars, so background work started
+    while a request is handled would keep that request's CLIRequestContext,
+    DB session and trace for as long as it runs. (`create_task(context=...)`
+    needs Python 3.11; running create_task inside an empty Context works on 3.10.)
+    """
+    return contextvars.Context().run(asyncio.create_task, coro)
+
+
+class StderrTail:
+    """Reads a stream until EOF, keeping only its last `max_bytes`"""
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        stream: Optional[asyncio.StreamReader],
+        label: str,
+        max_bytes: int = STDERR_TAIL_BYTES,
+        on_line: Optional[Callable[[str], None]] = None,
+    ):
+        self.label = label
+        self.max_bytes = max(1, max_bytes)
+        self._on_line = on_line
+        self._buffer = bytearray()
+        self.bytes_read = 0
+        self.bytes_dropped = 0
+        # Detached: pooled processes outlive the request that spawned them
+        self._task: Optional[asyncio.Task] = (
+            create_detached_task(self._drain(stream)) if stream is not None else None
+        )
+
+    async def _drain(self, stream: asyncio.StreamReader) -> None:
+        partial = b""
+        try:
+            while True:
+                chunk = await stream.read(self.READ_SIZE)
+                if not chunk:
+                    break
+                self.bytes_read += len(chunk)
+                self._buffer += chunk
+                excess = len(self._buffer) - self.max_bytes
+                if excess > 0:
+                    del self._buffer[:excess]
+                    self.bytes_dropped += excess
+                if self._on_line is not None:
+                    *lines, partial = (partial + chunk).split(b"\n")
+                    partial = partial[-self.max_bytes:]
+                    for line in lines:
+                        self._emit(line)
+        except Exception as e:
+            ui.debug(f"stderr drain stopped: {e}", self.label)
+        finally:
+            if partial and self._on_line is not None:
+                self._emit(partial)
+
+    def _emit(self, line: bytes) -> None:
+        try:
+            self._on_line(line.decode("utf-8", errors="replace").rstrip("\r"))
+        except Exception:
+            pass
+
+    def text(self, max_chars: int = 2000) -> str:
+        """Last `max_chars` of stderr, decoded"""
+        return self._buffer.decode("utf-8", errors="replace")[-max_chars:].strip()
+
+    async def wait_closed(self, timeout: float = 1.0) -> None:
+        """Let the drain reach EOF so the tail is complete (bounded wait)"""
+        if self._task is None or self._task.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "stderr_bytes": self.bytes_read,
+            "stderr_dropped_bytes": self.bytes_dropped,
+            "stderr_tail_bytes": len(self._buffer),
+        }
+
+
+class CLIProcess:
+    """An asyncio subprocess whose stderr is drained into `stderr_tail`.
+
+    Everything else (stdin, stdout, pid, returncode, terminate, ...) is the
+    wrapped process's; `wait()` additionally reports stderr volume on exit.
+    """
+
+    def __init__(self, process: Any, label: str, on_stderr_line: Optional[Callable[[str], None]] = None):
+        self._process = process
+        self.label = label
+        self.stderr_tail = StderrTail(getattr(process, "stderr", None), label, on_line=on_stderr_line)
+        self._exit_reported = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._process, name)
+
+    async def wait(self) -> int:
+        returncode = await self._process.wait()
+        await self.stderr_tail.wait_closed()
+        if not self._exit_reported:
+            self._exit_reported = True
+            stats = self.stderr_tail.get_stats()
+            ui.debug(f"process exited rc={returncode} {stats}", self.label)
+            trace_mark("process.exit", label=self.label, returncode=returncode, **stats)
+        return returncode
+
+    def failure_detail(self, max_chars: int = 2000) -> str:
+        """Exit status and stderr tail, for error messages"""
+        parts: List[str] = []
+        if self._process.returncode is not None:
+            parts.append(f"exit code {self._process.returncode}")
+        tail = self.stderr_tail.text(max_chars)
+        if tail:
+            parts.append(f"stderr:\n{tail}")
+        return "; ".join(parts)
+
+
+async def spawn_cli_process(
+    cmd: List[str],
+    cwd: Optional[str] = None,
+    label: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    stdin: bool = True,
+    on_stderr_line: Optional[Callable[[str], None]] = None,
+) -> CLIProcess:
+    """Start `cmd` with piped stdout/stderr (and stdin unless `stdin` is False)"""
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if stdin else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+    )
+    return CLIProcess(process, label or os.path.basename(cmd[0]), on_stderr_line=on_stderr_line)
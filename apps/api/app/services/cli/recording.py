@@ -0,0 +1,465 @@
+"""Record and replay of raw provider traffic.
+
+With CLI_RECORD_DIR set, every CLI subprocess (Codex proto, Cursor
+stream-json, Qwen/Gemini ACP) and the VibeKit bridge HTTP client write their
+traffic to an NDJSON fixture in that directory. `ReplayProcess` and
+`ReplayTransport` feed a fixture back to the unchanged adapters at full speed
+(see benchmarks/replay.py).
+
+Fixture format, one JSON object per line:
+
+    {"kind": "header", "cli": "codex", "channel": "stdio" | "http", "recorded_at": ...}
+    {"dir": "in" | "out", "t_ms": 12.5, "data": "<one stdin/stdout line>"}
+    {"dir": "http", "t_ms": 3.1, "method": "POST", "path": "/api/...", "status": 200,
+     "content_type": "text/event-stream", "body": "..."}
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.terminal_ui import ui
+
+# Replay waits this long for the adapter to send the stdin line a recorded
+# response depends on before releasing it anyway
+REPLAY_INPUT_TIMEOUT_SECONDS = 5.0
+
+
+def recording_enabled() -> bool:
+    return bool(settings.cli_record_dir)
+
+
+class _FixtureWriter:
+    """Appends frames to one fixture file"""
+
+    def __init__(self, label: str, channel: str, suffix: str):
+        os.makedirs(settings.cli_record_dir, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(settings.cli_record_dir, f"{label}-{stamp}-{suffix}.ndjson")
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._start = time.perf_counter()
+        self._write({
+            "kind": "header",
+            "cli": label,
+            "channel": channel,
+            "recorded_at": datetime.utcnow().isoformat(),
+        })
+        ui.debug(f"Recording {label} traffic to {self.path}", "Recorder")
+
+    def _write(self, obj: Dict[str, Any]) -> None:
+        if self._file.closed:
+            return
+        self._file.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def frame(self, direction: str, **fields: Any) -> None:
+        self._write({"dir": direction, "t_ms": round((time.perf_counter() - self._start) * 1000, 3), **fields})
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class _LineSplitter:
+    """Turns a byte stream into complete text lines"""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[str]:
+        self._buf += data
+        lines: List[str] = []
+        while True:
+            idx = self._buf.find(b"\n")
+            if idx < 0:
+                return lines
+            lines.append(self._buf[:idx].decode("utf-8", errors="replace"))
+            del self._buf[: idx + 1]
+
+    def flush(self) -> List[str]:
+        if not self._buf:
+            return []
+        rest = self._buf.decode("utf-8", errors="replace")
+        self._buf.clear()
+        return [rest]
+
+
+class _TeeReader:
+    """Wraps a process's stdout StreamReader and records every line read"""
+
+    def __init__(self, reader: asyncio.StreamReader, sink: _FixtureWriter):
+        self._reader = reader
+        self._sink = sink
+        self._lines = _LineSplitter()
+
+    def _record(self, data: bytes) -> None:
+        if data:
+            for line in self._lines.feed(data):
+                self._sink.frame("out", data=line)
+        else:
+            for line in self._lines.flush():
+                self._sink.frame("out", data=line)
+            self._sink.close()
+
+    async def read(self, n: int = -1) -> bytes:
+        data = await self._reader.read(n)
+        self._record(data)
+        return data
+
+    async def readline(self) -> bytes:
+        data = await self._reader.readline()
+        self._record(data)
+        return data
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._reader, name)
+
+
+class _TeeWriter:
+    """Wraps a process's stdin StreamWriter and records every line written"""
+
+    def __init__(self, writer: asyncio.StreamWriter, sink: _FixtureWriter):
+        self._writer = writer
+        self._sink = sink
+        self._lines = _LineSplitter()
+
+    def write(self, data: bytes) -> None:
+        for line in self._lines.feed(data):
+            self._sink.frame("in", data=line)
+        self._writer.write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._writer, name)
+
+
+def record_process(process: Any, label: str) -> None:
+    """Tee the stdin/stdout of a freshly spawned CLI process into a fixture"""
+    if not recording_enabled() or getattr(process, "stdout", None) is None:
+        return
+    try:
+        sink = _FixtureWriter(label, "stdio", str(getattr(process, "pid", "") or os.getpid()))
+    except OSError as e:
+        ui.warning(f"Cannot record {label} traffic: {e}", "Recorder")
+        return
+    process.stdout = _TeeReader(process.stdout, sink)
+    if getattr(process, "stdin", None) is not None:
+        process.stdin = _TeeWriter(process.stdin, sink)
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """Passes a streamed (SSE) response body through, recording it when the stream ends"""
+
+    def __init__(self, inner: httpx.AsyncByteStream, on_close):
+        self._inner = inner
+        self._on_close = on_close
+        self._chunks: List[bytes] = []
+
+    async def __aiter__(self):
+        async for chunk in self._inner:
+            self._chunks.append(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._inner.aclose()
+        finally:
+            self._on_close(b"".join(self._chunks))
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records every request/response exchange"""
+
+    def __init__(self, label: str, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.label = label
+        self._inner = inner or httpx.AsyncHTTPTransport()
+        self._sink: Optional[_FixtureWriter] = None
+
+    def _writer(self) -> _FixtureWriter:
+        if self._sink is None:
+            self._sink = _FixtureWriter(self.label, "http", str(id(self)))
+        return self._sink
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        sink = self._writer()
+        started = time.perf_counter()
+        response = await self._inner.handle_async_request(request)
+        content_type = response.headers.get("content-type", "")
+
+        def record(body: bytes) -> None:
+            sink.frame(
+                "http",
+                method=request.method,
+                path=request.url.path,
+                status=response.status_code,
+                content_type=content_type,
+                elapsed_ms=round((time.perf_counter() - started) * 1000, 3),
+                body=body.decode("utf-8", errors="replace"),
+            )
+
+        if content_type.startswith("text/event-stream"):
+            return httpx.Response(
+                response.status_code,
+                headers=response.headers,
+                stream=_RecordingStream(response.stream, record),
+                request=request,
+            )
+        body = await response.aread()
+        record(body)
+        # `body` is already decoded, so drop the transfer headers describing the wire form
+        headers = [
+            (k, v) for k, v in response.headers.items()
+            if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+        if self._sink is not None:
+            self._sink.close()
+
+
+# ---- Replay --------------------------------------------------------------
+
+
+@dataclass
+class Fixture:
+    path: str
+    header: Dict[str, Any]
+    frames: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def cli(self) -> str:
+        return str(self.header.get("cli", ""))
+
+    @property
+    def channel(self) -> str:
+        return str(self.header.get("channel", "stdio"))
+
+    @property
+    def output_events(self) -> int:
+        """Provider events the adapter has to process (stdout lines or SSE data lines)"""
+        if self.channel == "http":
+            return sum(
+                1
+                for frame in self.frames
+                for line in frame.get("body", "").splitlines()
+                if line.startswith("data: ")
+            )
+        return sum(1 for frame in self.frames if frame.get("dir") == "out")
+
+
+def load_fixture(path: str) -> Fixture:
+    header: Dict[str, Any] = {}
+    frames: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if obj.get("kind") == "header":
+                header = obj
+            else:
+                frames.append(obj)
+    return Fixture(path=path, header=header, frames=frames)
+
+
+def _message_id(line: str) -> Any:
+    """JSON-RPC request id or Codex submission id of a stdin/stdout line, else None"""
+    if '"id"' not in line:
+        return None
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+    return obj.get("id")
+
+
+class _ReplayStdin:
+    """Accepts the adapter's stdin writes and tells the replay how far it got"""
+
+    def __init__(self, process: "ReplayProcess"):
+        self._process = process
+        self._lines = _LineSplitter()
+        self._closed = False
+
+    def write(self, data: bytes) -> None:
+        for line in self._lines.feed(data):
+            self._process._on_input(line)
+
+    async def drain(self) -> None:
+        await asyncio.sleep(0)
+
+    def close(self) -> None:
+        self._closed = True
+
+    def is_closing(self) -> bool:
+        return self._closed
+
+    async def wait_closed(self) -> None:
+        return None
+
+
+class ReplayProcess:
+    """Stands in for an asyncio subprocess, replaying a recorded stdio fixture.
+
+    Recorded output is released in order. Output recorded after the n-th stdin
+    line is held until the adapter has written its own n-th line, and ids the
+    adapter generated (JSON-RPC request ids, Codex submission ids) replace the
+    recorded ones in later output.
+    """
+
+    pid = None  # Keeps replays out of the execution journal
+
+    def __init__(self, fixture: Fixture):
+        self._fixture = fixture
+        self.stdout = asyncio.StreamReader(limit=1 << 24)
+        self.stderr = asyncio.StreamReader()
+        self.stderr.feed_eof()
+        self.stdin = _ReplayStdin(self)
+        self.returncode: Optional[int] = None
+        self._inputs: List[str] = []
+        self._input_event = asyncio.Event()
+        self._id_map: Dict[Any, Any] = {}
+        self._done = asyncio.Event()
+        self._pump_task = asyncio.create_task(self._pump())
+
+    def _on_input(self, line: str) -> None:
+        self._inputs.append(line)
+        self._input_event.set()
+
+    async def _wait_for_input(self, count: int) -> Optional[str]:
+        deadline = time.monotonic() + REPLAY_INPUT_TIMEOUT_SECONDS
+        while len(self._inputs) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                ui.warning(
+                    f"Replay of {self._fixture.cli}: adapter sent {len(self._inputs)} stdin lines, "
+                    f"fixture expects {count}; continuing",
+                    "Replay",
+                )
+                return None
+            self._input_event.clear()
+            try:
+                await asyncio.wait_for(self._input_event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+        return self._inputs[count - 1]
+
+    def _rewrite(self, line: str) -> str:
+        if not self._id_map or '"id"' not in line:
+            return line
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            return line
+        if isinstance(obj, dict) and "id" in obj:
+            try:
+                live = self._id_map.get(obj["id"])
+            except TypeError:  # Unhashable id
+                live = None
+            if live is not None:
+                obj["id"] = live
+                return json.dumps(obj)
+        return line
+
+    async def _pump(self) -> None:
+        inputs_seen = 0
+        try:
+            for frame in self._fixture.frames:
+                direction = frame.get("dir")
+                if direction == "in":
+                    inputs_seen += 1
+                    live = await self._wait_for_input(inputs_seen)
+                    recorded_id = _message_id(frame.get("data", ""))
+                    live_id = _message_id(live) if live is not None else None
+                    if recorded_id is not None and live_id is not None and recorded_id != live_id:
+                        try:
+                            self._id_map[recorded_id] = live_id
+                        except TypeError:
+                            pass
+                elif direction == "out":
+                    self.stdout.feed_data((self._rewrite(frame.get("data", "")) + "\n").encode("utf-8"))
+                    # Let the adapter consume output as it would from a real pipe
+                    await asyncio.sleep(0)
+            self._finish(0)
+        except asyncio.CancelledError:
+            self._finish(-15)
+            raise
+
+    def _finish(self, returncode: int) -> None:
+        if self.returncode is None:
+            self.returncode = returncode
+        if not self.stdout.at_eof():
+            self.stdout.feed_eof()
+        self._done.set()
+
+    def terminate(self) -> None:
+        if self.returncode is None:
+            self._pump_task.cancel()
+            self._finish(-15)
+
+    def kill(self) -> None:
+        self.terminate()
+
+    async def wait(self) -> int:
+        await self._done.wait()
+        return self.returncode  # type: ignore[return-value]
+
+
+class replay_subprocesses:
+    """Context manager: every CLI subprocess spawned inside replays `fixture`"""
+
+    def __init__(self, fixture: Fixture):
+        self.fixture = fixture
+        self.processes: List[ReplayProcess] = []
+        self._original = None
+
+    async def _spawn(self, *args: Any, **kwargs: Any) -> ReplayProcess:
+        process = ReplayProcess(self.fixture)
+        self.processes.append(process)
+        return process
+
+    def __enter__(self) -> "replay_subprocesses":
+        self._original = asyncio.create_subprocess_exec
+        asyncio.create_subprocess_exec = self._spawn  # type: ignore[assignment]
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        asyncio.create_subprocess_exec = self._original  # type: ignore[assignment]
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """httpx transport answering from a recorded http fixture.
+
+    Exchanges are matched by method and path in recorded order; an exchange
+    that was never recorded gets a 404.
+    """
+
+    def __init__(self, fixture: Fixture):
+        self._exchanges: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        for frame in fixture.frames:
+            if frame.get("dir") == "http":
+                self._exchanges[(frame["method"], frame["path"])].append(frame)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        queue = self._exchanges.get((request.method, request.url.path))
+        if not queue:
+            return httpx.Response(404, json={"error": "not recorded"}, request=request)
+        frame = queue.popleft() if len(queue) > 1 else queue[0]
+        return httpx.Response(
+            frame.get("status", 200),
+            headers={"content-type": frame.get("content_type") or "application/json"},
+            content=frame.get("body", "").encode("utf-8"),
+            request=request,
+        )
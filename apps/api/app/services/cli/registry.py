@@ -0,0 +1,52 @@
+"""
+Process-wide registry of CLI adapters.
+
+Adapters are constructed lazily on first use and then reused for every
+instruction, so their warm state (ACP clients, session maps, tracked
+processes) survives across requests. Request-scoped data is passed through
+`CLIRequestContext` rather than stored on the adapter.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict
+
+from .base import BaseCLI, CLIType
+from .adapters import CursorAgentCLI, CodexCLI, QwenCLI, GeminiCLI
+from .adapters.claude_code_sandbox import ClaudeCodeSandboxCLI
+
+
+class AdapterRegistry:
+    """Lazily constructed, shared adapter instances keyed by CLI type"""
+
+    def __init__(self, factories: Dict[CLIType, Callable[[], BaseCLI]]):
+        self._factories = factories
+        self._adapters: Dict[CLIType, BaseCLI] = {}
+
+    def supports(self, cli_type: CLIType) -> bool:
+        return cli_type in self._factories
+
+    def get(self, cli_type: CLIType) -> BaseCLI:
+        """Return the shared adapter for `cli_type`, constructing it on first use"""
+        adapter = self._adapters.get(cli_type)
+        if adapter is None:
+            adapter = self._factories[cli_type]()
+            self._adapters[cli_type] = adapter
+        return adapter
+
+    def get_many(self, *cli_types: CLIType) -> Dict[CLIType, BaseCLI]:
+        return {cli_type: self.get(cli_type) for cli_type in cli_types}
+
+
+# Global adapter registry
+adapter_registry = AdapterRegistry(
+    {
+        CLIType.CLAUDE: ClaudeCodeSandboxCLI,
+        CLIType.CURSOR: CursorAgentCLI,
+        CLIType.CODEX: CodexCLI,
+        CLIType.QWEN: QwenCLI,
+        CLIType.GEMINI: GeminiCLI,
+    }
+)
+
+
+__all__ = ["AdapterRegistry", "adapter_registry"]
@@ -0,0 +1,208 @@
+"""Token usage reported by providers, and per-CLI/model throughput.
+
+Adapters normalize whatever usage a provider reports (Cursor result events,
+Codex token_count events, ACP prompt results and updates, the sandbox bridge's
+complete event) into a TokenUsage and attach it to a message as
+`metadata_json["usage"]`. The manager copies it onto Message.token_count /
+cost_usd, adds it to the Session totals and records it here.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.terminal_ui import ui
+
+# Provider spellings for each field, checked in order
+_INPUT_KEYS = ("input_tokens", "inputTokens", "prompt_tokens", "promptTokens", "promptTokenCount")
+_OUTPUT_KEYS = ("output_tokens", "outputTokens", "completion_tokens", "completionTokens", "candidatesTokenCount")
+_CACHED_KEYS = (
+    "cached_input_tokens",
+    "cachedInputTokens",
+    "cache_read_input_tokens",
+    "cacheReadTokens",
+    "cachedContentTokenCount",
+)
+_REASONING_KEYS = ("reasoning_output_tokens", "reasoningTokens", "thoughtsTokenCount")
+_TOTAL_KEYS = ("total_tokens", "totalTokens", "totalTokenCount")
+_COST_KEYS = ("cost_usd", "costUsd", "total_cost_usd", "totalCostUsd")
+
+
+def _first_number(data: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[float]:
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+    return None
+
+
+@dataclass
+class TokenUsage:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_input_tokens: int = 0
+    reasoning_tokens: int = 0
+    total: Optional[int] = None  # As reported; else input + output
+    cost_usd: Optional[float] = None  # Reported by the provider or estimated from pricing
+
+    @property
+    def total_tokens(self) -> int:
+        return self.total if self.total is not None else self.input_tokens + self.output_tokens
+
+    def __bool__(self) -> bool:
+        return bool(self.total_tokens or self.cost_usd)
+
+    def __add__(self, other: "TokenUsage") -> "TokenUsage":
+        costs = [c for c in (self.cost_usd, other.cost_usd) if c is not None]
+        return TokenUsage(
+            input_tokens=self.input_tokens + other.input_tokens,
+            output_tokens=self.output_tokens + other.output_tokens,
+            cached_input_tokens=self.cached_input_tokens + other.cached_input_tokens,
+            reasoning_tokens=self.reasoning_tokens + other.reasoning_tokens,
+            total=self.total_tokens + other.total_tokens,
+            cost_usd=sum(costs) if costs else None,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["total"] = self.total_tokens
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Any) -> Optional["TokenUsage"]:
+        """Inverse of to_dict (message metadata); None when absent or malformed"""
+        if not isinstance(data, dict):
+            return None
+        try:
+            return cls(**{k: data[k] for k in cls.__dataclass_fields__ if k in data})
+        except TypeError:
+            return None
+
+
+def parse_usage(event: Any) -> Optional[TokenUsage]:
+    """TokenUsage from a provider payload, or None if it carries no usage.
+
+    Accepts the usage object itself or a payload holding it under `usage`,
+    `tokenUsage`, `usageMetadata` or `_meta.usage`, in snake or camel case.
+    A cost at the payload's top level (e.g. total_cost_usd) is included.
+    """
+    if not isinstance(event, dict):
+        return None
+    data: Any = event
+    for key in ("usage", "tokenUsage", "usageMetadata"):
+        if isinstance(event.get(key), dict):
+            data = event[key]
+            break
+    else:
+        meta = event.get("_meta")
+        if isinstance(meta, dict) and isinstance(meta.get("usage"), dict):
+            data = meta["usage"]
+
+    input_tokens = _first_number(data, _INPUT_KEYS)
+    output_tokens = _first_number(data, _OUTPUT_KEYS)
+    total = _first_number(data, _TOTAL_KEYS)
+    cost = _first_number(data, _COST_KEYS)
+    if cost is None and data is not event:
+        cost = _first_number(event, _COST_KEYS)
+    if input_tokens is None and output_tokens is None and total is None and cost is None:
+        return None
+    return TokenUsage(
+        input_tokens=int(input_tokens or 0),
+        output_tokens=int(output_tokens or 0),
+        cached_input_tokens=int(_first_number(data, _CACHED_KEYS) or 0),
+        reasoning_tokens=int(_first_number(data, _REASONING_KEYS) or 0),
+        total=int(total) if total is not None else None,
+        cost_usd=float(cost) if cost is not None else None,
+    )
+
+
+# ---- Cost estimation --------------------------------------------------------
+
+
+_pricing: Optional[Dict[str, Dict[str, float]]] = None
+
+
+def _load_pricing() -> Dict[str, Dict[str, float]]:
+    """USD per million tokens by model, from settings.model_pricing_file:
+    {"gpt-5": {"input": 1.25, "cached_input": 0.125, "output": 10.0}, ...}
+    """
+    global _pricing
+    if _pricing is None:
+        from app.core.config import settings
+
+        _pricing = {}
+        path = settings.model_pricing_file
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                _pricing = {str(m): p for m, p in data.items() if isinstance(p, dict)}
+            except Exception as e:
+                ui.warning(f"Ignoring model pricing file {path}: {e}", "Usage")
+    return _pricing
+
+
+def estimate_cost(model: Optional[str], usage: TokenUsage) -> Optional[float]:
+    """Cost of `usage` at the configured price for `model`, if one is configured"""
+    price = _load_pricing().get(model or "")
+    if not price:
+        return None
+    cached = min(usage.cached_input_tokens, usage.input_tokens)
+    per_token = 1_000_000.0
+    return (
+        (usage.input_tokens - cached) * float(price.get("input", 0.0))
+        + cached * float(price.get("cached_input", price.get("input", 0.0)))
+        + usage.output_tokens * float(price.get("output", 0.0))
+    ) / per_token
+
+
+# ---- Throughput -------------------------------------------------------------
+
+
+@dataclass
+class _Throughput:
+    turns: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: float = 0.0
+    seconds: float = 0.0
+
+
+class UsageStats:
+    """Cumulative tokens and streaming time per (cli, model) since startup"""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], _Throughput] = {}
+        self._lock = threading.Lock()
+
+    def record(self, cli: str, model: Optional[str], usage: TokenUsage, seconds: float) -> None:
+        with self._lock:
+            entry = self._stats.setdefault((cli, model or "default"), _Throughput())
+            entry.turns += 1
+            entry.input_tokens += usage.input_tokens
+            entry.output_tokens += usage.output_tokens
+            entry.total_tokens += usage.total_tokens
+            entry.cost_usd += usage.cost_usd or 0.0
+            entry.seconds += max(0.0, seconds)
+
+    def get_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """{cli: {model: totals + output/total tokens per second}}"""
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (cli, model), entry in self._stats.items():
+                seconds = entry.seconds or None
+                result.setdefault(cli, {})[model] = {
+                    **asdict(entry),
+                    "cost_usd": round(entry.cost_usd, 6),
+                    "seconds": round(entry.seconds, 3),
+                    "output_tokens_per_second": round(entry.output_tokens / seconds, 2) if seconds else None,
+                    "tokens_per_second": round(entry.total_tokens / seconds, 2) if seconds else None,
+                }
+        return result
+
+
+usage_stats = UsageStats()
@@ -6,6 +6,7 @@ from typing import Dict, Optional, Any
 from sqlalchemy.orm import Session
 from app.models.projects import Project
 from app.services.cli.base import CLIType
+from app.services.cli_session_store import cli_session_store
 
 
 class CLISessionManager:
@@ -13,76 +14,30 @@ class CLISessionManager:
     
     def __init__(self, db: Session):
         self.db = db
-        self._session_cache: Dict[str, Dict[CLIType, str]] = {}
     
     def get_session_id(self, project_id: str, cli_type: CLIType) -> Optional[str]:
         """Get existing session ID for a project and CLI type"""
-        # Check cache first
-        if project_id in self._session_cache:
-            cached_session = self._session_cache[project_id].get(cli_type)
-            if cached_session:
-                return cached_session
-        
-        # Get from database
-        project = self.db.get(Project, project_id)
-        if not project:
-            return None
-        
-        session_mapping = {
-            CLIType.CLAUDE: project.active_claude_session_id,
-            CLIType.CURSOR: project.active_cursor_session_id
-        }
-        
-        session_id = session_mapping.get(cli_type)
-        
-        # Update cache
-        if project_id not in self._session_cache:
-            self._session_cache[project_id] = {}
-        self._session_cache[project_id][cli_type] = session_id
-        
-        return session_id
+        return cli_session_store.get_session_id(project_id, cli_type.value)
     
     def set_session_id(self, project_id: str, cli_type: CLIType, session_id: str) -> bool:
         """Set session ID for a project and CLI type"""
-        project = self.db.get(Project, project_id)
-        if not project:
+        if not self.db.get(Project, project_id):
             return False
         
-        # Update database
-        update_mapping = {
-            CLIType.CLAUDE: {"active_claude_session_id": session_id},
-            CLIType.CURSOR: {"active_cursor_session_id": session_id}
-        }
-        
-        update_data = update_mapping.get(cli_type)
-        if not update_data:
+        if not cli_session_store.set(project_id, cli_type.value, session_id=session_id):
             return False
         
-        # Update project record
-        for field, value in update_data.items():
-            setattr(project, field, value)
-        
-        self.db.commit()
-        
-        # Update cache
-        if project_id not in self._session_cache:
-            self._session_cache[project_id] = {}
-        self._session_cache[project_id][cli_type] = session_id
-        
         from app.core.terminal_ui import ui
         ui.success(f"Set {cli_type.value} session ID for project {project_id}: {session_id}", "Session")
         return True
     
     def get_all_sessions(self, project_id: str) -> Dict[str, Optional[str]]:
         """Get all CLI session IDs for a project"""
-        project = self.db.get(Project, project_id)
-        if not project:
+        if not self.db.get(Project, project_id):
             return {}
         
-        return {
-            "claude": project.active_claude_session_id,
-            "cursor": project.active_cursor_session_id
-        }
+        sessions = cli_session_store.get_all(project_id)
+        return {cli.value: sessions[cli.value].session_id if cli.value in sessions else None for cli in CLIType}
     
     def clear_session_id(self, project_id: str, cli_type: CLIType) -> bool:
         """Clear session ID for a project and CLI type"""
@@ -94,15 +49,13 @@ class CLISessionManager:
         if not project:
             return False
         
+        cli_session_store.clear(project_id)
+        
+        # Legacy columns are only read once, on import; clear them so they are not re-imported
         project.active_claude_session_id = None
         project.active_cursor_session_id = None
-        
         self.db.commit()
         
-        # Clear cache
-        if project_id in self._session_cache:
-            del self._session_cache[project_id]
-        
         from app.core.terminal_ui import ui
         ui.info(f"Cleared all CLI sessions for project {project_id}", "Session")
         return True
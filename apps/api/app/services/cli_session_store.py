@@ -0,0 +1,172 @@
+"""
+CLI Session Store
+Write-through cache of provider session IDs per (project, CLI)
+"""
+import json
+import threading
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from app.core.terminal_ui import ui
+from app.db.session import SessionLocal
+from app.models.cli_sessions import CLISession
+from app.models.projects import Project
+
+
+@dataclass(frozen=True)
+class CLISessionState:
+    session_id: Optional[str] = None
+    rollout_path: Optional[str] = None
+
+
+_EMPTY = CLISessionState()
+_UNSET = object()
+
+
+class CLISessionStore:
+    """Session state keyed by (project_id, cli_type).
+
+    Reads are dictionary hits once a project is loaded; writes update one
+    `cli_sessions` row in their own DB session, so CLIs no longer overwrite
+    each other's entries. The first load of a project imports the legacy
+    JSON blob from Project.active_cursor_session_id.
+    """
+
+    def __init__(self):
+        self._cache: Dict[Tuple[str, str], CLISessionState] = {}
+        self._loaded_projects: set = set()
+        self._lock = threading.Lock()
+
+    def _load_project(self, project_id: str) -> None:
+        db = SessionLocal()
+        try:
+            rows = db.query(CLISession).filter(CLISession.project_id == project_id).all()
+            states = {
+                row.cli_type: CLISessionState(row.session_id, row.rollout_path) for row in rows
+            }
+            if not rows:
+                states = self._import_legacy(db, project_id)
+        except Exception as e:
+            db.rollback()
+            ui.warning(f"Failed to load CLI sessions for {project_id}: {e}", "Session")
+            return
+        finally:
+            db.close()
+        with self._lock:
+            for cli_type, state in states.items():
+                self._cache.setdefault((project_id, cli_type), state)
+            self._loaded_projects.add(project_id)
+
+    def _import_legacy(self, db, project_id: str) -> Dict[str, CLISessionState]:
+        project = db.get(Project, project_id)
+        if not project:
+            return {}
+        states: Dict[str, CLISessionState] = {}
+        if project.active_claude_session_id:
+            states["claude"] = CLISessionState(session_id=project.active_claude_session_id)
+        blob = project.active_cursor_session_id
+        if blob:
+            try:
+                data = json.loads(blob)
+            except (json.JSONDecodeError, TypeError):
+                data = blob
+            if not isinstance(data, dict):
+                data = {"cursor": blob}
+            for cli_type in ("cursor", "codex", "qwen", "gemini"):
+                if data.get(cli_type) or (cli_type == "codex" and data.get("codex_rollout")):
+                    states[cli_type] = CLISessionState(
+                        session_id=data.get(cli_type),
+                        rollout_path=data.get("codex_rollout") if cli_type == "codex" else None,
+                    )
+        for cli_type, state in states.items():
+            db.add(CLISession(
+                project_id=project_id,
+                cli_type=cli_type,
+                session_id=state.session_id,
+                rollout_path=state.rollout_path,
+                updated_at=datetime.utcnow(),
+            ))
+        if states:
+            db.commit()
+            ui.info(f"Imported legacy CLI sessions for {project_id}: {sorted(states)}", "Session")
+        return states
+
+    def get(self, project_id: str, cli_type: str) -> CLISessionState:
+        if project_id not in self._loaded_projects:
+            self._load_project(project_id)
+        return self._cache.get((project_id, cli_type), _EMPTY)
+
+    def get_session_id(self, project_id: str, cli_type: str) -> Optional[str]:
+        return self.get(project_id, cli_type).session_id
+
+    def get_rollout_path(self, project_id: str, cli_type: str) -> Optional[str]:
+        return self.get(project_id, cli_type).rollout_path
+
+    def get_all(self, project_id: str) -> Dict[str, CLISessionState]:
+        if project_id not in self._loaded_projects:
+            self._load_project(project_id)
+        with self._lock:
+            return {cli: state for (pid, cli), state in self._cache.items() if pid == project_id}
+
+    def set(self, project_id: str, cli_type: str, session_id=_UNSET, rollout_path=_UNSET) -> bool:
+        """Update the given fields; returns False when the row could not be written"""
+        current = self.get(project_id, cli_type)
+        changes = {}
+        if session_id is not _UNSET:
+            changes["session_id"] = session_id
+        if rollout_path is not _UNSET:
+            changes["rollout_path"] = rollout_path
+        state = replace(current, **changes)
+        if state == current and (project_id, cli_type) in self._cache:
+            return True
+
+        db = SessionLocal()
+        try:
+            row = db.get(CLISession, (project_id, cli_type))
+            if row is None:
+                row = CLISession(project_id=project_id, cli_type=cli_type)
+                db.add(row)
+            for field, value in changes.items():
+                setattr(row, field, value)
+            row.updated_at = datetime.utcnow()
+            db.commit()
+            persisted = True
+        except Exception as e:
+            db.rollback()
+            persisted = False
+            ui.warning(f"Failed to persist {cli_type} session for {project_id}: {e}", "Session")
+        finally:
+            db.close()
+
+        # Cache even when the write failed so the running process keeps continuity
+        with self._lock:
+            self._cache[(project_id, cli_type)] = state
+        return persisted
+
+    def clear(self, project_id: str, cli_type: Optional[str] = None) -> None:
+        db = SessionLocal()
+        try:
+            query = db.query(CLISession).filter(CLISession.project_id == project_id)
+            if cli_type:
+                query = query.filter(CLISession.cli_type == cli_type)
+            query.delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            ui.warning(f"Failed to clear CLI sessions for {project_id}: {e}", "Session")
+        finally:
+            db.close()
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == project_id and (cli_type is None or k[1] == cli_type)]:
+                self._cache[key] = _EMPTY
+
+    def forget_project(self, project_id: str) -> None:
+        """Drop cached state for a deleted project"""
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == project_id]:
+                del self._cache[key]
+            self._loaded_projects.discard(project_id)
+
+
+cli_session_store = CLISessionStore()
@@ -0,0 +1,298 @@
+"""
+Execution Journal
+Durable record of act/chat executions so a restart does not leave zombie work
+"""
+import os
+import signal
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.terminal_ui import ui
+from app.db.session import SessionLocal
+from app.models.execution_journal import ExecutionJournalEntry
+from app.models.messages import Message
+from app.models.sessions import Session as ChatSession
+from app.models.user_requests import UserRequest
+
+
+INTERRUPTED_MESSAGE = "Execution interrupted by a server restart"
+
+# CLIs that keep a provider-side session per project, so a re-run picks up the context
+RESUMABLE_CLIS = {"cursor", "codex", "qwen", "gemini"}
+
+# Finished entries are pruned after this long
+RETENTION = timedelta(days=7)
+
+# Substrings expected in a journaled child's command line; guards against PID reuse
+_CLI_PROCESS_MARKERS = ("codex", "cursor-agent", "qwen", "gemini")
+
+# Substrings expected in an API process's command line (uvicorn app.main:app)
+_API_PROCESS_MARKERS = ("uvicorn", "app.main")
+
+
+def _read_cmdline(pid: Union[int, str]) -> Optional[str]:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="replace")
+    except OSError:
+        return None
+
+
+def _is_cli_process(pid: int) -> bool:
+    cmdline = _read_cmdline(pid)
+    return cmdline is not None and any(marker in cmdline for marker in _CLI_PROCESS_MARKERS)
+
+
+def _is_other_live_api(pid: Optional[int]) -> bool:
+    """True when `pid` is another API process that is still running.
+
+    A PID reused since the API exited does not count: its command line must
+    match this process's or name the API (see _API_PROCESS_MARKERS). Without
+    /proc, liveness alone is all that can be checked.
+    """
+    if not pid or pid == os.getpid():
+        return False
+    if os.path.isdir("/proc/self"):
+        cmdline = _read_cmdline(pid)
+        if cmdline is None:
+            return False
+        return cmdline == _read_cmdline("self") or any(marker in cmdline for marker in _API_PROCESS_MARKERS)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ExecutionJournal:
+    """Tracks each scheduled execution through queued -> running -> finished.
+
+    Rows are written in their own short DB sessions so journal updates never
+    depend on the state of the request's session. On startup `reconcile()`
+    finds entries a previous process left unfinished: their CLI processes are
+    killed, and they are either queued again (never started, or resumable CLI
+    with RESUME_INTERRUPTED_EXECUTIONS on) or marked failed. Entries still
+    owned by another live API process (a second worker, or the old process
+    during a rolling restart) are left alone, as are their requests and sessions.
+    """
+
+    def __init__(self):
+        self._resumers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+        self._to_resume: List[Dict[str, Any]] = []
+
+    def register_resumer(self, kind: str, resumer: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """Register the coroutine that re-submits journaled executions of `kind`"""
+        self._resumers[kind] = resumer
+
+    # ---- Recording ---------------------------------------------------------
+
+    def record_queued(
+        self,
+        db: Session,
+        job_id: str,
+        project_id: str,
+        kind: str,
+        request_id: Optional[str],
+        cli_type: Optional[str],
+        payload: Dict[str, Any],
+    ) -> None:
+        """Add a journal entry in the caller's transaction (caller commits)"""
+        db.add(ExecutionJournalEntry(
+            id=job_id,
+            project_id=project_id,
+            request_id=request_id,
+            kind=kind,
+            state="queued",
+            cli_type=cli_type,
+            payload=payload,
+            child_pids=[],
+            created_at=datetime.utcnow(),
+        ))
+
+    def _update(self, job_id: str, apply: Callable[[ExecutionJournalEntry], None]) -> None:
+        db = SessionLocal()
+        try:
+            entry = db.get(ExecutionJournalEntry, job_id)
+            if entry:
+                apply(entry)
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            ui.warning(f"Journal update failed for {job_id[:8]}...: {e}", "Journal")
+        finally:
+            db.close()
+
+    def mark_running(self, job_id: str) -> None:
+        def apply(entry: ExecutionJournalEntry) -> None:
+            entry.state = "running"
+            entry.started_at = datetime.utcnow()
+            entry.api_pid = os.getpid()
+            entry.attempts = (entry.attempts or 0) + 1
+            entry.child_pids = []
+        self._update(job_id, apply)
+
+    def mark_finished(self, job_id: str, outcome: str) -> None:
+        def apply(entry: ExecutionJournalEntry) -> None:
+            entry.state = "finished"
+            entry.outcome = outcome
+            entry.finished_at = datetime.utcnow()
+        self._update(job_id, apply)
+
+    def record_process(self, job_id: str, pid: int) -> None:
+        """Remember a CLI process spawned for this execution"""
+        def apply(entry: ExecutionJournalEntry) -> None:
+            entry.child_pids = list(entry.child_pids or []) + [pid]
+        self._update(job_id, apply)
+
+    # ---- Startup reconciliation ----------------------------------------------
+
+    def reconcile(self) -> Dict[str, int]:
+        """Settle executions left unfinished by a previous API process"""
+        stats = {"killed": 0, "resumed": 0, "failed": 0}
+        resumed_sessions = set()
+        # Sessions and requests of executions another live API process is running
+        live_sessions = set()
+        live_requests = set()
+        db = SessionLocal()
+        try:
+            entries = db.query(ExecutionJournalEntry).filter(
+                ExecutionJournalEntry.state != "finished"
+            ).all()
+            for entry in entries:
+                if _is_other_live_api(entry.api_pid):
+                    live_sessions.add(entry.id)
+                    if entry.request_id:
+                        live_requests.add(entry.request_id)
+                    continue
+
+                stats["killed"] += self._kill_children(entry.child_pids or [])
+
+                resumable = entry.state == "queued" or (
+                    settings.resume_interrupted_executions and entry.cli_type in RESUMABLE_CLIS
+                )
+                if resumable and entry.kind in self._resumers and entry.payload:
+                    entry.state = "queued"
+                    entry.child_pids = []
+                    self._to_resume.append({
+                        "job_id": entry.id,
+                        "project_id": entry.project_id,
+                        "request_id": entry.request_id,
+                        "kind": entry.kind,
+                        "payload": entry.payload,
+                    })
+                    resumed_sessions.add(entry.id)
+                    stats["resumed"] += 1
+                else:
+                    entry.state = "finished"
+                    entry.outcome = "interrupted"
+                    entry.finished_at = datetime.utcnow()
+
+            # Anything still marked in flight that is not being resumed is orphaned,
+            # including executions that predate the journal
+            orphaned = db.query(UserRequest).filter(UserRequest.is_completed == False).all()  # noqa: E712
+            for user_request in orphaned:
+                if (
+                    user_request.session_id in resumed_sessions
+                    or user_request.session_id in live_sessions
+                    or user_request.id in live_requests
+                ):
+                    continue
+                self._fail_request(db, user_request)
+                stats["failed"] += 1
+
+            db.query(ChatSession).filter(
+                ChatSession.status.in_(["active", "running"]),
+                ChatSession.id.notin_(list(resumed_sessions | live_sessions))
+            ).update({"status": "failed", "completed_at": datetime.utcnow()}, synchronize_session=False)
+
+            db.query(ExecutionJournalEntry).filter(
+                ExecutionJournalEntry.state == "finished",
+                ExecutionJournalEntry.finished_at < datetime.utcnow() - RETENTION
+            ).delete(synchronize_session=False)
+
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            ui.error(f"Execution journal reconciliation failed: {e}", "Journal")
+        finally:
+            db.close()
+
+        if any(stats.values()):
+            ui.info(
+                f"Reconciled interrupted executions: {stats['resumed']} resumed, "
+                f"{stats['failed']} failed, {stats['killed']} processes killed",
+                "Journal",
+            )
+        return stats
+
+    def _kill_children(self, pids: List[int]) -> int:
+        killed = 0
+        for pid in pids:
+            if not _is_cli_process(pid):
+                continue
+            try:
+                os.kill(pid, signal.SIGTERM)
+                killed += 1
+            except (ProcessLookupError, PermissionError):
+                pass
+        return killed
+
+    def _fail_request(self, db: Session, user_request: UserRequest) -> None:
+        now = datetime.utcnow()
+        user_request.is_completed = True
+        user_request.is_successful = False
+        user_request.completed_at = now
+        user_request.error_message = INTERRUPTED_MESSAGE
+
+        conversation_id = user_request.user_message.conversation_id if user_request.user_message else None
+        db.add(Message(
+            id=str(uuid.uuid4()),
+            project_id=user_request.project_id,
+            role="assistant",
+            message_type="error",
+            content=INTERRUPTED_MESSAGE,
+            metadata_json={"type": f"{user_request.request_type}_error", "reason": "restart"},
+            conversation_id=conversation_id,
+            session_id=user_request.session_id,
+            created_at=now,
+        ))
+
+    async def resume_pending(self) -> None:
+        """Re-submit executions selected by `reconcile()` (needs a running loop)"""
+        pending, self._to_resume = self._to_resume, []
+        for item in pending:
+            try:
+                await self._resumers[item["kind"]](item)
+            except Exception as e:
+                ui.error(f"Failed to resume execution {item['job_id'][:8]}...: {e}", "Journal")
+                self.mark_finished(item["job_id"], "interrupted")
+                self._fail_unresumed(item)
+
+    def _fail_unresumed(self, item: Dict[str, Any]) -> None:
+        """Settle the request and session of an execution that could not be re-submitted"""
+        db = SessionLocal()
+        try:
+            if item.get("request_id"):
+                user_request = db.get(UserRequest, item["request_id"])
+                if user_request and not user_request.is_completed:
+                    self._fail_request(db, user_request)
+            db.query(ChatSession).filter(
+                ChatSession.id == item["job_id"],
+                ChatSession.status.in_(["active", "running"])
+            ).update({"status": "failed", "completed_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            ui.warning(f"Could not mark execution {item['job_id'][:8]}... failed: {e}", "Journal")
+        finally:
+            db.close()
+
+
+# Global journal instance
+execution_journal = ExecutionJournal()
@@ -0,0 +1,216 @@
+"""
+Execution Scheduler
+Serializes act/chat executions per project and bounds global CLI concurrency
+"""
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.terminal_ui import ui
+from app.core.websocket.manager import manager
+
+
+@dataclass
+class ScheduledJob:
+    """A queued act/chat execution"""
+    job_id: str
+    project_id: str
+    kind: str  # act, chat
+    factory: Callable[[], Awaitable[Any]]
+    request_id: Optional[str] = None
+    session_id: Optional[str] = None
+    enqueued_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    task: Optional[asyncio.Task] = None
+
+
+class ExecutionScheduler:
+    """Per-project serial queues drained round-robin under a global concurrency cap.
+
+    - Only one job per project runs at a time, so two instructions never touch
+      the same repo concurrently.
+    - At most `max_concurrency` jobs run across all projects.
+    - Projects with waiting work take turns (one job each per round), so a
+      project with a long backlog cannot starve the others.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self._queues: Dict[str, Deque[ScheduledJob]] = {}
+        self._ready: Deque[str] = deque()  # Projects with pending work and nothing running
+        self._running: Dict[str, ScheduledJob] = {}  # project_id -> running job
+
+    async def submit(
+        self,
+        project_id: str,
+        job_id: str,
+        factory: Callable[[], Awaitable[Any]],
+        kind: str = "act",
+        request_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> int:
+        """Enqueue a job and return its global queue position (0 = started immediately)"""
+        job = ScheduledJob(
+            job_id=job_id,
+            project_id=project_id,
+            kind=kind,
+            factory=factory,
+            request_id=request_id,
+            session_id=session_id,
+        )
+        queue = self._queues.setdefault(project_id, deque())
+        queue.append(job)
+        if project_id not in self._running and project_id not in self._ready:
+            self._ready.append(project_id)
+
+        self._dispatch()
+        position = self.get_position(job_id)
+        ui.info(
+            f"Scheduled {kind} job {job_id[:8]}... for project {project_id} (position {position})",
+            "Scheduler",
+        )
+        await self._broadcast_positions()
+        return position
+
+    def _dispatch(self) -> None:
+        """Start as many ready jobs as the concurrency cap allows"""
+        while self._ready and len(self._running) < self.max_concurrency:
+            project_id = self._ready.popleft()
+            queue = self._queues.get(project_id)
+            if not queue:
+                self._queues.pop(project_id, None)
+                continue
+            job = queue.popleft()
+            job.started_at = datetime.utcnow()
+            self._running[project_id] = job
+            job.task = asyncio.create_task(self._run(job))
+
+    async def _run(self, job: ScheduledJob) -> None:
+        try:
+            await job.factory()
+        except Exception as e:
+            ui.error(f"Scheduled {job.kind} job {job.job_id[:8]}... failed: {e}", "Scheduler")
+        finally:
+            self._running.pop(job.project_id, None)
+            queue = self._queues.get(job.project_id)
+            if queue:
+                # Back of the line: other waiting projects get their turn first
+                self._ready.append(job.project_id)
+            else:
+                self._queues.pop(job.project_id, None)
+            self._dispatch()
+            await self._broadcast_positions()
+
+    def _pending_order(self) -> List[ScheduledJob]:
+        """Return pending jobs in the order they are expected to start"""
+        projects = list(self._ready) + [
+            project_id for project_id in self._running if self._queues.get(project_id)
+        ]
+        order: List[ScheduledJob] = []
+        depth = max((len(self._queues.get(p, ())) for p in projects), default=0)
+        for round_index in range(depth):
+            for project_id in projects:
+                queue = self._queues.get(project_id)
+                if queue and round_index < len(queue):
+                    order.append(queue[round_index])
+        return order
+
+    def get_position(self, job_id: str) -> int:
+        """Global queue position of a job (0 = running or unknown)"""
+        for index, job in enumerate(self._pending_order()):
+            if job.job_id == job_id:
+                return index + 1
+        return 0
+
+    def find_job(self, request_id: str) -> Optional[ScheduledJob]:
+        """Locate a running or pending job by its user request ID"""
+        for job in self._running.values():
+            if job.request_id == request_id:
+                return job
+        for queue in self._queues.values():
+            for job in queue:
+                if job.request_id == request_id:
+                    return job
+        return None
+
+    async def remove_pending(self, request_id: str) -> Optional[ScheduledJob]:
+        """Drop a job that has not started yet; returns it, or None if not pending"""
+        for project_id, queue in list(self._queues.items()):
+            for job in queue:
+                if job.request_id != request_id:
+                    continue
+                queue.remove(job)
+                if not queue:
+                    self._queues.pop(project_id, None)
+                    if project_id in self._ready:
+                        self._ready.remove(project_id)
+                ui.info(f"Removed pending {job.kind} job {job.job_id[:8]}...", "Scheduler")
+                await self._broadcast_positions()
+                return job
+        return None
+
+    async def wait_for_job(self, job: ScheduledJob, timeout: float) -> bool:
+        """Wait for a running job to wind down; hard-cancel it after `timeout` seconds.
+
+        Returns True if the job finished on its own within the grace period.
+        """
+        if job.task is None or job.task.done():
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(job.task), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            ui.warning(
+                f"{job.kind} job {job.job_id[:8]}... did not stop in {timeout}s, cancelling task",
+                "Scheduler",
+            )
+            job.task.cancel()
+            try:
+                await job.task
+            except (asyncio.CancelledError, Exception):
+                pass
+            return False
+        except Exception:
+            return True
+
+    def is_running(self, project_id: str) -> bool:
+        return project_id in self._running
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": len(self._running),
+            "queued": sum(len(q) for q in self._queues.values()),
+            "projects_waiting": len(self._ready),
+        }
+
+    async def _broadcast_positions(self) -> None:
+        """Push queue positions of all waiting jobs to their project's clients"""
+        for position, job in enumerate(self._pending_order(), start=1):
+            project_queue = self._queues.get(job.project_id) or deque()
+            try:
+                project_position = project_queue.index(job) + 1
+            except ValueError:
+                project_position = 0
+            try:
+                await manager.broadcast_to_project(job.project_id, {
+                    "type": "queue_update",
+                    "data": {
+                        "kind": job.kind,
+                        "request_id": job.request_id,
+                        "session_id": job.session_id,
+                        "position": position,
+                        "project_position": project_position,
+                        "running": len(self._running),
+                        "max_concurrency": self.max_concurrency,
+                    }
+                })
+            except Exception as e:
+                ui.warning(f"Queue update broadcast failed: {e}", "Scheduler")
+
+
+# Global scheduler instance
+execution_scheduler = ExecutionScheduler(settings.max_concurrent_executions)
@@ -1,3 +1,5 @@
+import asyncio
+import re
 import subprocess
 from typing import List, Optional
 import os
@@ -8,6 +10,23 @@ def _run(cmd: list[str], cwd: str) -> str:
     return res.stdout.strip()
 
 
+async def _run_async(cmd: list[str], cwd: str, env: Optional[dict] = None) -> str:
+    """Like `_run`, but without blocking the event loop"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env={**os.environ, **(env or {}), "LC_ALL": "C"},  # Stable output for parsing
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(
+            proc.returncode, cmd, output=stdout.decode(errors="replace"), stderr=stderr.decode(errors="replace")
+        )
+    return stdout.decode(errors="replace")  # Not stripped: porcelain lines start with a space
+
+
 def list_commits(repo_path: str, limit: int = 50) -> list[dict]:
     fmt = "%H%x01%P%x01%an%x01%ad%x01%s"
     out = _run(["git", "log", f"-n{limit}", f"--pretty=format:{fmt}", "--date=iso"], cwd=repo_path)
@@ -171,3 +190,159 @@ def commit_all(repo_path: str, message: str) -> dict:
             "error": str(e),
             "message": message
         }
+
+
+_COMMIT_SUMMARY_RE = re.compile(r"^\[.*?([0-9a-f]{40})\]", re.MULTILINE)
+_SHORTSTAT_RE = re.compile(
+    r"(\d+) files? changed(?:, (\d+) insertions?\(\+\))?(?:, (\d+) deletions?\(-\))?"
+)
+
+
+_ADD_VERBOSE_RE = re.compile(r"^(?:add|remove) '(.*)'$", re.MULTILINE)
+
+
+async def commit_all_async(repo_path: str, message: str) -> dict:
+    """Stage everything and commit without blocking the event loop.
+
+    Two git calls whatever the state of the tree: `add -A` and `commit`. A
+    clean tree is recognised by commit's "nothing to commit" exit, so no
+    status call is needed. `add --verbose` names the changed files, and the
+    commit summary is printed with a full hash (core.abbrev=40) so no extra
+    rev-parse is needed; line stats come from the same output.
+    """
+    try:
+        added = await _run_async(["git", "add", "-A", "--verbose"], cwd=repo_path)
+        files = _ADD_VERBOSE_RE.findall(added)
+        try:
+            output = await _run_async(
+                ["git", "-c", "core.abbrev=40", "commit", "-m", message], cwd=repo_path
+            )
+        except subprocess.CalledProcessError as e:
+            if e.returncode == 1 and "nothing to commit" in (e.output or ""):
+                return {"success": True, "skipped": True, "message": message, "files_changed": []}
+            raise
+
+        summary = _COMMIT_SUMMARY_RE.search(output)
+        commit_sha = summary.group(1) if summary else (await _run_async(["git", "rev-parse", "HEAD"], cwd=repo_path)).strip()
+        stats = {"files": len(files), "additions": 0, "deletions": 0}
+        shortstat = _SHORTSTAT_RE.search(output)
+        if shortstat:
+            stats["files"] = int(shortstat.group(1))
+            stats["additions"] = int(shortstat.group(2) or 0)
+            stats["deletions"] = int(shortstat.group(3) or 0)
+        stats["total"] = stats["additions"] + stats["deletions"]
+        if len(files) != stats["files"]:
+            # Some changes were already staged, so add did not list them
+            files = (await _run_async(
+                ["git", "diff-tree", "--root", "--no-commit-id", "--name-only", "-r", "-z", commit_sha], cwd=repo_path
+            )).split("\0")
+            files = [f for f in files if f]
+
+        return {
+            "success": True,
+            "commit_hash": commit_sha,
+            "message": message,
+            "files_changed": files,
+            "stats": stats,
+        }
+    except subprocess.CalledProcessError as e:
+        return {
+            "success": False,
+            "error": e.stderr or str(e),
+            "message": message
+        }
+
+
+async def working_tree_hash(repo_path: str) -> str:
+    """Tree hash of the working tree, uncommitted and untracked files included.
+
+    Stages into a throwaway index (GIT_INDEX_FILE) so the real index is untouched.
+    """
+    import shutil
+    import tempfile
+
+    git_dir = (await _run_async(["git", "rev-parse", "--absolute-git-dir"], cwd=repo_path)).strip()
+    fd, tmp_index = tempfile.mkstemp(prefix="index-", dir=git_dir)
+    os.close(fd)
+    try:
+        real_index = os.path.join(git_dir, "index")
+        if os.path.exists(real_index):
+            shutil.copyfile(real_index, tmp_index)  # Lets add -A reuse cached stat info
+        else:
+            os.remove(tmp_index)
+        env = {**os.environ, "GIT_INDEX_FILE": tmp_index, "LC_ALL": "C"}
+        for cmd in (["git", "add", "-A"], ["git", "write-tree"]):
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, cwd=repo_path, env=env,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await proc.communicate()
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr.decode(errors="replace"))
+        return stdout.decode().strip()
+    finally:
+        if os.path.exists(tmp_index):
+            os.remove(tmp_index)
+
+
+async def working_tree_snapshot(repo_path: str) -> Optional[str]:
+    """Commit holding the working tree as it is, or None when it matches HEAD.
+
+    Uncommitted and untracked changes are included. The commit is created
+    with `commit-tree` and no ref points at it, so branches, the index and
+    the working tree are left alone.
+    """
+    tree = await working_tree_hash(repo_path)
+    try:
+        head_tree = (await _run_async(["git", "rev-parse", "HEAD^{tree}"], cwd=repo_path)).strip()
+        parents = ["-p", "HEAD"]
+    except subprocess.CalledProcessError:
+        head_tree, parents = None, []  # No commits yet
+    if tree == head_tree:
+        return None
+    identity = {
+        "GIT_AUTHOR_NAME": "Claudable",
+        "GIT_AUTHOR_EMAIL": "noreply@claudable.local",
+        "GIT_COMMITTER_NAME": "Claudable",
+        "GIT_COMMITTER_EMAIL": "noreply@claudable.local",
+    }
+    commit = await _run_async(
+        ["git", "commit-tree", tree, *parents, "-m", "Working tree snapshot"], cwd=repo_path, env=identity
+    )
+    return commit.strip()
+
+
+def create_worktree(repo_path: str, worktree_path: str, ref: str = "HEAD") -> None:
+    """Check out `ref` into a detached worktree at `worktree_path`"""
+    os.makedirs(os.path.dirname(worktree_path), exist_ok=True)
+    _run(["git", "worktree", "add", "--detach", worktree_path, ref], cwd=repo_path)
+
+
+def remove_worktree(repo_path: str, worktree_path: str) -> None:
+    """Remove a worktree created by `create_worktree`, discarding its changes"""
+    try:
+        _run(["git", "worktree", "remove", "--force", worktree_path], cwd=repo_path)
+    except subprocess.CalledProcessError:
+        import shutil
+        shutil.rmtree(worktree_path, ignore_errors=True)
+        _run(["git", "worktree", "prune"], cwd=repo_path)
+
+
+def worktree_patch(worktree_path: str) -> str:
+    """Return all changes in a worktree (including new files) as a binary patch"""
+    _run(["git", "add", "-A"], cwd=worktree_path)
+    res = subprocess.run(
+        ["git", "diff", "--cached", "--binary", "HEAD"],
+        cwd=worktree_path, check=True, capture_output=True, text=True
+    )
+    return res.stdout  # Not stripped: git apply needs the trailing newline
+
+
+def apply_patch(repo_path: str, patch: str) -> None:
+    """Apply a patch produced by `worktree_patch` to the working tree"""
+    if not patch:
+        return
+    subprocess.run(
+        ["git", "apply", "--binary", "--whitespace=nowarn", "-"],
+        cwd=repo_path, input=patch, check=True, capture_output=True, text=True
+    )
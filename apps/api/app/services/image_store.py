@@ -0,0 +1,147 @@
+"""
+Image Store
+Content-addressed storage for chat image attachments with cached encodings
+"""
+import base64
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.services.assets import write_bytes
+
+
+_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp",
+}
+_MIME_TYPES = {ext: mime for mime, ext in _EXTENSIONS.items()}
+_MIME_TYPES[".jpeg"] = "image/jpeg"
+# Hashes arrive from request bodies and become path components
+_HASH_RE = re.compile(r"[0-9a-f]{64}")
+
+
+@dataclass(frozen=True)
+class StoredImage:
+    hash: str
+    path: str
+    mime_type: str
+    size: int
+
+
+def mime_type_for(path: str, default: str = "image/png") -> str:
+    return _MIME_TYPES.get(os.path.splitext(path)[1].lower(), default)
+
+
+def _is_image_hash(value: Optional[str]) -> bool:
+    return bool(value) and _HASH_RE.fullmatch(value) is not None
+
+
+class ImageStore:
+    """Images stored once under their SHA-256; base64 encodings kept in a bounded LRU.
+
+    Files live at `{root}/{hash[:2]}/{hash}{ext}`, so uploading the same bytes
+    twice is free and adapters can hand the path straight to a CLI.
+    """
+
+    def __init__(self, root: str, cache_bytes: int):
+        self.root = root
+        self.cache_bytes = cache_bytes
+        self._index: dict[str, StoredImage] = {}
+        self._encoded: "OrderedDict[str, str]" = OrderedDict()
+        self._encoded_size = 0
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes, mime_type: str = "image/png") -> StoredImage:
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self.get(digest)
+        if existing:
+            return existing
+        ext = _EXTENSIONS.get(mime_type, ".png")
+        path = os.path.join(self.root, digest[:2], f"{digest}{ext}")
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        write_bytes(tmp_path, data)
+        os.replace(tmp_path, path)
+        image = StoredImage(hash=digest, path=path, mime_type=mime_type, size=len(data))
+        with self._lock:
+            self._index[digest] = image
+        return image
+
+    def put_base64(self, b64: str, mime_type: str = "image/png") -> StoredImage:
+        return self.put(base64.b64decode(b64, validate=False), mime_type)
+
+    def get(self, image_hash: str) -> Optional[StoredImage]:
+        """Look up an image by hash; falls back to the filesystem after a restart"""
+        if not _is_image_hash(image_hash):
+            return None
+        with self._lock:
+            image = self._index.get(image_hash)
+        if image:
+            return image
+        bucket = os.path.join(self.root, image_hash[:2])
+        try:
+            names = os.listdir(bucket)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if stem == image_hash:
+                path = os.path.join(bucket, name)
+                image = StoredImage(
+                    hash=image_hash,
+                    path=path,
+                    mime_type=mime_type_for(path),
+                    size=os.path.getsize(path),
+                )
+                with self._lock:
+                    self._index[image_hash] = image
+                return image
+        return None
+
+    def read_bytes(self, image_hash: str) -> Optional[bytes]:
+        image = self.get(image_hash)
+        if not image:
+            return None
+        with open(image.path, "rb") as f:
+            return f.read()
+
+    def get_base64(self, image_hash: str) -> Optional[str]:
+        """Base64 of the stored bytes, encoded once and served from the LRU afterwards"""
+        if not _is_image_hash(image_hash):
+            return None
+        with self._lock:
+            encoded = self._encoded.get(image_hash)
+            if encoded is not None:
+                self._encoded.move_to_end(image_hash)
+                return encoded
+        data = self.read_bytes(image_hash)
+        if data is None:
+            return None
+        encoded = base64.b64encode(data).decode("ascii")
+        if len(encoded) <= self.cache_bytes:
+            with self._lock:
+                if image_hash not in self._encoded:
+                    self._encoded[image_hash] = encoded
+                    self._encoded_size += len(encoded)
+                while self._encoded_size > self.cache_bytes and self._encoded:
+                    _, evicted = self._encoded.popitem(last=False)
+                    self._encoded_size -= len(evicted)
+        return encoded
+
+    def resolve(self, attachment: Any) -> Optional[StoredImage]:
+        """Stored image for an attachment dict/model carrying a `hash`"""
+        image_hash = (
+            attachment.get("hash") if isinstance(attachment, dict) else getattr(attachment, "hash", None)
+        )
+        return self.get(image_hash) if image_hash else None
+
+
+image_store = ImageStore(settings.image_store_root, settings.image_store_cache_mb * 1024 * 1024)
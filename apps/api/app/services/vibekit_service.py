@@ -5,6 +5,7 @@ import asyncio
 import json
 import httpx
 from typing import Dict, Any, Optional, AsyncGenerator
+from app.core.config import settings
 from app.core.terminal_ui import ui
 
 
@@ -13,9 +14,14 @@ class VibeKitService:
     
     def __init__(self, project_id: str):
         self.project_id = project_id
-        self.bridge_url = "http://localhost:3001"
+        self.bridge_url = settings.vibekit_bridge_url
         self.sandbox_id: Optional[str] = None
-        self.client = httpx.AsyncClient(timeout=300.0)  # 5 minute timeout
+        from app.services.cli.recording import RecordingTransport, recording_enabled
+
+        transport = RecordingTransport("claude-sandbox") if recording_enabled() else None
+        self.client = httpx.AsyncClient(timeout=300.0, transport=transport)  # 5 minute timeout
+        self._active_response: Optional[httpx.Response] = None
+        self._cancelled = False
     
     async def health_check(self) -> Dict[str, Any]:
         """Check VibeKit bridge health"""
@@ -54,6 +60,7 @@ class VibeKitService:
     
     async def generate_code(self, prompt: str, streaming: bool = True) -> AsyncGenerator[Dict[str, Any], None]:
         """Generate code using VibeKit Claude Code agent"""
+        self._cancelled = False
         try:
             ui.info(f"Generating code with prompt: {prompt[:100]}...", "VibeKit")
             
@@ -69,6 +76,7 @@ class VibeKitService:
                     },
                     headers={"Accept": "text/event-stream"}
                 ) as response:
+                    self._active_response = response
                     if response.status_code == 200:
                         async for line in response.aiter_lines():
                             if line.startswith("data: "):
@@ -99,8 +107,28 @@ class VibeKitService:
                     raise Exception(f"Code generation failed: {response.text}")
                     
         except Exception as e:
+            if self._cancelled:
+                ui.info("Code generation stream closed after cancel", "VibeKit")
+                return
             ui.error(f"Error generating code: {e}", "VibeKit")
             yield {"type": "error", "error": str(e)}
+        finally:
+            self._active_response = None
+    
+    async def cancel_generation(self) -> None:
+        """Stop the in-flight generate-code stream.
+
+        The bridge has no abort endpoint, so we close the SSE response from
+        our side; the bridge observes the disconnect.
+        """
+        self._cancelled = True
+        response = self._active_response
+        if response is None:
+            return
+        try:
+            await response.aclose()
+        except Exception as e:
+            ui.warning(f"Error closing generate-code stream: {e}", "VibeKit")
     
     async def execute_command(self, command: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
         """Execute command in sandbox"""
@@ -0,0 +1 @@
+"""Micro-benchmarks for API hot paths (run from apps/api: python -m benchmarks.<name>)."""
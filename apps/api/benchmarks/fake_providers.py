@@ -0,0 +1,548 @@
+"""
+Fake provider binaries for offline load tests.
+
+Stand-ins that speak each provider's wire protocol, so the API can be load
+tested without network access or real agents. Standard library only, so they
+run from any working directory:
+
+    fake_providers.py codex ...    Codex `proto` (stdin submissions, stdout events)
+    fake_providers.py cursor ...   cursor-agent `-p ... --output-format stream-json`
+    fake_providers.py acp ...      Qwen/Gemini `--experimental-acp` (JSON-RPC over stdio)
+    fake_providers.py bridge ...   VibeKit bridge HTTP API with SSE generate-code
+
+Point the API at them through configuration:
+
+    CODEX_CMD="python /abs/path/apps/api/benchmarks/fake_providers.py codex"
+    CURSOR_AGENT_CMD="python /abs/path/apps/api/benchmarks/fake_providers.py cursor"
+    QWEN_CMD="python /abs/path/apps/api/benchmarks/fake_providers.py acp"
+    GEMINI_CMD="python /abs/path/apps/api/benchmarks/fake_providers.py acp"
+    VIBEKIT_BRIDGE_URL=http://localhost:3901  (fake_providers.py bridge --port 3901)
+
+Load shape, as flags or FAKE_* environment variables (the API appends its own
+provider arguments, which are ignored):
+
+    --tokens-per-second  FAKE_TOKENS_PER_SECOND  streaming rate, 0 = as fast as possible
+    --output-tokens      FAKE_OUTPUT_TOKENS      assistant tokens per turn
+    --tool-mix           FAKE_TOOL_MIX           tool calls per turn, e.g. "read=3,edit=2,shell=1,search=0"
+    --tool-output-bytes  FAKE_TOOL_OUTPUT_BYTES  size of each tool result
+    --failure-rate       FAKE_FAILURE_RATE       probability that a turn ends in a provider error
+    --seed               FAKE_SEED
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+VERSION = "fake-provider 0.1.0"
+TOOL_KINDS = ("read", "edit", "shell", "search")
+WORDS = (
+    "the", "component", "renders", "a", "list", "of", "items", "and", "updates", "state",
+    "when", "user", "clicks", "button", "so", "we", "add", "handler", "to", "page",
+)
+
+
+@dataclass
+class LoadShape:
+    tokens_per_second: float
+    output_tokens: int
+    tool_mix: Dict[str, int]
+    tool_output_bytes: int
+    failure_rate: float
+    rng: random.Random
+
+    def pace(self) -> None:
+        if self.tokens_per_second > 0:
+            time.sleep(1.0 / self.tokens_per_second)
+
+    def fails(self) -> bool:
+        return self.rng.random() < self.failure_rate
+
+    def tool_output(self) -> str:
+        return "x" * self.tool_output_bytes
+
+
+def _parse_tool_mix(spec: str) -> Dict[str, int]:
+    mix: Dict[str, int] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, count = part.partition("=")
+        if name not in TOOL_KINDS:
+            raise SystemExit(f"unknown tool kind {name!r}; expected one of {', '.join(TOOL_KINDS)}")
+        mix[name] = int(count or 1)
+    return mix
+
+
+def plan_turn(shape: LoadShape) -> Iterator[Tuple[str, str]]:
+    """("text", token) and ("tool", kind) steps, tools spread through the text"""
+    tools = [kind for kind, count in shape.tool_mix.items() for _ in range(count)]
+    shape.rng.shuffle(tools)
+    segments = len(tools) + 1
+    per_segment = max(1, shape.output_tokens // segments)
+    for index in range(segments):
+        for _ in range(per_segment):
+            yield "text", shape.rng.choice(WORDS) + " "
+        if index < len(tools):
+            yield "tool", tools[index]
+
+
+def _input_tokens(prompt: Any) -> int:
+    """Rough prompt size: a fixed system prompt plus ~4 characters per token"""
+    return 1000 + len(json.dumps(prompt)) // 4
+
+
+def _tool_target(kind: str, n: int) -> Dict[str, str]:
+    return {
+        "read": {"path": f"src/components/Item{n}.tsx"},
+        "edit": {"path": f"src/app/page{n}.tsx"},
+        "shell": {"command": "npm run build"},
+        "search": {"query": f"react list example {n}"},
+    }[kind]
+
+
+class _Out:
+    """Line-buffered NDJSON writer to stdout"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def send(self, obj: Dict[str, Any]) -> None:
+        with self._lock:
+            sys.stdout.write(json.dumps(obj) + "\n")
+            sys.stdout.flush()
+
+
+# ---- Codex proto -----------------------------------------------------------
+
+
+def run_codex(shape: LoadShape, argv: List[str]) -> int:
+    out = _Out()
+    session_id = str(uuid.uuid4())
+    model = argv[argv.index("-m") + 1] if "-m" in argv[:-1] else "gpt-5"
+    out.send({"id": "", "msg": {"type": "session_configured", "session_id": session_id, "model": model}})
+
+    for line in sys.stdin:
+        try:
+            submission = json.loads(line)
+        except ValueError:
+            continue
+        sub_id = submission.get("id", "")
+        op = (submission.get("op") or {}).get("type")
+        if op == "shutdown":
+            return 0
+        if op != "user_input":
+            continue
+
+        def event(msg: Dict[str, Any]) -> None:
+            out.send({"id": sub_id, "msg": msg})
+
+        event({"type": "task_started"})
+        fail_at = shape.rng.randint(1, max(1, shape.output_tokens)) if shape.fails() else None
+        text: List[str] = []
+        output_tokens = 0
+        call_n = 0
+        for step_n, (step, value) in enumerate(plan_turn(shape), start=1):
+            if fail_at is not None and step_n >= fail_at:
+                event({"type": "error", "message": "fake provider failure"})
+                break
+            if step == "text":
+                shape.pace()
+                text.append(value)
+                output_tokens += 1
+                event({"type": "agent_message_delta", "delta": value})
+                continue
+            if text:
+                event({"type": "agent_message", "message": "".join(text)})
+                text = []
+            call_n += 1
+            call_id = f"call_{call_n}"
+            target = _tool_target(value, call_n)
+            if value == "edit":
+                changes = {target["path"]: {"add": {"content": shape.tool_output()}}}
+                event({"type": "patch_apply_begin", "call_id": call_id, "auto_approved": True, "changes": changes})
+                event({"type": "patch_apply_end", "call_id": call_id, "stdout": "", "stderr": "", "success": True})
+            elif value == "search":
+                event({"type": "web_search_begin", "call_id": call_id, "query": target["query"]})
+                event({"type": "web_search_end", "call_id": call_id, "query": target["query"]})
+            else:
+                command = ["bash", "-lc", f"cat {target['path']}" if value == "read" else target["command"]]
+                event({"type": "exec_command_begin", "call_id": call_id, "command": command, "cwd": os.getcwd()})
+                event({
+                    "type": "exec_command_end",
+                    "call_id": call_id,
+                    "stdout": shape.tool_output(),
+                    "stderr": "",
+                    "exit_code": 0,
+                })
+        else:
+            if text:
+                event({"type": "agent_message", "message": "".join(text)})
+        input_tokens = _input_tokens(submission["op"].get("items"))
+        event({
+            "type": "token_count",
+            "input_tokens": input_tokens,
+            "cached_input_tokens": 0,
+            "output_tokens": output_tokens,
+            "reasoning_output_tokens": 0,
+            "total_tokens": input_tokens + output_tokens,
+        })
+        # Codex closes the turn with task_complete even after an error
+        event({"type": "task_complete", "last_agent_message": "".join(text)})
+    return 0
+
+
+# ---- Cursor stream-json ----------------------------------------------------
+
+
+_CURSOR_TOOLS = {"read": "readToolCall", "edit": "editToolCall", "shell": "shellToolCall", "search": "grepToolCall"}
+
+
+def run_cursor(shape: LoadShape, argv: List[str]) -> int:
+    out = _Out()
+    session_id = argv[argv.index("--resume") + 1] if "--resume" in argv[:-1] else str(uuid.uuid4())
+    prompt = argv[argv.index("-p") + 1] if "-p" in argv[:-1] else ""
+    model = argv[argv.index("-m") + 1] if "-m" in argv[:-1] else "gpt-5"
+    started = time.monotonic()
+    out.send({
+        "type": "system",
+        "subtype": "init",
+        "session_id": session_id,
+        "model": model,
+        "cwd": os.getcwd(),
+        "apiKeySource": "env",
+    })
+    out.send({"type": "user", "message": {"role": "user", "content": [{"type": "text", "text": prompt}]}, "session_id": session_id})
+
+    failed = shape.fails()
+    fail_at = shape.rng.randint(1, max(1, shape.output_tokens)) if failed else None
+    text: List[str] = []
+    call_n = 0
+    for step_n, (step, value) in enumerate(plan_turn(shape), start=1):
+        if fail_at is not None and step_n >= fail_at:
+            break
+        if step == "text":
+            shape.pace()
+            text.append(value)
+            out.send({
+                "type": "assistant",
+                "message": {"role": "assistant", "content": [{"type": "text", "text": value}]},
+                "session_id": session_id,
+            })
+            continue
+        call_n += 1
+        name = _CURSOR_TOOLS[value]
+        args = _tool_target(value, call_n)
+        call = {"type": "tool_call", "call_id": f"call_{call_n}", "session_id": session_id}
+        out.send({**call, "subtype": "started", "tool_call": {name: {"args": args}}})
+        out.send({**call, "subtype": "completed", "tool_call": {name: {"args": args, "result": {"success": {"content": shape.tool_output()}}}}})
+
+    out.send({
+        "type": "result",
+        "subtype": "error" if failed else "success",
+        "is_error": failed,
+        "duration_ms": int((time.monotonic() - started) * 1000),
+        "result": "fake provider failure" if failed else "".join(text),
+        "session_id": session_id,
+        "usage": {"inputTokens": _input_tokens(prompt), "outputTokens": len(text)},
+    })
+    return 1 if failed else 0
+
+
+# ---- ACP (Qwen / Gemini) ---------------------------------------------------
+
+
+_ACP_TOOL_KINDS = {"read": "read", "edit": "edit", "shell": "execute", "search": "search"}
+
+
+class _ACPAgent:
+    def __init__(self, shape: LoadShape):
+        self.shape = shape
+        self.out = _Out()
+        self.sessions: set = set()
+        self._next_id = 1
+        self._backlog: List[Dict[str, Any]] = []  # Messages read while waiting for a response
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        if self._backlog:
+            return self._backlog.pop(0)
+        while True:
+            line = sys.stdin.readline()
+            if not line:
+                return None
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+
+    def _ask(self, method: str, params: Dict[str, Any]) -> Any:
+        """Agent-initiated request; waits for the client's response"""
+        req_id = self._next_id
+        self._next_id += 1
+        self.out.send({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params})
+        while True:
+            line = sys.stdin.readline()
+            if not line:
+                return None
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get("id") == req_id and "method" not in msg:
+                return msg.get("result")
+            self._backlog.append(msg)
+
+    def _update(self, session_id: str, update: Dict[str, Any]) -> None:
+        self.out.send({"jsonrpc": "2.0", "method": "session/update", "params": {"sessionId": session_id, "update": update}})
+
+    def _prompt(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        session_id = params.get("sessionId")
+        if session_id not in self.sessions:
+            raise RuntimeError("Session not found")
+        if self.shape.fails():
+            raise RuntimeError("fake provider failure")
+        call_n = 0
+        output_tokens = 0
+        for step, value in plan_turn(self.shape):
+            if step == "text":
+                self.shape.pace()
+                output_tokens += 1
+                self._update(session_id, {"sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": value}})
+                continue
+            call_n += 1
+            call_id = f"call_{call_n}"
+            target = _tool_target(value, call_n)
+            locations = [{"path": target["path"]}] if "path" in target else []
+            if value == "edit":
+                self._ask("session/request_permission", {
+                    "sessionId": session_id,
+                    "toolCall": {"toolCallId": call_id, "title": f"Edit {target['path']}", "kind": "edit"},
+                    "options": [
+                        {"optionId": "allow", "name": "Allow", "kind": "allow_once"},
+                        {"optionId": "always", "name": "Always allow", "kind": "allow_always"},
+                        {"optionId": "reject", "name": "Reject", "kind": "reject_once"},
+                    ],
+                })
+            self._update(session_id, {
+                "sessionUpdate": "tool_call",
+                "toolCallId": call_id,
+                "title": target.get("path") or target.get("command") or target.get("query"),
+                "kind": _ACP_TOOL_KINDS[value],
+                "status": "pending",
+                "locations": locations,
+                "rawInput": target,
+            })
+            self._update(session_id, {
+                "sessionUpdate": "tool_call_update",
+                "toolCallId": call_id,
+                "status": "completed",
+                "locations": locations,
+                "content": [{"type": "content", "content": {"type": "text", "text": self.shape.tool_output()}}],
+            })
+        input_tokens = _input_tokens(params.get("prompt"))
+        return {
+            "stopReason": "end_turn",
+            "usage": {
+                "inputTokens": input_tokens,
+                "outputTokens": output_tokens,
+                "totalTokens": input_tokens + output_tokens,
+            },
+        }
+
+    def handle(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "initialize":
+            return {
+                "protocolVersion": 1,
+                "agentCapabilities": {"loadSession": False, "promptCapabilities": {"image": True}},
+                "authMethods": [],
+            }
+        if method == "authenticate":
+            return {}
+        if method == "session/new":
+            session_id = str(uuid.uuid4())
+            self.sessions.add(session_id)
+            return {"sessionId": session_id}
+        if method == "session/prompt":
+            return self._prompt(params)
+        raise LookupError(method)
+
+    def run(self) -> int:
+        while True:
+            msg = self._read()
+            if msg is None:
+                return 0
+            if "method" not in msg or "id" not in msg:
+                continue  # Notifications (session/cancel) and stray responses
+            try:
+                result = self.handle(msg["method"], msg.get("params") or {})
+                self.out.send({"jsonrpc": "2.0", "id": msg["id"], "result": result})
+            except LookupError:
+                self.out.send({"jsonrpc": "2.0", "id": msg["id"], "error": {"code": -32601, "message": "Method not found"}})
+            except Exception as e:
+                self.out.send({"jsonrpc": "2.0", "id": msg["id"], "error": {"code": -32000, "message": str(e)}})
+
+
+def run_acp(shape: LoadShape, argv: List[str]) -> int:
+    return _ACPAgent(shape).run()
+
+
+# ---- VibeKit bridge (HTTP + SSE) ------------------------------------------
+
+
+_BRIDGE_TOOLS = {"read": "Read", "edit": "Edit", "shell": "Bash", "search": "WebSearch"}
+
+
+def _bridge_handler(shape: LoadShape):
+    shape_lock = threading.Lock()
+    sessions: Dict[str, str] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _json(self, payload: Dict[str, Any], status: int = 200) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                return {}
+            try:
+                return json.loads(self.rfile.read(length))
+            except ValueError:
+                return {}
+
+        def do_GET(self) -> None:
+            parts = self.path.strip("/").split("/")
+            if self.path == "/api/health":
+                self._json({"status": "ok", "version": VERSION})
+            elif parts[:3] == ["api", "sandbox", "host"] and len(parts) == 5:
+                self._json({"hostUrl": f"http://localhost:{parts[4]}"})
+            elif parts[:3] == ["api", "sandbox", "session"] and len(parts) == 4:
+                self._json({"sessionId": sessions.get(parts[3])})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_DELETE(self) -> None:
+            self._json({"success": True})
+
+        def do_POST(self) -> None:
+            body = self._body()
+            parts = self.path.strip("/").split("/")
+            if self.path == "/api/sandbox/initialize":
+                self._json({"sandboxId": f"fake-{uuid.uuid4().hex[:8]}"})
+            elif self.path == "/api/sandbox/execute-command":
+                self._json({"success": True, "stdout": "", "stderr": "", "exitCode": 0})
+            elif parts[:3] == ["api", "sandbox", "session"] and len(parts) == 4:
+                sessions[parts[3]] = body.get("sessionId") or ""
+                self._json({"success": True})
+            elif self.path == "/api/sandbox/generate-code":
+                self._generate(body)
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def _event(self, payload: Dict[str, Any]) -> None:
+            data = f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _generate(self, body: Dict[str, Any]) -> None:
+            project_id = body.get("projectId") or "project"
+            sessions.setdefault(project_id, str(uuid.uuid4()))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            with shape_lock:
+                failed = shape.fails()
+                steps = list(plan_turn(shape))
+            try:
+                call_n = 0
+                for step, value in steps:
+                    if step == "text":
+                        shape.pace()
+                        self._event({"type": "update", "content": value})
+                        continue
+                    call_n += 1
+                    target = _tool_target(value, call_n)
+                    self._event({
+                        "type": "tool_use",
+                        "content": f"{_BRIDGE_TOOLS[value]}: {next(iter(target.values()))}",
+                        "tool_name": _BRIDGE_TOOLS[value],
+                        "tool_input": target,
+                        "tool_id": f"toolu_{call_n}",
+                    })
+                if failed:
+                    self._event({"type": "error", "error": "fake provider failure"})
+                else:
+                    output_tokens = sum(1 for step, _ in steps if step == "text")
+                    usage = {"input_tokens": _input_tokens(body.get("prompt")), "output_tokens": output_tokens}
+                    self._event({"type": "complete", "usage": usage})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client cancelled the stream
+
+    return Handler
+
+
+def run_bridge(shape: LoadShape, port: int) -> int:
+    server = ThreadingHTTPServer(("127.0.0.1", port), _bridge_handler(shape))
+    print(f"fake VibeKit bridge on http://127.0.0.1:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Availability probes: `codex --version`, `cursor-agent -h`, `qwen --help`
+    if any(flag in argv for flag in ("--version", "-h", "--help")):
+        print(f"{VERSION} (stands in for codex / cursor-agent / qwen / gemini)")
+        return 0
+
+    env = os.environ.get
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("mode", choices=("codex", "cursor", "acp", "bridge"))
+    parser.add_argument("--tokens-per-second", type=float, default=float(env("FAKE_TOKENS_PER_SECOND", "0")))
+    parser.add_argument("--output-tokens", type=int, default=int(env("FAKE_OUTPUT_TOKENS", "200")))
+    parser.add_argument("--tool-mix", default=env("FAKE_TOOL_MIX", "read=2,edit=1,shell=1"))
+    parser.add_argument("--tool-output-bytes", type=int, default=int(env("FAKE_TOOL_OUTPUT_BYTES", "2048")))
+    parser.add_argument("--failure-rate", type=float, default=float(env("FAKE_FAILURE_RATE", "0")))
+    parser.add_argument("--seed", type=int, default=int(env("FAKE_SEED", "0")) or None)
+    parser.add_argument("--port", type=int, default=int(env("FAKE_BRIDGE_PORT", "3901")))
+    args, provider_argv = parser.parse_known_args(argv)
+
+    shape = LoadShape(
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=max(0, args.output_tokens),
+        tool_mix=_parse_tool_mix(args.tool_mix),
+        tool_output_bytes=max(0, args.tool_output_bytes),
+        failure_rate=min(1.0, max(0.0, args.failure_rate)),
+        rng=random.Random(args.seed),
+    )
+    if args.mode == "codex":
+        return run_codex(shape, provider_argv)
+    if args.mode == "cursor":
+        return run_cursor(shape, provider_argv)
+    if args.mode == "acp":
+        return run_acp(shape, provider_argv)
+    return run_bridge(shape, args.port)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Time-to-first-event benchmark: cold Codex spawns vs. the prefork pool.
+
+Runs the Codex adapter N times per mode against a scratch database and
+reports how long each turn waits for its first adapter message and its first
+assistant output.
+
+    python -m benchmarks.first_event [--turns N] [--gap SECONDS] [--fake]
+
+--fake points CODEX_CMD at benchmarks/fake_providers.py; otherwise the
+configured Codex binary is used (real turns cost tokens).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_scratch = tempfile.mkdtemp(prefix="cc-first-event-")
+# Must be set before app modules read their settings
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'first_event.db')}"
+os.environ["PROJECTS_ROOT"] = os.path.join(_scratch, "projects")
+os.environ["CLI_RECORD_DIR"] = ""
+if "--fake" in sys.argv:
+    _fake = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_providers.py")
+    os.environ["CODEX_CMD"] = f"{sys.executable} {_fake} codex"
+
+import app.models  # noqa: E402,F401 registers tables
+from app.core.config import settings  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.models.projects import Project  # noqa: E402
+from app.services.cli.base import CLIRequestContext, CLIType, bind_request_context  # noqa: E402
+from app.services.cli.prefork import get_process_prefork, stop_all_preforks  # noqa: E402
+from app.services.cli.registry import adapter_registry  # noqa: E402
+
+PROJECT_ID = "first-event"
+
+
+def _setup_project() -> str:
+    Base.metadata.create_all(bind=engine)
+    project_path = os.path.join(os.environ["PROJECTS_ROOT"], PROJECT_ID, "repo")
+    os.makedirs(project_path, exist_ok=True)
+    db = SessionLocal()
+    try:
+        if db.get(Project, PROJECT_ID) is None:
+            db.add(Project(id=PROJECT_ID, name="First event", repo_path=project_path))
+            db.commit()
+    finally:
+        db.close()
+    return project_path
+
+
+async def one_turn(project_path: str) -> tuple:
+    """(seconds to first message, seconds to first assistant message)"""
+    cli = adapter_registry.get(CLIType.CODEX)
+    first = first_assistant = None
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with bind_request_context(CLIRequestContext(PROJECT_ID, project_path, db=db)):
+            async for message in cli.execute_with_streaming(instruction="Say hello", project_path=project_path):
+                now = time.perf_counter() - start
+                if first is None:
+                    first = now
+                if first_assistant is None and message.role == "assistant":
+                    first_assistant = now
+    finally:
+        db.close()
+    return first, first_assistant
+
+
+def _summary(label: str, samples: list) -> str:
+    samples = [s * 1000 for s in samples if s is not None]
+    if not samples:
+        return f"  {label:<18} no events"
+    return (
+        f"  {label:<18} p50 {statistics.median(samples):8.1f} ms"
+        f"  min {min(samples):8.1f}  max {max(samples):8.1f}  (n={len(samples)})"
+    )
+
+
+async def bench(turns: int, gap: float) -> None:
+    project_path = _setup_project()
+    for mode in ("cold", "prefork"):
+        settings.cli_prefork_enabled = mode == "prefork"
+        results = []
+        for _ in range(turns):
+            results.append(await one_turn(project_path))
+            await asyncio.sleep(gap)  # Think time between turns; lets the spare come up
+        # The first prefork turn has no spare yet
+        measured = results[1:] if mode == "prefork" and len(results) > 1 else results
+        print(f"{mode}:")
+        print(_summary("first message", [r[0] for r in measured]))
+        print(_summary("first assistant", [r[1] for r in measured]))
+        prefork = get_process_prefork("codex")
+        if prefork is not None:
+            print(f"  pool               {prefork.get_stats()}")
+    await stop_all_preforks()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--gap", type=float, default=1.0, help="Seconds between turns")
+    parser.add_argument("--fake", action="store_true", help="Use benchmarks/fake_providers.py as Codex")
+    args = parser.parse_args()
+    print(f"Codex: {settings.codex_cmd}")
+    print(f"Scratch data: {_scratch}")
+    asyncio.run(bench(args.turns, args.gap))
+
+
+if __name__ == "__main__":
+    main()
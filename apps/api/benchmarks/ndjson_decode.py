@@ -0,0 +1,108 @@
+"""
+NDJSON decode benchmark.
+
+Compares the old per-adapter loop (readline + decode().strip() + json.loads)
+with the shared NDJSONDecoder over recorded provider streams.
+
+    python -m benchmarks.ndjson_decode [stream.ndjson ...] [--repeat N]
+
+Without arguments a synthetic Codex/Cursor-shaped stream is generated.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List
+
+from app.services.cli.base import NDJSONDecoder, _orjson
+
+
+def synthetic_stream(events: int = 20000, seed: int = 7) -> bytes:
+    """Mix of small deltas, tool calls and occasional large diffs/outputs"""
+    rng = random.Random(seed)
+    lines: List[str] = []
+    for i in range(events):
+        roll = rng.random()
+        if roll < 0.75:
+            event = {"id": "msg_1", "msg": {"type": "agent_message_delta", "delta": "token " * rng.randint(1, 8)}}
+        elif roll < 0.95:
+            event = {
+                "type": "tool_call",
+                "subtype": "started",
+                "tool_call": {"readToolCall": {"args": {"path": f"src/file_{i}.ts"}}},
+            }
+        else:
+            event = {
+                "id": "msg_1",
+                "msg": {"type": "exec_command_end", "stdout": "x" * rng.randint(10_000, 200_000), "exit_code": 0},
+            }
+        lines.append(json.dumps(event))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _reader(data: bytes) -> asyncio.StreamReader:
+    # Generous limit so the baseline can read the large lines at all
+    reader = asyncio.StreamReader(limit=1 << 24)
+    for offset in range(0, len(data), 64 * 1024):
+        reader.feed_data(data[offset:offset + 64 * 1024])
+    reader.feed_eof()
+    return reader
+
+
+async def baseline(data: bytes) -> int:
+    reader = _reader(data)
+    count = 0
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        line_str = line.decode().strip()
+        if not line_str:
+            continue
+        try:
+            json.loads(line_str)
+            count += 1
+        except json.JSONDecodeError:
+            continue
+    return count
+
+
+async def shared_decoder(data: bytes) -> int:
+    decoder = NDJSONDecoder(label="bench")
+    count = 0
+    async for _ in decoder.iter_stream(_reader(data)):
+        count += 1
+    return count
+
+
+def run(name: str, fn, data: bytes, repeat: int) -> float:
+    best = float("inf")
+    events = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        events = asyncio.run(fn(data))
+        best = min(best, time.perf_counter() - start)
+    rate = events / best if best else 0.0
+    print(f"  {name:<16} {events:>8} events  {best * 1000:>9.1f} ms  {rate:>12,.0f} events/s  {len(data) / best / 1e6:>8.1f} MB/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("streams", nargs="*", help="Recorded NDJSON provider streams")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = [(path, open(path, "rb").read()) for path in args.streams] or [("synthetic", synthetic_stream())]
+    print(f"JSON backend: {'orjson' if _orjson else 'stdlib json'}")
+    for label, data in inputs:
+        print(f"{label} ({len(data) / 1e6:.1f} MB)")
+        before = run("readline+json", baseline, data, args.repeat)
+        after = run("NDJSONDecoder", shared_decoder, data, args.repeat)
+        if before:
+            print(f"  speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
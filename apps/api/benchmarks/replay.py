@@ -0,0 +1,168 @@
+"""
+Adapter replay benchmark.
+
+Feeds fixtures recorded with CLI_RECORD_DIR (see app/services/cli/recording.py)
+back through the matching adapter and UnifiedCLIManager._execute_with_cli at
+full speed, against a scratch SQLite database and a counting WebSocket.
+
+    python -m benchmarks.replay fixture.ndjson [...] [--repeat N] [--adapter-only]
+
+Reports provider events/s, DB rows/s (persisted messages) and WS frames/s.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+_scratch = tempfile.mkdtemp(prefix="cc-replay-")
+# Must be set before app modules read their settings
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'replay.db')}"
+os.environ["PROJECTS_ROOT"] = os.path.join(_scratch, "projects")
+os.environ["CLI_RECORD_DIR"] = ""
+os.environ["ACP_POOL_MIN_SPARE"] = "0"
+os.environ["CLI_PREFORK_ENABLED"] = "false"
+
+import httpx  # noqa: E402
+
+import app.models  # noqa: E402,F401 registers tables
+from app.core.websocket.manager import manager as ws_manager  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.models.messages import Message  # noqa: E402
+from app.models.projects import Project  # noqa: E402
+from app.models.sessions import Session as ChatSession  # noqa: E402
+from app.services.cli.acp_pool import stop_all_pools  # noqa: E402
+from app.services.cli.base import CLIType, bind_request_context  # noqa: E402
+from app.services.cli.manager import UnifiedCLIManager  # noqa: E402
+from app.services.cli.recording import Fixture, ReplayTransport, load_fixture, replay_subprocesses  # noqa: E402
+from app.services.cli.registry import adapter_registry  # noqa: E402
+from app.services.vibekit_service import get_vibekit_service  # noqa: E402
+
+# Fixture label (recorded binary / bridge) -> adapter
+CLI_FOR_LABEL = {
+    "codex": CLIType.CODEX,
+    "cursor-agent": CLIType.CURSOR,
+    "qwen": CLIType.QWEN,
+    "qwen-code": CLIType.QWEN,
+    "gemini": CLIType.GEMINI,
+    "claude-sandbox": CLIType.CLAUDE,
+}
+
+
+class CountingWebSocket:
+    """WebSocket stand-in registered with the connection manager"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+        self.bytes += len(data)
+
+
+def _setup_project(project_id: str, sandbox: bool) -> str:
+    Base.metadata.create_all(bind=engine)
+    project_path = os.path.join(os.environ["PROJECTS_ROOT"], project_id, "repo")
+    os.makedirs(project_path, exist_ok=True)
+    db = SessionLocal()
+    try:
+        if db.get(Project, project_id) is None:
+            db.add(Project(
+                id=project_id,
+                name=f"Replay {project_id}",
+                repo_path=project_path,
+                sandbox_id="replay" if sandbox else None,
+            ))
+            db.commit()
+    finally:
+        db.close()
+    return project_path
+
+
+def _new_session(db, project_id: str, cli_type: CLIType) -> str:
+    session_id = str(uuid.uuid4())
+    db.add(ChatSession(id=session_id, project_id=project_id, cli_type=cli_type.value, status="active"))
+    db.commit()
+    return session_id
+
+
+async def replay_once(fixture: Fixture, cli_type: CLIType, project_id: str, project_path: str, adapter_only: bool) -> int:
+    """One replay of `fixture`; returns the number of adapter messages"""
+    cli = adapter_registry.get(cli_type)
+    if fixture.channel == "http":
+        vibekit = get_vibekit_service(project_id)
+        await vibekit.client.aclose()
+        vibekit.sandbox_id = None
+        vibekit.client = httpx.AsyncClient(transport=ReplayTransport(fixture))
+
+    db = SessionLocal()
+    try:
+        session_id = _new_session(db, project_id, cli_type)
+        manager = UnifiedCLIManager(project_id, project_path, session_id, str(uuid.uuid4()), db)
+        with bind_request_context(manager.context), replay_subprocesses(fixture):
+            if adapter_only:
+                count = 0
+                async for _ in cli.execute_with_streaming(
+                    instruction="replay", project_path=project_path, session_id=session_id
+                ):
+                    count += 1
+                return count
+            result = await manager._execute_with_cli(cli, "replay", None)
+            return int(result.get("messages_count") or 0)
+    finally:
+        db.close()
+
+
+async def bench(path: str, repeat: int, adapter_only: bool) -> None:
+    fixture = load_fixture(path)
+    cli_type = CLI_FOR_LABEL.get(fixture.cli)
+    if cli_type is None:
+        print(f"{path}: unknown fixture label {fixture.cli!r}; expected one of {sorted(CLI_FOR_LABEL)}")
+        return
+    project_id = f"replay-{cli_type.value}"
+    project_path = _setup_project(project_id, sandbox=fixture.channel == "http")
+    socket = CountingWebSocket()
+    ws_manager.active_connections[project_id] = [socket]
+
+    db = SessionLocal()
+    rows_before = db.query(Message).filter(Message.project_id == project_id).count()
+    messages = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        messages += await replay_once(fixture, cli_type, project_id, project_path, adapter_only)
+    elapsed = time.perf_counter() - start
+    rows = db.query(Message).filter(Message.project_id == project_id).count() - rows_before
+    db.close()
+    ws_manager.active_connections.pop(project_id, None)
+
+    events = fixture.output_events * repeat
+    print(f"{path} [{cli_type.value}, {fixture.channel}, {'adapter' if adapter_only else 'manager'}]")
+    print(f"  {repeat} runs in {elapsed * 1000:.1f} ms, {messages} messages")
+    print(f"  provider events  {events:>8}  {events / elapsed:>12,.0f} /s")
+    print(f"  DB rows          {rows:>8}  {rows / elapsed:>12,.0f} /s")
+    print(f"  WS frames        {socket.frames:>8}  {socket.frames / elapsed:>12,.0f} /s  ({socket.bytes / 1e6:.1f} MB)")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    try:
+        for path in args.fixtures:
+            await bench(path, args.repeat, args.adapter_only)
+    finally:
+        await stop_all_pools()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="+", help="Fixtures recorded with CLI_RECORD_DIR")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--adapter-only", action="store_true", help="Skip the manager (no DB rows or WS frames)")
+    args = parser.parse_args()
+    print(f"Scratch data: {_scratch}")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+from app.services.image_store import ImageStore
+
+
+def test_lookups_reject_non_hex_hashes(tmp_path):
+    store = ImageStore(str(tmp_path / "images"), cache_bytes=1024)
+    image = store.put(b"png-bytes")
+    assert store.get(image.hash) == image
+    assert store.get_base64(image.hash) is not None
+
+    # Right length, but would resolve outside the store as a path component
+    traversal = "../" + "a" * 61
+    for bad in (traversal, image.hash.upper(), image.hash[:-1] + "g", ""):
+        assert store.get(bad) is None
+        assert store.get_base64(bad) is None
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.db.migrations import run_sqlite_migrations
+
+
+def _legacy_user_requests(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE user_requests ("
+            "id VARCHAR(64) PRIMARY KEY, project_id VARCHAR(64) NOT NULL, "
+            "idempotency_key VARCHAR(128))"
+        ))
+        conn.execute(text(
+            "INSERT INTO user_requests (id, project_id, idempotency_key) VALUES "
+            "('old', 'p1', 'k'), ('new', 'p1', 'k'), ('other', 'p2', 'k'), "
+            "('a', 'p1', NULL), ('b', 'p1', NULL)"
+        ))
+
+
+def test_idempotency_index_added_to_existing_database():
+    engine = create_engine("sqlite://")
+    _legacy_user_requests(engine)
+
+    run_sqlite_migrations(engine)
+    run_sqlite_migrations(engine)
+
+    names = {index["name"] for index in inspect(engine).get_indexes("user_requests")}
+    assert "ux_user_requests_project_idempotency" in names
+    with engine.connect() as conn:
+        keys = dict(conn.execute(text("SELECT id, idempotency_key FROM user_requests")).all())
+    assert keys == {"old": None, "new": "k", "other": "k", "a": None, "b": None}
+
+
+def test_idempotency_index_rejects_concurrent_duplicate():
+    engine = create_engine("sqlite://")
+    _legacy_user_requests(engine)
+    run_sqlite_migrations(engine)
+
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO user_requests (id, project_id, idempotency_key) VALUES ('dup', 'p1', 'k')"
+        ))
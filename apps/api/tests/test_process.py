@@ -0,0 +1,43 @@
+"""spawn_cli_process while an execution's request context is bound"""
+import asyncio
+import sys
+
+from app.services.cli.base import CLIRequestContext, bind_request_context, get_request_context
+from app.services.cli.process import create_detached_task, spawn_cli_process
+
+
+def test_detached_task_does_not_inherit_request_context():
+    async def main():
+        with bind_request_context(CLIRequestContext("p1", "/tmp")):
+            return await create_detached_task(_current_project())
+
+    assert asyncio.run(main()) is None
+
+
+async def _current_project():
+    ctx = get_request_context()
+    return ctx.project_id if ctx else None
+
+
+def test_spawn_with_request_context_bound():
+    seen = []
+
+    def on_line(line: str) -> None:
+        seen.append((line, get_request_context()))
+
+    async def main():
+        with bind_request_context(CLIRequestContext("p1", "/tmp")):
+            process = await spawn_cli_process(
+                [sys.executable, "-c", "import sys; sys.stderr.write('x' * 200000 + '\\nboom\\n')"],
+                label="test",
+                stdin=False,
+                on_stderr_line=on_line,
+            )
+            returncode = await process.wait()
+        return process, returncode
+
+    process, returncode = asyncio.run(main())
+    assert returncode == 0
+    assert process.stderr_tail.text().endswith("boom")
+    assert process.stderr_tail.get_stats()["stderr_bytes"] == 200006
+    assert seen[-1] == ("boom", None)  # Drained outside the request's context
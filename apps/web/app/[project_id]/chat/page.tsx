@@ -989,6 +989,7 @@ export default function ChatPage({ params }: Params) {
         if (img.path) {
           // New format from ChatInput - send path directly
           return {
+            hash: img.hash,
             path: img.path,
             name: img.filename || img.name || 'image'
           };
@@ -1017,7 +1018,7 @@ export default function ChatPage({ params }: Params) {
       const endpoint = mode === 'act' ? 'act' : 'chat';
       const r = await fetch(`${API_BASE}/api/chat/${projectId}/${endpoint}`, { 
         method: 'POST', 
-        headers: { 'Content-Type': 'application/json' }, 
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': requestId }, 
         body: JSON.stringify(requestBody) 
       });
       
@@ -1137,7 +1138,7 @@ export default function ChatPage({ params }: Params) {
       
       const r = await fetch(`${API_BASE}/api/chat/${projectId}/act`, { 
         method: 'POST', 
-        headers: { 'Content-Type': 'application/json' }, 
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': requestId }, 
         body: JSON.stringify(requestBody) 
       });
       
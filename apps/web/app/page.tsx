@@ -546,7 +546,8 @@ export default function HomePage() {
               // Track image data for API
               imageData.push({
                 name: result.filename || image.name,
-                path: result.absolute_path
+                path: result.absolute_path,
+                hash: result.hash
               });
             }
           }
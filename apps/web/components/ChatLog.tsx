@@ -133,6 +133,12 @@ interface ActiveSession {
   duration_seconds?: number;
 }
 
+interface QueuePosition {
+  position: number;
+  running: number;
+  maxConcurrency: number;
+}
+
 interface ChatLogProps {
   projectId: string;
   onSessionStatusChange?: (isRunning: boolean) => void;
@@ -148,6 +154,20 @@ export default function ChatLog({ projectId, onSessionStatusChange, onProjectSta
   const [isLoading, setIsLoading] = useState(true);
   const [activeSession, setActiveSession] = useState<ActiveSession | null>(null);
   const [isWaitingForResponse, setIsWaitingForResponse] = useState(false);
+  // Queued requests of this project (by request id) while all execution slots are busy
+  const [queuedRequests, setQueuedRequests] = useState<Record<string, QueuePosition>>({});
+  const queueStatus = Object.values(queuedRequests).reduce<QueuePosition | null>(
+    (first, entry) => (!first || entry.position < first.position ? entry : first),
+    null
+  );
+  const leaveQueue = (requestId?: string) => {
+    if (!requestId) return;
+    setQueuedRequests(prev => {
+      if (!(requestId in prev)) return prev;
+      const { [requestId]: _left, ...rest } = prev;
+      return rest;
+    });
+  };
   
   // Project setup progress state
   const [isProjectSetup, setIsProjectSetup] = useState(false);
@@ -249,11 +269,22 @@ export default function ChatLog({ projectId, onSessionStatusChange, onProjectSta
       
 
       setMessages(prev => {
-        const exists = prev.some(msg => msg.id === chatMessage.id);
-        if (exists) {
+        const index = prev.findIndex(msg => msg.id === chatMessage.id);
+        if (index === -1) {
+          return [...prev, chatMessage];
+        }
+        // Streaming deltas extend the message; the final message replaces it
+        if (message.partial) {
+          const updated = [...prev];
+          updated[index] = { ...prev[index], content: prev[index].content + chatMessage.content };
+          return updated;
+        }
+        if (prev[index].content === chatMessage.content) {
           return prev;
         }
-        return [...prev, chatMessage];
+        const updated = [...prev];
+        updated[index] = chatMessage;
+        return updated;
       });
     },
     onStatus: (status, data) => {
@@ -263,8 +294,21 @@ export default function ChatLog({ projectId, onSessionStatusChange, onProjectSta
         onProjectStatusUpdate?.(data.status, data.message);
       }
       
+      // Handle queue position updates
+      if (status === 'queue_update' && data?.request_id) {
+        setQueuedRequests(prev => ({
+          ...prev,
+          [data.request_id]: {
+            position: data.position,
+            running: data.running,
+            maxConcurrency: data.max_concurrency,
+          },
+        }));
+      }
+
       // Handle session completion
       if (status === 'act_complete' || status === 'chat_complete') {
+        leaveQueue(data?.request_id);
         setActiveSession(null);
         onSessionStatusChange?.(false);
         setIsWaitingForResponse(false); // Clear waiting state
@@ -283,6 +327,7 @@ export default function ChatLog({ projectId, onSessionStatusChange, onProjectSta
       
       // Handle session start
       if (status === 'act_start' || status === 'chat_start') {
+        leaveQueue(data?.request_id); // Left the queue
         setIsWaitingForResponse(true); // Set waiting state when session starts
         
         // ★ NEW: Request 시작 처리  
@@ -1079,6 +1124,21 @@ export default function ChatLog({ projectId, onSessionStatusChange, onProjectSta
           ))}
         </AnimatePresence>
         
+        {/* Queue position while waiting for a free execution slot */}
+        {queueStatus && (
+          <div className="mb-4 w-full">
+            <motion.div
+              initial={{ opacity: 0, y: 10 }}
+              animate={{ opacity: 1, y: 0 }}
+              exit={{ opacity: 0, y: -10 }}
+            >
+              <div className="text-sm text-gray-500 dark:text-gray-400 leading-relaxed">
+                Queued: #{queueStatus.position} in line ({queueStatus.running}/{queueStatus.maxConcurrency} executions running)
+              </div>
+            </motion.div>
+          </div>
+        )}
+
         {/* Loading indicator for waiting response */}
         {isWaitingForResponse && (
           <div className="mb-4 w-full">
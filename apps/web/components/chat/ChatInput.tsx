@@ -10,6 +10,7 @@ interface UploadedImage {
   filename: string;
   path: string;
   url: string;
+  hash?: string;
 }
 
 interface ChatInputProps {
@@ -126,6 +127,7 @@ export default function ChatInput({
           id: crypto.randomUUID(),
           filename: result.filename,
           path: result.absolute_path,
+          hash: result.hash,
           url: imageUrl
         };
 
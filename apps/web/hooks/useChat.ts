@@ -33,6 +33,16 @@ export function useChat({ projectId, conversationId }: UseChatOptions) {
     onMessage: (message) => {
       console.log('💬 [Chat] Adding message:', message);
       setMessages(prev => {
+        // Streaming deltas extend their message; the final message replaces it
+        const index = prev.findIndex(m => m.id === message.id);
+        if (index !== -1) {
+          const updated = [...prev];
+          updated[index] = message.partial
+            ? { ...prev[index], content: prev[index].content + message.content }
+            : { ...message, partial: undefined };
+          return updated;
+        }
+
         // Smart message merging for better UX
         if (prev.length > 0) {
           const lastMessage = prev[prev.length - 1];
@@ -47,7 +57,8 @@ export function useChat({ projectId, conversationId }: UseChatOptions) {
             lastMessage.conversation_id === message.conversation_id &&
             timeDiff < 5000 && 
             lastMessage.message_type !== 'tool_use' &&
-            message.message_type === 'chat'
+            message.message_type === 'chat' &&
+            !message.partial
           ) {
             // Merge content with current message
             const mergedMessage = {
@@ -193,6 +204,7 @@ export function useChat({ projectId, conversationId }: UseChatOptions) {
               const data = await uploadResp.json();
               // Provide absolute path for CLI to Read, and filename for display
               preparedImages.push({
+                hash: data.hash,
                 path: data.absolute_path,
                 name: data.filename,
               });
@@ -215,7 +227,7 @@ export function useChat({ projectId, conversationId }: UseChatOptions) {
       
       const response = await fetch(`/api/chat/${projectId}/act`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': requestId },
         body: JSON.stringify(request)
       });
       
@@ -276,7 +288,7 @@ export function useChat({ projectId, conversationId }: UseChatOptions) {
             });
             if (uploadResp.ok) {
               const data = await uploadResp.json();
-              preparedImages.push({ path: data.absolute_path, name: data.filename });
+              preparedImages.push({ hash: data.hash, path: data.absolute_path, name: data.filename });
             }
           } catch (e) {
             console.error('Image upload failed:', e);
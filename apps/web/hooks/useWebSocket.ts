@@ -73,6 +73,8 @@ export function useWebSocket({
             onStatus('act_complete', data.data, data.data?.request_id);
           } else if (data.type === 'chat_complete' && onStatus) {
             onStatus('chat_complete', data.data, data.data?.request_id);
+          } else if (data.type === 'queue_update' && onStatus) {
+            onStatus('queue_update', data.data, data.data?.request_id);
           } else {
           }
         } catch (error) {
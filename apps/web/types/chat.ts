@@ -13,6 +13,7 @@ export interface Message {
   conversation_id?: string;
   cli_source?: string;
   request_id?: string; // ★ NEW: request_id 추가
+  partial?: boolean; // Streaming delta; the final message arrives later with the same id
   created_at: string;
 }
 
@@ -32,6 +33,7 @@ export interface ImageAttachment {
   url: string;
   base64_data?: string;
   mime_type?: string;
+  hash?: string; // Image store reference returned by /api/assets/{project_id}/upload
 }
 
 export interface ActRequest {